@@ -3,6 +3,11 @@ ASGI config for TaskManagement project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn TaskManagement.asgi:application``)
+to keep ``/api/notifications/stream/`` open: each connection is then one
+idle coroutine. Under WSGI the stream only replays missed events and ends
+(see notifications/stream.py).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
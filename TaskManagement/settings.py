@@ -152,7 +152,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "authentication.authentication.ClaimsJWTAuthentication",
     ),
 
     "DEFAULT_PERMISSION_CLASSES": (
@@ -210,3 +210,184 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# Bulk task jobs
+# Bulk requests over BULK_JOB_SYNC_LIMIT tasks run as background jobs,
+# processed in transactions of BULK_JOB_CHUNK_SIZE tasks. A running job not
+# heard from for BULK_JOB_LEASE_SECONDS (its worker died) is picked up again.
+BULK_JOB_SYNC_LIMIT = 1000
+BULK_JOB_CHUNK_SIZE = 500
+BULK_JOB_LEASE_SECONDS = 300
+
+# Tag facet counts (/api/tasks/tags/)
+TAG_FACETS_CACHE_TIMEOUT = 300
+TAG_FACETS_SCOPED_CACHE_TIMEOUT = 30
+
+# In-process bitmap index for task list filters (tags, status, priority,
+# assignee). Rebuilt after TASK_BITMAP_INDEX_MAX_AGE seconds to pick up
+# writes from other processes.
+TASK_BITMAP_INDEX_ENABLED = os.getenv('TASK_BITMAP_INDEX', 'False') == 'True'
+TASK_BITMAP_INDEX_MAX_AGE = 300
+TASK_BITMAP_INDEX_MAX_IN_IDS = 10000
+
+# Audit log writer (see tasks/audit_writer.py)
+# OVERFLOW is what happens when the queue is full: "block", "drop" or "spill".
+AUDIT_LOG_WRITER = {
+    "ASYNC": True,
+    "QUEUE_SIZE": 10000,
+    "BATCH_SIZE": 500,
+    "FLUSH_INTERVAL": 1.0,
+    "OVERFLOW": "spill",
+    "BLOCK_TIMEOUT": 1.0,
+    "SPILL_PATH": BASE_DIR / "var" / "audit_spill.jsonl",
+}
+
+# Audit log partitions (see tasks/partitions.py)
+# Native range partitions on PostgreSQL, emulated on other databases.
+# Whole partitions older than AUDIT_LOG_RETENTION_DAYS are dropped.
+AUDIT_LOG_PARTITION_INTERVAL = "month"
+AUDIT_LOG_PARTITIONS_AHEAD = 3
+AUDIT_LOG_RETENTION_DAYS = 30
+
+# Retention for ever-growing tables (see tasks/retention.py for the policy
+# format and defaults). Deletes run in pk-ranged chunks with a pause between.
+RETENTION_CHUNK_SIZE = 1000
+RETENTION_CHUNK_SLEEP = 0.1
+
+# Statement timeout for /api/audit-logs/ queries (PostgreSQL only)
+AUDIT_LOG_QUERY_TIMEOUT_MS = 5000
+
+# Archival to gzip JSONL segments (see tasks/archive.py). Audit logs are
+# archived a whole partition at a time and their partitions are only dropped
+# once archived; other ages must stay below RETENTION_POLICIES so rows are
+# archived before they are deleted.
+AUDIT_ARCHIVE = {
+    "PATH": BASE_DIR / "var" / "archive",
+    "SEGMENT_ROWS": 100000,
+    "MODELS": {
+        "tasks.APIAuditLog": {"field": "timestamp", "max_age_days": 25, "partitioned": True},
+        "tasks.TaskHistory": {"field": "timestamp", "max_age_days": 300},
+    },
+}
+
+# Bytes of each request/response body kept in the audit log. Longer bodies
+# are truncated; their full size and sha256 are still recorded.
+AUDIT_LOG_BODY_LIMIT = 8192
+
+# Per-minute request rollups (see tasks/rollups.py), flushed from a
+# background thread every FLUSH_INTERVAL seconds
+REQUEST_ROLLUPS = {
+    "ENABLED": True,
+    "BACKGROUND": True,
+    "FLUSH_INTERVAL": 10.0,
+    "SKETCH_ACCURACY": 0.01,
+}
+
+# Shared cache (see tasks/cache_backends.py): a SQLite file every worker on
+# the host opens, so counters and cached payloads need no cache server.
+CACHES = {
+    "default": {
+        "BACKEND": "tasks.cache_backends.SQLiteCache",
+        "LOCATION": BASE_DIR / "var" / "cache.sqlite3",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "MAX_ENTRIES": 100000,
+            "CULL_EVERY": 500,
+        },
+    }
+}
+
+# In-process L1 in front of the shared cache (see tasks/tiered_cache.py).
+# An invalidation made by another process is seen within L1_TTL seconds.
+TIERED_CACHE = {
+    "L1_TTL": 5.0,
+    "L1_MAX_ENTRIES": 1000,
+}
+
+# Blocked IPs (see tasks/blocklist.py). Workers keep active blocks in memory
+# and pick up changes within REFRESH_INTERVAL seconds.
+BLOCKLIST = {
+    "REFRESH_INTERVAL": 2.0,
+    "BLOCK_SECONDS": 3600,
+}
+
+# Proxies whose X-Forwarded-For is believed when working out the client IP
+# for blocks and failed login counts (addresses or networks). Requests from
+# anywhere else are identified by REMOTE_ADDR alone.
+TRUSTED_PROXIES = []
+
+# Failed login tracking (see tasks/login_failures.py). Going over either
+# threshold within WINDOW_SECONDS blocks the client IP behind a CAPTCHA.
+# Counts are written to FailedAuthAttempt per window by a background thread.
+LOGIN_FAILURES = {
+    "WINDOW_SECONDS": 300,
+    "IP_THRESHOLD": 20,
+    "USERNAME_THRESHOLD": 10,
+    "BLOCK_SECONDS": 900,
+    "BACKGROUND": True,
+    "FLUSH_INTERVAL": 10.0,
+}
+
+# Seconds a user stays in the user cache used by token authentication
+# (see authentication/user_cache.py)
+USER_CACHE_TIMEOUT = 300
+
+# Write-behind UserSession.last_seen updates (see
+# authentication/session_activity.py): one batched UPDATE every
+# FLUSH_INTERVAL seconds, each session written at most once per RESOLUTION.
+SESSION_ACTIVITY = {
+    "RESOLUTION": 60,
+    "BACKGROUND": True,
+    "FLUSH_INTERVAL": 30.0,
+    "BATCH_SIZE": 500,
+}
+
+# Sessions kept per user; logging in beyond this drops the least recently
+# seen ones (see authentication/sessions.py)
+MAX_SESSIONS_PER_USER = 3
+
+# Revoked refresh tokens are checked in memory (see
+# authentication/revocation.py); each worker syncs new ones from the
+# blacklist table at most every SYNC_INTERVAL seconds.
+TOKEN_REVOCATION = {
+    "SYNC_INTERVAL": 1.0,
+    "PRUNE_INTERVAL": 300.0,
+}
+
+# Email outbox (see authentication/outbox.py). Emails are stored with the
+# change that causes them and sent in batches by a background thread or the
+# send_outbox_emails command.
+EMAIL_OUTBOX = {
+    "BACKGROUND": True,
+    "EAGER": False,
+    "BATCH_SIZE": 50,
+    "MAX_ATTEMPTS": 8,
+    "BACKOFF_SECONDS": 30,
+    "MAX_BACKOFF_SECONDS": 3600,
+    "LEASE_SECONDS": 300,
+    "SWEEP_INTERVAL": 60,
+}
+
+# Server-Sent Events stream of notifications and task changes (see
+# notifications/stream.py). Open connections need the ASGI application;
+# each process polls for saves made by other processes every POLL_INTERVAL
+# seconds.
+NOTIFICATION_STREAM = {
+    "HEARTBEAT_SECONDS": 15,
+    "QUEUE_SIZE": 100,
+    "RETRY_MS": 3000,
+    "BACKLOG_LIMIT": 100,
+    "POLL_INTERVAL": 5.0,
+    "OVERLAP_SECONDS": 5.0,
+    "TICKET_MAX_AGE": 60,
+}
+
+# Seconds within which a notification for the same user, task and kind is
+# merged into the unread one before it (see notifications/coalescing.py);
+# 0 disables
+NOTIFICATION_COALESCE_WINDOW = 600
+
+# manage.py test runs background workers and buffers inline (see
+# TaskManagement/test_runner.py)
+TEST_RUNNER = "TaskManagement.test_runner.ForegroundTestRunner"
@@ -0,0 +1,40 @@
+"""
+Test runner that keeps background work in the foreground.
+
+Production settings start threads for the audit writer, write-behind
+buffers, the email outbox and notification stream polls, and share a SQLite
+file cache between workers. Tests need none of that to outlive a test or a
+run, so for the whole run those features are switched to foreground mode
+with ``override_settings``: audit records and outbox emails are written
+right away, buffers are flushed by the tests themselves, and the cache is
+in memory.
+"""
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def foreground_settings():
+    def merged(name, **values):
+        return {**getattr(settings, name, {}), **values}
+
+    return {
+        "AUDIT_LOG_WRITER": merged("AUDIT_LOG_WRITER", ASYNC=False),
+        "REQUEST_ROLLUPS": merged("REQUEST_ROLLUPS", BACKGROUND=False),
+        "LOGIN_FAILURES": merged("LOGIN_FAILURES", BACKGROUND=False),
+        "SESSION_ACTIVITY": merged("SESSION_ACTIVITY", BACKGROUND=False),
+        "EMAIL_OUTBOX": merged("EMAIL_OUTBOX", BACKGROUND=False, EAGER=True),
+        "NOTIFICATION_STREAM": merged("NOTIFICATION_STREAM", POLL_INTERVAL=0),
+        "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    }
+
+
+class ForegroundTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._foreground = override_settings(**foreground_settings())
+        self._foreground.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._foreground.disable()
+        super().teardown_test_environment(**kwargs)
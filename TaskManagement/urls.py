@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
+from tasks.views import AuditLogListView, CacheMetricsView, RequestRollupView
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -29,6 +30,9 @@ urlpatterns = [
     path("api/auth/", include('authentication.urls')),
     path("api/tasks/", include('tasks.urls')),
     path("api/notifications/", include('notifications.urls')),
+    path("api/audit-logs/", AuditLogListView.as_view(), name="audit-logs"),
+    path("api/audit-logs/rollups/", RequestRollupView.as_view(), name="request-rollups"),
+    path("api/cache/metrics/", CacheMetricsView.as_view(), name="cache-metrics"),
 
 
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        from . import user_cache  # noqa: F401  (registers user cache invalidation receivers)
+        from . import staff_directory  # noqa: F401  (registers directory invalidation receivers)
+        from . import outbox  # noqa: F401  (starts the sender with the first request)
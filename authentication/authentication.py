@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import user_cache
+
+# Claim name -> User field; filled in by CustomTokenObtainPairSerializer
+USER_CLAIMS = {
+    "username": "username",
+    "role": "role",
+    "email_verified": "is_email_verified",
+    "tz": "timezone",
+}
+VERSION_CLAIM = "cv"
+
+# Access tokens this close to expiry get a replacement in X-New-Access-Token
+REFRESH_WINDOW_SECONDS = getattr(settings, "ACCESS_TOKEN_REFRESH_WINDOW", 120)
+
+
+def add_user_claims(token, user):
+    for claim, field in USER_CLAIMS.items():
+        token[claim] = getattr(user, field)
+    token[VERSION_CLAIM] = user_cache.claims_version(user.pk)
+    return token
+
+
+def issue_refreshed_access_token(response, user, token):
+    """
+    Add a new access token to ``response`` when ``token`` is about to
+    expire. The user is the one authenticated from ``token``, so this makes
+    no query.
+    """
+    if token["exp"] - time.time() > REFRESH_WINDOW_SECONDS:
+        return response
+    new_token = add_user_claims(AccessToken.for_user(user), user)
+    response["X-New-Access-Token"] = str(new_token)
+    return response
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds ``request.user`` from the token's claims
+    when they are current, so most requests make no user query.
+
+    Claims are trusted only when the token was issued at the user's current
+    claims version, i.e. the user has not changed since. Otherwise, and for
+    tokens that say the email is not verified yet, the user comes from the
+    user cache, which is refreshed whenever a user changes.
+
+    The result is kept on the Django request as ``jwt_user`` and
+    ``jwt_token``, so the token is decoded once per request even when
+    several DRF requests wrap it, and SilentRefreshMiddleware can reuse it.
+    """
+
+    def authenticate(self, request):
+        django_request = getattr(request, "_request", request)
+        cached = getattr(django_request, "jwt_token", None)
+        if cached is not None:
+            return django_request.jwt_user, cached
+
+        result = super().authenticate(request)
+        if result is not None:
+            django_request.jwt_user, django_request.jwt_token = result
+        return result
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        # simplejwt stores the id as a string
+        user_id = user_cache.User._meta.pk.to_python(user_id)
+
+        if (
+            validated_token.get(VERSION_CLAIM) == user_cache.claims_version(user_id)
+            and validated_token.get("email_verified")
+            and all(claim in validated_token for claim in USER_CLAIMS)
+        ):
+            # Only active users get tokens, and deactivating one changes their version
+            return user_cache.from_claims(user_id, {
+                field: validated_token[claim] for claim, field in USER_CLAIMS.items()
+            } | {"is_active": True})
+
+        user = user_cache.get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import RequestFactory
+
+from authentication.models import UserSession
+from authentication.serializers import CustomTokenObtainPairSerializer
+from authentication.sessions import MAX_SESSIONS
+
+USERNAME_PREFIX = "login-benchmark-"
+PASSWORD = "benchmark-pass-123"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput (token issue plus session admission) with "
+        "concurrent logins of the same users, and check the session cap held. "
+        "Creates and deletes its own users, so it only runs with --allow-writes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5)
+        parser.add_argument("--logins", type=int, default=200, help="Total logins")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--allow-writes",
+            action="store_true",
+            help="Create and delete benchmark users in the configured database",
+        )
+
+    def handle(self, *args, **options):
+        if not options["allow_writes"]:
+            raise CommandError(
+                "benchmark_logins creates and deletes users and sessions in the "
+                "configured database; run it against a test database with --allow-writes"
+            )
+        User = get_user_model()
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError(
+                f"Users named {USERNAME_PREFIX}* already exist; remove them or "
+                "use another database"
+            )
+        users = [
+            User.objects.create_user(
+                username=f"{USERNAME_PREFIX}{index}",
+                email=f"{USERNAME_PREFIX}{index}@example.com",
+                password=PASSWORD,
+                role="developer",
+                is_email_verified=True,
+            )
+            for index in range(options["users"])
+        ]
+
+        try:
+            logins = options["logins"]
+            threads = options["threads"]
+            errors = []
+            factory = RequestFactory()
+
+            def run(worker):
+                try:
+                    for index in range(worker, logins, threads):
+                        user = users[index % len(users)]
+                        request = factory.post(
+                            "/api/auth/login/", HTTP_USER_AGENT=f"benchmark/{index}"
+                        )
+                        serializer = CustomTokenObtainPairSerializer(
+                            data={"username": user.username, "password": PASSWORD},
+                            context={"request": request},
+                        )
+                        serializer.is_valid(raise_exception=True)
+                except Exception as exc:
+                    errors.append(exc)
+                finally:
+                    close_old_connections()
+
+            workers = [threading.Thread(target=run, args=(worker,)) for worker in range(threads)]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+            most = max(
+                UserSession.objects.filter(user=user).count() for user in users
+            )
+            self.stdout.write(
+                f"{logins - len(errors)} logins in {elapsed:.2f}s "
+                f"({(logins - len(errors)) / elapsed:.1f} logins/s) "
+                f"with {threads} threads and {len(users)} users"
+            )
+            self.stdout.write(f"Most sessions held by one user: {most} (cap {MAX_SESSIONS})")
+            if errors:
+                self.stderr.write(f"{len(errors)} logins failed, first: {errors[0]!r}")
+            if most > MAX_SESSIONS:
+                self.stderr.write(self.style.ERROR("Session cap was exceeded"))
+            else:
+                self.stdout.write(self.style.SUCCESS("Session cap held"))
+        finally:
+            # Only the users made above; their sessions go with them
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
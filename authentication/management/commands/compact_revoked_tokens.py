@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from authentication.revocation import compact_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted refresh tokens in small, throttled chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=None)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=None,
+            help="Seconds to pause between chunks",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        reports = compact_revoked_tokens(
+            chunk_size=options["chunk_size"],
+            sleep=options["sleep"],
+            dry_run=options["dry_run"],
+        )
+
+        verb = "would delete" if options["dry_run"] else "deleted"
+        for report in reports:
+            self.stdout.write(
+                f"{report['model']}: {verb} {report['deleted']} rows "
+                f"in {report['chunks']} chunks, {report['seconds']}s"
+            )
+        self.stdout.write(self.style.SUCCESS("Token tables compacted"))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication import outbox
+
+
+class Command(BaseCommand):
+    help = "Send due emails from the email outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new emails instead of exiting when none are due",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls in --loop mode",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent = outbox.send_pending()
+            if sent:
+                self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails"))
+
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-19 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_claims_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(fields=['user', 'user_agent'], name='session_user_agent_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-19 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0008_session_user_agent_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(fields=['user', '-last_seen'], name='session_user_last_seen_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 import pytz
+from django.utils import timezone as django_timezone
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
@@ -41,6 +42,30 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+
+class ClaimsUser(User):
+    """
+    User built from access token claims (see authentication.authentication).
+    Only the claimed fields are loaded; other fields are deferred and come
+    from the user cache on first access instead of one query per field.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields and from_queryset is None and deferred.issuperset(fields):
+            from .user_cache import get_values
+
+            values = get_values(self.pk)
+            if values is not None and all(field in values for field in fields):
+                for attname, value in values.items():
+                    if attname in deferred:
+                        self.__dict__[attname] = value
+                return
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
 class UserSession(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -54,4 +79,45 @@ class UserSession(models.Model):
     last_seen = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-last_seen']
\ No newline at end of file
+        ordering = ['-last_seen']
+        indexes = [
+            # Session activity updates match on (user, user_agent)
+            models.Index(fields=["user", "user_agent"], name="session_user_agent_idx"),
+            # Finds the newest sessions of a user at login
+            models.Index(fields=["user", "-last_seen"], name="session_user_last_seen_idx"),
+        ]
+
+
+class EmailOutbox(models.Model):
+    """
+    An email waiting to be sent. Rows are written in the same transaction
+    as the change that causes the email and sent by authentication.outbox.
+    """
+
+    class State(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENDING = "sending", "Sending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    state = models.CharField(max_length=10, choices=State.choices, default=State.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When the row may be claimed: the retry time while pending, the end of
+    # the sender's lease while sending
+    next_attempt_at = models.DateTimeField(default=django_timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["state", "next_attempt_at"], name="outbox_state_next_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
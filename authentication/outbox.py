@@ -0,0 +1,222 @@
+"""
+Transactional email outbox.
+
+``enqueue`` stores an ``EmailOutbox`` row in the caller's transaction, so
+an email exists exactly when the change that caused it was committed, and
+a slow or unavailable mail server never holds up the request. A sender
+thread, started when the row is committed, or the ``send_outbox_emails``
+command drains the table in batches over one mail connection per batch.
+Failed emails are retried with exponential backoff up to
+``MAX_ATTEMPTS`` times.
+
+Once started, by the first request of a web process or the first email
+enqueued, the sender thread stays up: after draining the outbox it sleeps
+until the next retry is due, at most ``SWEEP_INTERVAL`` seconds, or until
+it is woken for a new email.
+"""
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Min, Q
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Send from a thread once the row is committed
+    "BACKGROUND": True,
+    # Send before enqueue() returns, inside the caller's transaction (tests)
+    "EAGER": False,
+    "BATCH_SIZE": 50,
+    "MAX_ATTEMPTS": 8,
+    "BACKOFF_SECONDS": 30,
+    "MAX_BACKOFF_SECONDS": 3600,
+    # A claimed batch not finished within this time is claimed again
+    "LEASE_SECONDS": 300,
+    # Longest the sender thread sleeps before looking for due retries
+    "SWEEP_INTERVAL": 60,
+}
+
+_sender = None
+_sender_lock = threading.Lock()
+# Set to wake the sender; it is cleared before each drain, so an email
+# enqueued during one is picked up by the next
+_wakeup = threading.Event()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "EMAIL_OUTBOX", {})}
+
+
+def enqueue(subject, body, recipients, from_email=None):
+    email = EmailOutbox.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+    config = get_config()
+    if config["EAGER"]:
+        send_pending()
+    elif config["BACKGROUND"]:
+        transaction.on_commit(wake_sender)
+    return email
+
+
+def wake_sender():
+    """Start the sender thread, or wake it if it is sleeping"""
+    global _sender
+
+    _wakeup.set()
+    with _sender_lock:
+        if _sender is not None and _sender.is_alive():
+            return
+        _sender = threading.Thread(target=_sender_loop, name="email-outbox", daemon=True)
+        _sender.start()
+
+
+@receiver(request_started)
+def start_sender(sender, **kwargs):
+    """Start sweeping for due retries with the first request of a process"""
+    request_started.disconnect(start_sender)
+    if get_config()["BACKGROUND"]:
+        wake_sender()
+
+
+def _sender_loop():
+    while True:
+        _wakeup.clear()
+        delay = get_config()["SWEEP_INTERVAL"]
+        try:
+            send_pending()
+            due = seconds_until_due()
+            if due is not None:
+                delay = min(delay, due)
+        except Exception:
+            logger.exception("Email outbox sender failed")
+        finally:
+            connection.close()
+        _wakeup.wait(delay)
+
+
+def seconds_until_due():
+    """Seconds until the next pending email is due, or None if there is none"""
+    next_attempt_at = EmailOutbox.objects.filter(
+        state__in=[EmailOutbox.State.PENDING, EmailOutbox.State.SENDING]
+    ).aggregate(next_attempt_at=Min("next_attempt_at"))["next_attempt_at"]
+    if next_attempt_at is None:
+        return None
+    # At least a second, so an email that cannot be claimed yet is not spun on
+    return max((next_attempt_at - timezone.now()).total_seconds(), 1.0)
+
+
+def send_pending():
+    """Send due emails batch by batch until none are left; returns how many were sent"""
+    sent = 0
+    while True:
+        close_old_connections()
+        batch = claim_batch()
+        if not batch:
+            return sent
+        sent += send_batch(batch)
+
+
+def claim_batch(size=None):
+    """
+    Mark up to ``size`` due emails as sending under a fresh claim token and
+    return them. The conditional update makes the claim safe when several
+    senders poll the table; a lease that ran out is claimed again.
+    """
+    config = get_config()
+    size = size or config["BATCH_SIZE"]
+    now = timezone.now()
+    due = EmailOutbox.objects.filter(
+        Q(state=EmailOutbox.State.PENDING) | Q(state=EmailOutbox.State.SENDING),
+        next_attempt_at__lte=now,
+    )
+    ids = list(due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:size])
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    due.filter(id__in=ids).update(
+        state=EmailOutbox.State.SENDING,
+        claim_token=token,
+        next_attempt_at=now + timedelta(seconds=config["LEASE_SECONDS"]),
+    )
+    return list(EmailOutbox.objects.filter(claim_token=token, state=EmailOutbox.State.SENDING).order_by("id"))
+
+
+def send_batch(emails):
+    """Send claimed emails over one connection; returns how many were sent"""
+    config = get_config()
+    sent, failed = [], []
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=mail_connection,
+            )
+            try:
+                mail_connection.send_messages([message])
+            except Exception as exc:
+                failed.append((email, exc))
+            else:
+                sent.append(email.pk)
+    except Exception as exc:
+        # Could not connect: every email not sent yet is retried
+        done = set(sent) | {email.pk for email, _ in failed}
+        failed.extend((email, exc) for email in emails if email.pk not in done)
+    finally:
+        try:
+            mail_connection.close()
+        except Exception:
+            logger.exception("Failed to close mail connection")
+
+    if sent:
+        EmailOutbox.objects.filter(pk__in=sent).update(
+            state=EmailOutbox.State.SENT,
+            attempts=F("attempts") + 1,
+            sent_at=timezone.now(),
+            last_error="",
+        )
+    for email, exc in failed:
+        _schedule_retry(email, exc, config)
+    return len(sent)
+
+
+def backoff(attempts, config=None):
+    """Delay before retry number ``attempts``"""
+    config = config or get_config()
+    return min(config["BACKOFF_SECONDS"] * 2 ** (attempts - 1), config["MAX_BACKOFF_SECONDS"])
+
+
+def _schedule_retry(email, exc, config):
+    attempts = email.attempts + 1
+    logger.warning("Sending email %s failed (attempt %s): %s", email.pk, attempts, exc)
+    if attempts >= config["MAX_ATTEMPTS"]:
+        state, next_attempt_at = EmailOutbox.State.FAILED, timezone.now()
+    else:
+        state = EmailOutbox.State.PENDING
+        next_attempt_at = timezone.now() + timedelta(seconds=backoff(attempts, config))
+    EmailOutbox.objects.filter(pk=email.pk).update(
+        state=state,
+        attempts=attempts,
+        next_attempt_at=next_attempt_at,
+        last_error=str(exc)[:1000],
+    )
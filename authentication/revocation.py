@@ -0,0 +1,125 @@
+"""
+Revoked refresh tokens, checked in memory.
+
+simplejwt checks the ``token_blacklist`` tables with a query on every
+refresh, and rotation adds a row to them each time. Instead, every worker
+keeps the JTIs of unexpired blacklisted tokens in a set. The set is synced
+from ``BlacklistedToken`` at most every ``SYNC_INTERVAL`` seconds, reading
+only rows past the highest id already seen, so a check is a set lookup
+whatever the size of the tables.
+
+A token blacklisted by another worker may be missing from the set for up
+to ``SYNC_INTERVAL`` seconds. Rotation does not rely on the set: it only
+succeeds for the request that inserts the token's ``BlacklistedToken``
+row, so a refresh token can be rotated once however it is replayed.
+
+Expired rows are removed by ``compact_revoked_tokens`` with the retention
+policies of the token_blacklist models (see tasks/retention.py).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks.retention import apply_retention
+
+DEFAULTS = {
+    "SYNC_INTERVAL": 1.0,
+    # Expired JTIs are dropped from memory this often
+    "PRUNE_INTERVAL": 300.0,
+}
+
+TOKEN_MODELS = ["token_blacklist.BlacklistedToken", "token_blacklist.OutstandingToken"]
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "TOKEN_REVOCATION", {})}
+
+
+class RevokedTokenSet:
+    def __init__(self, sync_interval=None):
+        config = get_config()
+        self.sync_interval = config["SYNC_INTERVAL"] if sync_interval is None else sync_interval
+        self.prune_interval = config["PRUNE_INTERVAL"]
+        self._jtis = {}  # jti -> expiry timestamp
+        self._high_water = None
+        self._synced = 0.0
+        self._pruned = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        if time.monotonic() - self._synced >= self.sync_interval:
+            self.sync()
+        return jti in self._jtis
+
+    def sync(self):
+        """Load blacklisted tokens added since the last sync; returns how many"""
+        blacklisted = BlacklistedToken.objects.order_by("id")
+        if self._high_water is None:
+            # First load: only tokens that can still be presented
+            blacklisted = blacklisted.filter(token__expires_at__gt=timezone.now())
+        else:
+            blacklisted = blacklisted.filter(id__gt=self._high_water)
+        rows = list(blacklisted.values_list("id", "token__jti", "token__expires_at"))
+
+        now = time.monotonic()
+        with self._lock:
+            for _, jti, expires_at in rows:
+                self._jtis[jti] = expires_at.timestamp()
+            if rows:
+                self._high_water = rows[-1][0]
+            elif self._high_water is None:
+                self._high_water = 0
+            self._synced = now
+            if now - self._pruned >= self.prune_interval:
+                self._prune()
+        return len(rows)
+
+    def _prune(self):
+        current = time.time()
+        self._jtis = {jti: expires for jti, expires in self._jtis.items() if expires > current}
+        self._pruned = time.monotonic()
+
+    def add(self, jti, expires):
+        with self._lock:
+            self._jtis[jti] = expires
+
+    def clear_local(self):
+        with self._lock:
+            self._jtis = {}
+            self._high_water = None
+            self._synced = 0.0
+
+
+revoked = RevokedTokenSet()
+
+
+class RevocableRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check is a lookup in ``revoked``"""
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in revoked:
+            raise TokenError(_("Token is blacklisted"))
+
+
+def revoke(token):
+    """
+    Blacklist ``token``. Returns False if it already was, e.g. when the
+    same refresh token is presented twice at once.
+    """
+    _, created = token.blacklist()
+    revoked.add(token.payload[api_settings.JTI_CLAIM], token.payload["exp"])
+    return created
+
+
+def compact_revoked_tokens(chunk_size=None, sleep=None, dry_run=False, now=None):
+    """Delete expired outstanding and blacklisted tokens in chunks"""
+    return apply_retention(
+        only=TOKEN_MODELS, chunk_size=chunk_size, sleep=sleep, dry_run=dry_run, now=now
+    )
@@ -1,11 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework.exceptions import PermissionDenied
+from django.db import transaction
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
 
 from TaskManagement import settings
-from authentication.models import UserSession
+from authentication.authentication import add_user_claims
+from authentication import outbox, user_cache
+from authentication.revocation import RevocableRefreshToken, revoke
+from authentication.sessions import admit_session
 
 User = get_user_model()
 
@@ -23,14 +28,17 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data["username"],
-            email=validated_data["email"],
-            password=validated_data["password"],
-            role=validated_data["role"],
-        )
+        # The email is queued in the same transaction as the user, so it
+        # is sent exactly when the registration is committed
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=validated_data["username"],
+                email=validated_data["email"],
+                password=validated_data["password"],
+                role=validated_data["role"],
+            )
 
-        self.send_verification_email(user)
+            self.send_verification_email(user)
         return user
     
     def send_verification_email(self, user):
@@ -38,36 +46,68 @@ class RegisterSerializer(serializers.ModelSerializer):
             f"http://localhost:8000/api/auth/verify-email/"
             f"{user.email_verification_token}/"
         )
-        print("Mail Sent")
-        send_mail(
+        outbox.enqueue(
             subject="Verify your email",
-            message=f"Click the link to verify your email:\n{verify_url}",
+            body=f"Click the link to verify your email:\n{verify_url}",
+            recipients=[user.email],
             from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
         )
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
+    @classmethod
+    def get_token(cls, user):
+        # Lets ClaimsJWTAuthentication authenticate without loading the user
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
         user = self.user
         request = self.context["request"]
 
-        sessions = UserSession.objects.filter(user=user)
-
-        if sessions.count() >= 3:
-            oldest_session = sessions.first()
-            oldest_session.delete()
-
-        UserSession.objects.create(
-            user=user,
+        admit_session(
+            user,
             user_agent=request.META.get("HTTP_USER_AGENT", ""),
             ip_address=request.META.get("REMOTE_ADDR", "0.0.0.0"),
         )
 
         return data
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh with the revoked-token check done in memory. The user comes
+    from the user cache and both new tokens get current claims.
+    """
+    token_class = RevocableRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user_id = User._meta.pk.to_python(refresh.payload.get(api_settings.USER_ID_CLAIM))
+        user = user_cache.get_user(user_id)
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"],
+                "no_active_account",
+            )
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revoke(refresh):
+                # Another request rotated this token first
+                raise InvalidToken("Token is blacklisted")
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            add_user_claims(refresh, user)
+            refresh.outstand()
+            return {
+                "access": str(add_user_claims(refresh.access_token, user)),
+                "refresh": str(refresh),
+            }
+
+        return {"access": str(add_user_claims(refresh.access_token, user))}
+
 class UserMinimalSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
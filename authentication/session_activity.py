@@ -0,0 +1,100 @@
+"""
+Write-behind updates of ``UserSession.last_seen``.
+
+Requests only note the activity in process memory. A background thread
+writes the latest activity per (user, user agent) every ``FLUSH_INTERVAL``
+seconds as one batched ``UPDATE``, and a session already written less than
+``RESOLUTION`` seconds ago is not written again. ``last_seen`` writes
+therefore grow with the number of active sessions per interval instead of
+the number of requests, and ``last_seen`` is accurate to ``RESOLUTION``
+plus ``FLUSH_INTERVAL`` seconds.
+
+Each batch looks up the session ids of its users and writes them with
+``bulk_update``, so the UPDATE matches rows by primary key.
+"""
+import atexit
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from tasks.background import BackgroundFlusher
+
+from .models import UserSession
+
+DEFAULTS = {
+    "RESOLUTION": 60,
+    "BACKGROUND": True,
+    "FLUSH_INTERVAL": 30.0,
+    "BATCH_SIZE": 500,
+}
+
+# Sessions whose last write time is remembered per process
+MAX_REMEMBERED_SESSIONS = 50000
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "SESSION_ACTIVITY", {})}
+
+
+class SessionActivityRecorder(BackgroundFlusher):
+    thread_name = "session-activity"
+
+    def __init__(self, config=None):
+        super().__init__(get_config, config)
+        self.resolution = timedelta(seconds=self.config["RESOLUTION"])
+        self._pending = {}  # (user_id, user_agent) -> last activity
+        self._written = OrderedDict()  # (user_id, user_agent) -> last_seen written
+
+    def record(self, user_id, user_agent, moment=None):
+        moment = moment or timezone.now()
+        key = (user_id, user_agent)
+        with self._lock:
+            written = self._written.get(key)
+            if written is not None and moment - written < self.resolution:
+                return
+            self._pending[key] = moment
+        self.maybe_start()
+
+    def flush(self, everything=False):
+        """Write pending activity; returns the number of sessions updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return 0
+        return self.write_or_restore(pending, self._write)
+
+    def _write(self, pending):
+        updated = 0
+        items = list(pending.items())
+        batch_size = self.config["BATCH_SIZE"]
+        for start in range(0, len(items), batch_size):
+            batch = dict(items[start:start + batch_size])
+            sessions = []
+            for session in UserSession.objects.filter(
+                user_id__in={user_id for user_id, _ in batch}
+            ).only("id", "user_id", "user_agent").order_by():
+                moment = batch.get((session.user_id, session.user_agent))
+                if moment is not None:
+                    session.last_seen = moment
+                    sessions.append(session)
+            updated += UserSession.objects.bulk_update(sessions, ["last_seen"])
+
+        with self._lock:
+            for key, moment in items:
+                self._written[key] = moment
+                self._written.move_to_end(key)
+            while len(self._written) > MAX_REMEMBERED_SESSIONS:
+                self._written.popitem(last=False)
+        return updated
+
+    def restore(self, entries):
+        for key, moment in entries.items():
+            if key not in self._pending or self._pending[key] < moment:
+                self._pending[key] = moment
+
+
+recorder = SessionActivityRecorder()
+atexit.register(recorder.shutdown)
@@ -0,0 +1,32 @@
+"""
+Session admission: each user keeps at most ``MAX_SESSIONS_PER_USER``
+sessions, the most recently seen ones.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import UserSession
+
+MAX_SESSIONS = getattr(settings, "MAX_SESSIONS_PER_USER", 3)
+
+
+def admit_session(user, user_agent, ip_address, limit=None):
+    """
+    Create a session for ``user`` and delete the ones beyond the newest
+    ``limit`` in one statement. The user row is locked first, so
+    concurrent logins of the same user are admitted one at a time and the
+    cap holds (databases without SELECT ... FOR UPDATE, like SQLite,
+    serialize writers anyway).
+    """
+    limit = MAX_SESSIONS if limit is None else limit
+    with transaction.atomic():
+        list(get_user_model().objects.select_for_update().filter(pk=user.pk).values_list("pk"))
+        session = UserSession.objects.create(
+            user=user,
+            user_agent=user_agent,
+            ip_address=ip_address,
+        )
+        newest = UserSession.objects.filter(user=user).order_by("-last_seen", "-id").values("pk")[:limit]
+        UserSession.objects.filter(user=user).exclude(pk__in=newest).delete()
+    return session
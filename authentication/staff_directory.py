@@ -0,0 +1,125 @@
+"""
+Cached staff directory for ``/api/auth/staff/``.
+
+The list of managers and developers is rendered to JSON once and kept in
+the ``staff-directory`` namespace of the tiered cache together with its
+ETag and a search index. Requests are answered from that entry: a full
+list is the pre-rendered body, ``?q=`` prefix searches and pages are cut
+from the cached rows, and a matching ``If-None-Match`` gets a 304 without
+rendering anything. Saving or deleting a user who is, or was, in the
+directory invalidates the entry. Whether a user was in it is answered
+from the small set of listed ids kept next to the entry, so saves never
+read the directory itself.
+"""
+import bisect
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+from tasks.tiered_cache import get_cache
+
+from .models import ClaimsUser
+
+User = get_user_model()
+
+STAFF_ROLES = ["manager", "developer"]
+CACHE_KEY = "directory"
+IDS_KEY = "ids"
+
+directory_cache = get_cache("staff-directory")
+
+
+def make_etag(data):
+    return '"%s"' % hashlib.sha1(data).hexdigest()
+
+
+def build():
+    """Render the directory and its search index"""
+    from .serializers import UserMinimalSerializer
+
+    users = User.objects.filter(role__in=STAFF_ROLES).only(
+        *UserMinimalSerializer.Meta.fields
+    ).order_by("username")
+    rows = [dict(row) for row in UserMinimalSerializer(users, many=True).data]
+    body = JSONRenderer().render(rows)
+
+    # (lowercased term, row position) for username and email prefixes
+    index = sorted(
+        (term.lower(), position)
+        for position, row in enumerate(rows)
+        for term in (row["username"], row["email"])
+        if term
+    )
+    return {
+        "etag": make_etag(body),
+        "body": body,
+        "rows": rows,
+        "index_terms": [term for term, _ in index],
+        "index_positions": [position for _, position in index],
+    }
+
+
+def get_directory():
+    directory = directory_cache.get(CACHE_KEY)
+    if directory is None:
+        directory = build()
+        # The ids go first: whenever the directory is cached, so are they
+        directory_cache.set(IDS_KEY, frozenset(row["id"] for row in directory["rows"]))
+        directory_cache.set(CACHE_KEY, directory)
+    return directory
+
+
+def search(directory, prefix):
+    """Rows whose username or email starts with ``prefix``, in directory order"""
+    prefix = prefix.lower()
+    terms = directory["index_terms"]
+    start = bisect.bisect_left(terms, prefix)
+    end = bisect.bisect_left(terms, prefix + "\uffff", lo=start)
+    positions = sorted(set(directory["index_positions"][start:end]))
+    return [directory["rows"][position] for position in positions]
+
+
+class DirectoryJSONRenderer(JSONRenderer):
+    """JSON renderer that sends a view's ``prerendered`` body as is"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        body = getattr((renderer_context or {}).get("view"), "prerendered", None)
+        if body is not None:
+            return body
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+# ---------- Invalidation ----------
+
+def invalidate():
+    directory_cache.invalidate()
+    transaction.on_commit(directory_cache.invalidate)
+
+
+def _listed(instance):
+    if instance.role in STAFF_ROLES:
+        return True
+    # A user who just left a staff role is still in the cached directory.
+    # Without the id set (never built, or evicted) assume they may be.
+    ids = directory_cache.get(IDS_KEY)
+    return ids is None or instance.pk in ids
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+def invalidate_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    if _listed(instance):
+        invalidate()
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=ClaimsUser)
+def invalidate_on_delete(sender, instance, **kwargs):
+    if _listed(instance):
+        invalidate()
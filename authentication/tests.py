@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
@@ -285,3 +285,837 @@ class MeViewTest(APITestCase):
         """Test /me without authentication"""
         response = self.client.get("/api/auth/me/")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class FailedLoginTrackingTest(APITestCase):
+    """Test failed logins are counted, block the IP and are stored per window"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from tasks.blocklist import blocklist
+        cache.clear()
+        blocklist.clear_local()
+        self.addCleanup(blocklist.clear_local)
+        self.login_url = "/api/auth/login/"
+        User.objects.create_user(
+            username="target",
+            email="target@test.com",
+            password="correct123",
+            is_email_verified=True
+        )
+
+    def make_tracker(self, **config):
+        from tasks.login_failures import DEFAULTS, FailedLoginTracker
+        return FailedLoginTracker({**DEFAULTS, "BACKGROUND": False, **config})
+
+    def test_username_threshold_blocks_ip(self):
+        """Test going over the per-username threshold blocks the client IP"""
+        from unittest import mock
+        from tasks.models import BlockedIP
+
+        tracker = self.make_tracker(USERNAME_THRESHOLD=3)
+        with mock.patch("authentication.views.failures", tracker):
+            for _ in range(3):
+                response = self.client.post(self.login_url, {"username": "target", "password": "nope"})
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertFalse(BlockedIP.objects.exists())
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(self.login_url, {"username": "target", "password": "nope"})
+
+        block = BlockedIP.objects.get(ip_address="127.0.0.1")
+        self.assertFalse(block.is_expired())
+
+        # Even the right password is refused until the CAPTCHA is answered
+        response = self.client.post(self.login_url, {"username": "target", "password": "correct123"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json()["captcha_question"], block.captcha_question)
+
+    def test_spoofed_forwarded_for_blocks_the_sender(self):
+        """Test failures count against REMOTE_ADDR, not a client-set X-Forwarded-For"""
+        from unittest import mock
+        from django.test import RequestFactory, override_settings
+        from tasks.blocklist import blocklist
+        from tasks.middlewares.security import get_client_ip
+        from tasks.models import BlockedIP
+
+        tracker = self.make_tracker(USERNAME_THRESHOLD=1)
+        with mock.patch("authentication.views.failures", tracker):
+            for victim in ("10.9.9.1", "10.9.9.2"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(
+                        self.login_url,
+                        {"username": "target", "password": "nope"},
+                        HTTP_X_FORWARDED_FOR=victim,
+                    )
+
+        self.assertEqual(list(BlockedIP.objects.values_list("ip_address", flat=True)), ["127.0.0.1"])
+        self.assertIsNone(blocklist.get("10.9.9.1"))
+
+        # Behind a trusted proxy, the nearest untrusted hop is the client
+        factory = RequestFactory()
+        request = factory.get("/", REMOTE_ADDR="10.0.0.5", HTTP_X_FORWARDED_FOR="6.6.6.6, 1.2.3.4, 10.0.0.9")
+        with override_settings(TRUSTED_PROXIES=["10.0.0.0/24"]):
+            self.assertEqual(get_client_ip(request), "1.2.3.4")
+        self.assertEqual(get_client_ip(request), "10.0.0.5")
+
+    def test_ip_threshold_counts_across_usernames(self):
+        """Test spraying many usernames from one IP hits the per-IP threshold"""
+        from tasks.blocklist import blocklist
+
+        tracker = self.make_tracker(IP_THRESHOLD=5)
+        blocked = [tracker.record("10.1.1.1", f"user{index}", now=1000.0) for index in range(6)]
+        self.assertEqual(blocked, [False] * 5 + [True])
+        self.assertIsNotNone(blocklist.get("10.1.1.1"))
+
+    def test_failures_are_flushed_per_window(self):
+        """Test a burst is stored as one row per window, IP and username"""
+        from tasks.models import FailedAuthAttempt
+
+        tracker = self.make_tracker(WINDOW_SECONDS=60, IP_THRESHOLD=1000, USERNAME_THRESHOLD=1000)
+        for _ in range(200):
+            tracker.record("10.2.2.2", "target", now=1000.0)
+        tracker.record("10.2.2.2", "other", now=1000.0)
+        tracker.record("10.2.2.2", "target", now=1070.0)
+
+        # Only finished windows are written
+        with self.assertNumQueries(1):
+            self.assertEqual(tracker.flush(now=1070.0), 2)
+        rows = {
+            (row.username, row.window_start.timestamp()): row.count
+            for row in FailedAuthAttempt.objects.all()
+        }
+        self.assertEqual(rows, {("target", 960.0): 200, ("other", 960.0): 1})
+
+        self.assertEqual(tracker.flush(everything=True), 1)
+        self.assertEqual(FailedAuthAttempt.objects.count(), 3)
+
+    def test_failed_flush_keeps_counts(self):
+        """Test counts taken for a failed write are merged back and written later"""
+        from unittest import mock
+        from django.db import DatabaseError
+        from tasks.models import FailedAuthAttempt
+
+        tracker = self.make_tracker(WINDOW_SECONDS=60, IP_THRESHOLD=1000, USERNAME_THRESHOLD=1000)
+        tracker.record("10.3.3.3", "target", now=1000.0)
+        with mock.patch.object(FailedAuthAttempt.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                tracker.flush(everything=True)
+        tracker.record("10.3.3.3", "target", now=1000.0)
+
+        self.assertEqual(tracker.flush(everything=True), 1)
+        self.assertEqual(FailedAuthAttempt.objects.get().count, 2)
+
+    def test_successful_login_is_not_counted(self):
+        """Test a successful login records no failure"""
+        from unittest import mock
+
+        tracker = self.make_tracker()
+        with mock.patch("authentication.views.failures", tracker):
+            response = self.client.post(self.login_url, {"username": "target", "password": "correct123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(tracker.flush(everything=True), 0)
+
+
+class ClaimsAuthenticationTest(APITestCase):
+    """Test token claims stand in for the user row"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="claimed",
+            email="claimed@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+
+    def login(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        response = self.client.post("/api/auth/login/", {
+            "username": "claimed",
+            "password": "pass123"
+        })
+        return AccessToken(response.data["access"])
+
+    def test_current_claims_need_no_query(self):
+        """Test a token with current claims authenticates without a user query"""
+        from authentication.authentication import ClaimsJWTAuthentication
+
+        token = self.login()
+        self.assertEqual(token["role"], "developer")
+        self.assertTrue(token["email_verified"])
+        self.assertEqual(token["tz"], "UTC")
+
+        with self.assertNumQueries(0):
+            user = ClaimsJWTAuthentication().get_user(token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.role, "developer")
+        self.assertTrue(user.is_email_verified)
+
+        # Deferred fields come from the user cache, never one query per field
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "claimed@test.com")
+            self.assertEqual(user.first_name, "")
+        with self.assertNumQueries(0):
+            self.assertEqual(ClaimsJWTAuthentication().get_user(token).email, "claimed@test.com")
+
+    def test_user_changes_override_old_claims(self):
+        """Test a role change applies to tokens issued before it"""
+        from authentication.authentication import ClaimsJWTAuthentication
+
+        token = self.login()
+        self.user.role = "manager"
+        self.user.save()
+
+        user = ClaimsJWTAuthentication().get_user(token)
+        self.assertEqual(user.role, "manager")
+
+        self.user.is_active = False
+        self.user.save()
+        from rest_framework.exceptions import AuthenticationFailed
+        with self.assertRaises(AuthenticationFailed):
+            ClaimsJWTAuthentication().get_user(token)
+
+    def test_other_users_changes_keep_claims_current(self):
+        """Test saving another user does not send this user's token to the cache"""
+        from authentication.authentication import ClaimsJWTAuthentication
+
+        token = self.login()
+        other = User.objects.create_user(username="other", email="other@test.com", password="pass123")
+        other.role = "manager"
+        other.save()
+
+        with self.assertNumQueries(0):
+            ClaimsJWTAuthentication().get_user(token)
+
+    def test_unverified_claim_is_rechecked(self):
+        """Test verifying the email takes effect without a new token"""
+        User.objects.filter(pk=self.user.pk).update(is_email_verified=False)
+        token = self.login()
+        self.assertFalse(token["email_verified"])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertEqual(self.client.get("/api/tasks/").status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.refresh_from_db()
+        response = self.client.get(f"/api/auth/verify-email/{self.user.email_verification_token}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get("/api/tasks/").status_code, status.HTTP_200_OK)
+
+
+class SilentRefreshTest(APITestCase):
+    """Test near-expiry tokens are replaced without extra work"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="refresher",
+            email="refresher@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+
+    def make_token(self, seconds_left):
+        from datetime import timedelta
+        from rest_framework_simplejwt.tokens import AccessToken
+        from authentication.serializers import CustomTokenObtainPairSerializer
+
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        token.set_exp(lifetime=timedelta(seconds=seconds_left))
+        return AccessToken(str(token))
+
+    def test_near_expiry_costs_no_extra_queries(self):
+        """Test a near-expiry request makes the same queries as a fresh one"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.make_token(3600)}")
+        self.client.get("/api/tasks/")
+        with CaptureQueriesContext(connection) as fresh:
+            response = self.client.get("/api/tasks/")
+        self.assertNotIn("X-New-Access-Token", response)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.make_token(60)}")
+        with self.assertNumQueries(len(fresh.captured_queries)):
+            response = self.client.get("/api/tasks/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        from rest_framework_simplejwt.tokens import AccessToken
+        new_token = AccessToken(response["X-New-Access-Token"])
+        self.assertEqual(new_token["user_id"], str(self.user.pk))
+        self.assertEqual(new_token["role"], "developer")
+
+    def test_token_is_decoded_once(self):
+        """Test authentication and refresh share one decoded token"""
+        from unittest import mock
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.make_token(60)}")
+        original = JWTAuthentication.get_validated_token
+        with mock.patch.object(
+            JWTAuthentication, "get_validated_token", autospec=True, side_effect=original
+        ) as validate:
+            response = self.client.get("/api/auth/me/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("X-New-Access-Token", response)
+        self.assertEqual(validate.call_count, 1)
+
+
+class SessionActivityTest(APITestCase):
+    """Test UserSession.last_seen is written behind in batches"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="active",
+            email="active@test.com",
+            password="pass123",
+            is_email_verified=True
+        )
+
+    def make_recorder(self, **config):
+        from authentication.session_activity import DEFAULTS, SessionActivityRecorder
+        return SessionActivityRecorder({**DEFAULTS, "BACKGROUND": False, **config})
+
+    def test_me_does_not_write_sessions(self):
+        """Test /me/ records activity without touching UserSession"""
+        from unittest import mock
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        response = self.client.post("/api/auth/login/", {"username": "active", "password": "pass123"})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        recorder = self.make_recorder()
+
+        with mock.patch("authentication.views.session_activity", recorder):
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(5):
+                    self.assertEqual(self.client.get("/api/auth/me/").status_code, status.HTTP_200_OK)
+
+        self.assertFalse([q for q in queries.captured_queries if "usersession" in q["sql"]])
+        self.assertEqual(len(recorder._pending), 1)
+
+    def test_flush_is_one_update_per_batch(self):
+        """Test pending activity of many sessions is written in one UPDATE by primary key"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        sessions = [
+            UserSession.objects.create(user=self.user, user_agent=f"Agent{i}", ip_address="127.0.0.1")
+            for i in range(4)
+        ]
+        other = User.objects.create_user(username="idle", email="idle@test.com", password="pass123")
+        idle = UserSession.objects.create(user=other, user_agent="Agent0", ip_address="127.0.0.1")
+        UserSession.objects.update(last_seen=timezone.now() - timedelta(hours=1))
+
+        recorder = self.make_recorder()
+        moment = timezone.now()
+        for session in sessions[:3]:
+            recorder.record(self.user.id, session.user_agent, moment)
+            recorder.record(self.user.id, session.user_agent, moment)
+
+        # The ids of the batch's sessions, then one UPDATE
+        with self.assertNumQueries(2):
+            self.assertEqual(recorder.flush(), 3)
+
+        seen = {session.user_agent: session.last_seen for session in UserSession.objects.filter(user=self.user)}
+        self.assertEqual([seen[f"Agent{i}"] for i in range(3)], [moment] * 3)
+        self.assertLess(seen["Agent3"], moment)
+        idle.refresh_from_db()
+        self.assertLess(idle.last_seen, moment)
+
+    def test_failed_flush_keeps_activity(self):
+        """Test activity taken for a failed write is written by the next flush"""
+        from unittest import mock
+        from django.db import DatabaseError
+        from django.utils import timezone
+
+        session = UserSession.objects.create(user=self.user, user_agent="Agent", ip_address="127.0.0.1")
+        recorder = self.make_recorder()
+        moment = timezone.now()
+        recorder.record(self.user.id, "Agent", moment)
+        with mock.patch.object(UserSession.objects, "bulk_update", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                recorder.flush()
+
+        self.assertEqual(recorder.flush(), 1)
+        session.refresh_from_db()
+        self.assertEqual(session.last_seen, moment)
+
+    def test_resolution_skips_recent_writes(self):
+        """Test a session is not written again within the resolution"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        UserSession.objects.create(user=self.user, user_agent="Agent", ip_address="127.0.0.1")
+        recorder = self.make_recorder(RESOLUTION=60)
+        start = timezone.now()
+
+        recorder.record(self.user.id, "Agent", start)
+        recorder.flush()
+        recorder.record(self.user.id, "Agent", start + timedelta(seconds=30))
+        with self.assertNumQueries(0):
+            self.assertEqual(recorder.flush(), 0)
+
+        recorder.record(self.user.id, "Agent", start + timedelta(seconds=61))
+        self.assertEqual(recorder.flush(), 1)
+
+
+class SessionAdmissionTest(TransactionTestCase):
+    """Test the per-user session cap under concurrent logins"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="racer",
+            email="racer@test.com",
+            password="pass123",
+            is_email_verified=True
+        )
+
+    def test_newest_sessions_are_kept(self):
+        """Test admission keeps the most recently seen sessions"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from authentication.sessions import admit_session
+
+        for index in range(3):
+            UserSession.objects.create(user=self.user, user_agent=f"Old{index}", ip_address="127.0.0.1")
+        # Old1 was seen most recently, Old0 least recently
+        for index, minutes in enumerate([30, 5, 10]):
+            UserSession.objects.filter(user_agent=f"Old{index}").update(
+                last_seen=timezone.now() - timedelta(minutes=minutes)
+            )
+
+        admit_session(self.user, "New", "127.0.0.1")
+        agents = set(UserSession.objects.filter(user=self.user).values_list("user_agent", flat=True))
+        self.assertEqual(agents, {"New", "Old1", "Old2"})
+
+    def test_concurrent_logins_respect_cap(self):
+        """Test parallel logins of one user never leave more than the cap"""
+        import threading
+        import time
+        from django.db import OperationalError, connection
+        from authentication.sessions import MAX_SESSIONS, admit_session
+
+        barrier = threading.Barrier(10)
+        errors = []
+
+        def admit(index):
+            # The shared in-memory SQLite test database reports a lock held
+            # by another writer at once instead of waiting, so retry like a
+            # client would; other databases wait on the user row lock
+            for _ in range(500):
+                try:
+                    return admit_session(self.user, f"Agent{index}", "127.0.0.1")
+                except OperationalError as exc:
+                    if "locked" not in str(exc):
+                        raise
+                    time.sleep(0.005)
+            raise AssertionError("Session admission never got the lock")
+
+        def login(index):
+            try:
+                barrier.wait()
+                admit(index)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=login, args=(index,)) for index in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(UserSession.objects.filter(user=self.user).count(), MAX_SESSIONS)
+
+    def test_benchmark_command(self):
+        """Test the login benchmark runs and reports the cap held"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        from django.core.management import CommandError
+        from authentication.user_cache import claims_version
+
+        with self.assertRaises(CommandError):
+            call_command("benchmark_logins", users=1, logins=6, threads=1, stdout=StringIO())
+
+        version = claims_version(self.user.pk)
+        out = StringIO()
+        call_command("benchmark_logins", users=1, logins=6, threads=1, allow_writes=True, stdout=out)
+        self.assertIn("logins/s", out.getvalue())
+        self.assertIn("Session cap held", out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith="login-benchmark-").exists())
+        # Creating and deleting the benchmark users leaves others' claims current
+        self.assertEqual(claims_version(self.user.pk), version)
+
+
+class TokenRevocationTest(APITestCase):
+    """Test refresh, rotation and the in-memory revoked token set"""
+
+    def setUp(self):
+        from authentication.revocation import revoked
+        revoked.clear_local()
+        self.addCleanup(revoked.clear_local)
+        self.user = User.objects.create_user(
+            username="rotator",
+            email="rotator@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        response = self.client.post("/api/auth/login/", {
+            "username": "rotator",
+            "password": "pass123"
+        })
+        self.refresh_token = response.data["refresh"]
+
+    def test_refresh_rotates_and_rejects_reuse(self):
+        """Test a refresh token can be rotated once"""
+        response = self.client.post("/api/auth/refresh/", {"refresh": self.refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+        self.assertNotEqual(response.data["refresh"], self.refresh_token)
+
+        reused = self.client.post("/api/auth/refresh/", {"refresh": self.refresh_token})
+        self.assertEqual(reused.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        rotated = self.client.post("/api/auth/refresh/", {"refresh": response.data["refresh"]})
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+
+    def test_revocation_check_needs_no_query(self):
+        """Test the blacklist check is a memory lookup between syncs"""
+        from authentication.revocation import RevocableRefreshToken, revoked
+
+        revoked.sync()
+        with self.assertNumQueries(0):
+            for _ in range(20):
+                RevocableRefreshToken(self.refresh_token)
+
+    def test_other_workers_sync_by_high_water_mark(self):
+        """Test tokens blacklisted elsewhere are picked up by the next sync"""
+        from authentication.revocation import RevokedTokenSet
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        worker = RevokedTokenSet(sync_interval=3600)
+        token = RefreshToken(self.refresh_token)
+        self.assertNotIn(token["jti"], worker)
+
+        token.blacklist()
+        # Within the interval the worker has not seen it yet
+        self.assertNotIn(token["jti"], worker)
+        with self.assertNumQueries(1):
+            self.assertEqual(worker.sync(), 1)
+        self.assertIn(token["jti"], worker)
+        self.assertEqual(worker.sync(), 0)
+
+    def test_rotation_is_rejected_for_already_blacklisted_token(self):
+        """Test rotation fails when another worker blacklisted the token first"""
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        from unittest import mock
+        from authentication.revocation import revoked
+
+        revoked.sync()
+        # Blacklisted after this worker's last sync
+        RefreshToken(self.refresh_token).blacklist()
+        with mock.patch.object(revoked, "sync_interval", 3600):
+            response = self.client.post("/api/auth/refresh/", {"refresh": self.refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_compaction_removes_expired_tokens(self):
+        """Test the compaction command deletes expired token rows only"""
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired["jti"]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        call_command("compact_revoked_tokens", sleep=0, stdout=StringIO())
+        self.assertFalse(OutstandingToken.objects.filter(jti=expired["jti"]).exists())
+        self.assertFalse(BlacklistedToken.objects.filter(token__jti=expired["jti"]).exists())
+        self.assertTrue(OutstandingToken.objects.filter(expires_at__gt=timezone.now()).exists())
+
+
+class EmailOutboxTest(TestCase):
+    """Test the transactional email outbox and its batched sender"""
+
+    def setUp(self):
+        from django.conf import settings
+        self.config = {**settings.EMAIL_OUTBOX, "EAGER": False, "BACKGROUND": False, "BACKOFF_SECONDS": 30}
+
+    def enqueue(self, count):
+        from authentication import outbox
+        with self.settings(EMAIL_OUTBOX=self.config):
+            return [
+                outbox.enqueue(f"Subject {i}", "Body", [f"user{i}@test.com"])
+                for i in range(count)
+            ]
+
+    def test_registration_queues_email_in_transaction(self):
+        """Test registration stores the verification email before sending it"""
+        from authentication.models import EmailOutbox
+
+        with self.settings(EMAIL_OUTBOX=self.config):
+            response = self.client.post("/api/auth/register/", {
+                "username": "queued",
+                "email": "queued@test.com",
+                "password": "securepass123",
+                "role": "developer"
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.recipients, ["queued@test.com"])
+        self.assertEqual(email.state, EmailOutbox.State.PENDING)
+
+    def test_batch_uses_one_connection(self):
+        """Test a batch is sent over a single mail connection"""
+        from unittest import mock
+        from django.core.mail import get_connection
+        from authentication import outbox
+        from authentication.models import EmailOutbox
+
+        self.enqueue(5)
+        connections = []
+
+        def counting_connection(*args, **kwargs):
+            connections.append(get_connection(*args, **kwargs))
+            return connections[-1]
+
+        with self.settings(EMAIL_OUTBOX=self.config):
+            with mock.patch("authentication.outbox.get_connection", side_effect=counting_connection):
+                self.assertEqual(outbox.send_pending(), 5)
+
+        self.assertEqual(len(connections), 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(EmailOutbox.objects.filter(state=EmailOutbox.State.SENT).count(), 5)
+        with self.settings(EMAIL_OUTBOX=self.config):
+            self.assertEqual(outbox.send_pending(), 0)
+
+    def test_failures_are_retried_with_backoff(self):
+        """Test failed sends are rescheduled with growing delays, then given up"""
+        from unittest import mock
+        from django.utils import timezone
+        from authentication import outbox
+        from authentication.models import EmailOutbox
+
+        email, = self.enqueue(1)
+        config = {**self.config, "MAX_ATTEMPTS": 3}
+
+        failing = mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=ConnectionRefusedError("mail server down"),
+        )
+        with self.settings(EMAIL_OUTBOX=config):
+            with failing, self.assertLogs("authentication.outbox", level="WARNING"):
+                self.assertEqual(outbox.send_pending(), 0)
+                email.refresh_from_db()
+                self.assertEqual(email.state, EmailOutbox.State.PENDING)
+                self.assertEqual(email.attempts, 1)
+                self.assertIn("mail server down", email.last_error)
+                delay = (email.next_attempt_at - timezone.now()).total_seconds()
+                self.assertAlmostEqual(delay, 30, delta=2)
+
+                # Not due yet
+                self.assertEqual(outbox.send_pending(), 0)
+                self.assertEqual(outbox.backoff(2, config), 60)
+
+                for _ in range(2):
+                    EmailOutbox.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+                    outbox.send_pending()
+
+            email.refresh_from_db()
+            self.assertEqual(email.state, EmailOutbox.State.FAILED)
+            self.assertEqual(email.attempts, 3)
+            self.assertEqual(len(mail.outbox), 0)
+
+    def test_expired_lease_is_claimed_again(self):
+        """Test emails left sending by a crashed sender are picked up later"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from authentication import outbox
+        from authentication.models import EmailOutbox
+
+        self.enqueue(2)
+        with self.settings(EMAIL_OUTBOX=self.config):
+            claimed = outbox.claim_batch()
+            self.assertEqual(len(claimed), 2)
+            self.assertEqual(outbox.claim_batch(), [])
+
+            EmailOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(outbox.send_pending(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+    def test_sender_sleeps_until_next_retry(self):
+        """Test the sender thread sweeps again when the next retry is due"""
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from authentication import outbox
+        from authentication.models import EmailOutbox
+
+        self.assertIsNone(outbox.seconds_until_due())
+        email = self.enqueue(1)[0]
+        EmailOutbox.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now() + timedelta(seconds=20))
+        self.assertAlmostEqual(outbox.seconds_until_due(), 20, delta=2)
+
+        class Stop(Exception):
+            pass
+
+        with self.settings(EMAIL_OUTBOX=self.config), \
+                mock.patch.object(outbox, "send_pending") as send_pending, \
+                mock.patch.object(outbox.connection, "close"), \
+                mock.patch.object(outbox._wakeup, "wait", side_effect=Stop) as wait:
+            with self.assertRaises(Stop):
+                outbox._sender_loop()
+        send_pending.assert_called_once()
+        self.assertAlmostEqual(wait.call_args.args[0], 20, delta=2)
+
+    def test_wake_during_drain_is_not_lost(self):
+        """Test an email enqueued while the sender drains makes it drain again"""
+        from unittest import mock
+        from authentication import outbox
+
+        drains = []
+
+        def drain():
+            drains.append(1)
+            if len(drains) == 1:
+                outbox.wake_sender()
+            return 0
+
+        waits = []
+
+        def wait(timeout):
+            waits.append(outbox._wakeup.is_set())
+            if len(waits) == 2:
+                raise KeyboardInterrupt
+            return True
+
+        alive = mock.Mock(is_alive=mock.Mock(return_value=True))
+        with mock.patch.object(outbox, "send_pending", side_effect=drain), \
+                mock.patch.object(outbox, "seconds_until_due", return_value=None), \
+                mock.patch.object(outbox.connection, "close"), \
+                mock.patch.object(outbox, "_sender", alive), \
+                mock.patch.object(outbox._wakeup, "wait", side_effect=wait):
+            with self.assertRaises(KeyboardInterrupt):
+                outbox._sender_loop()
+        # The first wait returns at once; the second drain found nothing new
+        self.assertEqual(waits, [True, False])
+        self.assertEqual(len(drains), 2)
+
+
+class StaffDirectoryTest(APITestCase):
+    """Test the cached staff directory endpoint"""
+
+    def setUp(self):
+        from authentication.staff_directory import directory_cache
+        directory_cache.invalidate()
+        self.url = "/api/auth/staff/"
+        self.manager = User.objects.create_user(
+            username="boss", email="boss@test.com", password="pass123",
+            role="manager", is_email_verified=True
+        )
+        for name in ["alice", "albert", "bob"]:
+            User.objects.create_user(
+                username=name, email=f"{name}@test.com", password="pass123",
+                role="developer", is_email_verified=True
+            )
+        self.auditor = User.objects.create_user(
+            username="audrey", email="audrey@test.com", password="pass123",
+            role="auditor", is_email_verified=True
+        )
+        self.client.force_authenticate(self.manager)
+
+    def names(self, response):
+        data = response.json()
+        rows = data["results"] if isinstance(data, dict) else data
+        return [row["username"] for row in rows]
+
+    def test_list_is_cached_with_etag(self):
+        """Test the list is served from cache and revalidated with ETags"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(response), ["albert", "alice", "bob", "boss"])
+        etag = response["ETag"]
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(self.url)
+        self.assertEqual(again.content, response.content)
+        self.assertFalse([q for q in queries if "authentication_user" in q["sql"]])
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b"")
+
+    def test_changes_to_staff_invalidate(self):
+        """Test saving or deleting staff, or leaving a staff role, refreshes the list"""
+        etag = self.client.get(self.url)["ETag"]
+
+        # Auditors are not listed, so changing one keeps the cached list
+        self.auditor.first_name = "Audrey"
+        self.auditor.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        bob = User.objects.get(username="bob")
+        bob.role = "auditor"
+        bob.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("bob", self.names(response))
+
+        User.objects.get(username="alice").delete()
+        self.assertNotIn("alice", self.names(self.client.get(self.url)))
+
+    def test_saves_read_only_the_id_set(self):
+        """Test saving a user checks the listed ids, not the cached directory"""
+        from unittest import mock
+        from authentication.staff_directory import CACHE_KEY, directory_cache
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.content, directory_cache.get(CACHE_KEY)["body"])
+
+        with mock.patch.object(directory_cache, "get", wraps=directory_cache.get) as get:
+            self.auditor.first_name = "Audrey"
+            self.auditor.save()
+        self.assertNotIn(CACHE_KEY, [call.args[0] for call in get.call_args_list])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_prefix_search_and_pagination(self):
+        """Test q filters by username or email prefix and page paginates"""
+        self.assertEqual(self.names(self.client.get(self.url, {"q": "AL"})), ["albert", "alice"])
+        self.assertEqual(self.names(self.client.get(self.url, {"q": "boss@"})), ["boss"])
+        self.assertEqual(self.names(self.client.get(self.url, {"q": "zed"})), [])
+
+        response = self.client.get(self.url, {"page": 1, "page_size": 3})
+        data = response.json()
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(self.names(response), ["albert", "alice", "bob"])
+        self.assertIsNone(data["previous"])
+        second = self.client.get(data["next"])
+        self.assertEqual(self.names(second), ["boss"])
+        self.assertIsNone(second.json()["next"])
+
+        filtered = self.client.get(self.url, {"q": "al"})
+        self.assertNotEqual(filtered["ETag"], response["ETag"])
+        self.assertEqual(
+            self.client.get(self.url, {"q": "al"}, HTTP_IF_NONE_MATCH=filtered["ETag"]).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        self.assertEqual(self.client.get(self.url, {"page": "x"}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,122 @@
+"""
+Per-process LRU cache of users for token authentication.
+
+Users are cached as field values in the ``users`` namespace of the tiered
+cache (see tasks/tiered_cache.py), without the password hash. Any change to
+a user other than a ``last_login`` update drops that user's entry and gives
+them a new claims version, so every process sees the change within
+``L1_TTL`` seconds. Other users' entries are kept.
+
+A user's claims version is also embedded in their access tokens as the
+``cv`` claim: a token issued at the user's current version carries
+up-to-date claims and needs no lookup at all. Versions are random rather
+than counted, so one that was evicted from the cache is never handed out
+again for old tokens to match.
+"""
+import secrets
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from tasks.tiered_cache import get_cache
+
+from .models import ClaimsUser
+
+User = get_user_model()
+
+TIMEOUT = getattr(settings, "USER_CACHE_TIMEOUT", 300)
+# Never cached; loaded from the database if a caller needs it
+UNCACHED_FIELDS = {"password"}
+
+users = get_cache("users")
+
+
+def cached_attnames():
+    return [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname not in UNCACHED_FIELDS
+    ]
+
+
+def claims_version(pk):
+    """Current claims version of user ``pk``; changes whenever the user does"""
+    return users.get_or_set(f"cv:{pk}", new_version, version_timeout())
+
+
+def new_version():
+    return secrets.randbits(48)
+
+
+def version_timeout():
+    # Tokens older than this have expired anyway
+    return int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+def get_values(pk):
+    """Cached field values of user ``pk`` as a dict, or None if there is no such user"""
+    key = str(pk)
+    values = users.get(key)
+    if values is None:
+        attnames = cached_attnames()
+        row = User.objects.filter(pk=pk).values_list(*attnames).first()
+        if row is None:
+            return None
+        values = dict(zip(attnames, row))
+        users.set(key, values, TIMEOUT)
+    return values
+
+
+def build_user(values):
+    """ClaimsUser from a dict of field values; missing fields are deferred"""
+    # from_db() expects the values in model field order
+    attnames = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return ClaimsUser.from_db(DEFAULT_DB_ALIAS, attnames, [values[attname] for attname in attnames])
+
+
+def get_user(pk):
+    """User ``pk`` with every field but the password loaded, or None"""
+    values = get_values(pk)
+    if values is None:
+        return None
+    return build_user(values)
+
+
+def from_claims(pk, claims):
+    """User built from token claims alone; other fields are deferred"""
+    return build_user({"id": pk, **claims})
+
+
+# ---------- Invalidation ----------
+
+def forget(pk):
+    users.delete(str(pk))
+    users.set(f"cv:{pk}", new_version(), version_timeout())
+
+
+def invalidate(pk):
+    # Now for this process, and again once committed so other processes do
+    # not keep values, or issue tokens from claims, read before the commit
+    forget(pk)
+    transaction.on_commit(lambda: forget(pk))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+def invalidate_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        # Only drop a stale entry that a reused primary key could hit
+        users.delete(str(instance.pk))
+        return
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=ClaimsUser)
+def invalidate_on_delete(sender, instance, **kwargs):
+    invalidate(instance.pk)
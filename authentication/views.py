@@ -1,22 +1,25 @@
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.permissions import IsAuthenticated
 from authentication.models import User
-from authentication.serializers import CustomTokenObtainPairSerializer, RegisterSerializer, UserMinimalSerializer
+from authentication.serializers import CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, RegisterSerializer
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.utils.timezone import now
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import AccessToken
+from tasks.login_failures import tracker as failures
+from tasks.middlewares.security import get_client_ip
 
-from .models import UserSession
+from . import staff_directory
+from .revocation import RevocableRefreshToken, revoke
+from .session_activity import recorder as session_activity
 
 
     
@@ -33,8 +36,7 @@ class LogoutView(APIView):
             )
 
         try:
-            token = RefreshToken(refresh_token)
-            token.blacklist()
+            revoke(RevocableRefreshToken(refresh_token))
         except Exception:
             return Response(
                 {"detail": "Invalid or expired token"},
@@ -75,42 +77,89 @@ class VerifyEmailView(APIView):
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            username = request.data.get("username")
+            failures.record(get_client_ip(request), username if isinstance(username, str) else "")
+            raise
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
 class MeView(APIView):
-    authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        token = request.auth  
 
-        UserSession.objects.filter(
-            user=user,
-            user_agent=request.META.get("HTTP_USER_AGENT", "")
-        ).update(last_seen=now())
+        # Written behind, at most once per SESSION_ACTIVITY resolution
+        session_activity.record(user.id, request.META.get("HTTP_USER_AGENT", ""))
 
-        response = Response({
+        # A near-expiry token is replaced by SilentRefreshMiddleware
+        return Response({
             "id": user.id,
             "username": user.username,
             "email": user.email,
             "role": getattr(user, "role", None),
         })
-
-        exp_timestamp = token["exp"]
-        remaining_seconds = exp_timestamp - int(now().timestamp())
-
-        if remaining_seconds <= 120:  # last 2 minutes
-            new_token = AccessToken.for_user(user)
-            response["X-New-Access-Token"] = str(new_token)
-
-        return response
     
 class ManagerDeveloperListView(APIView):
+    """
+    Managers and developers, served from the cached staff directory.
+    Supports ``?q=`` username/email prefix search and, when ``page`` is
+    given, page-number pagination with ``page_size``.
+    """
     permission_classes = [IsAuthenticated]
+    renderer_classes = [staff_directory.DirectoryJSONRenderer, BrowsableAPIRenderer]
+    default_page_size = 50
+    max_page_size = 500
 
     def get(self, request):
-        users = User.objects.filter(
-            role__in=["manager", "developer"]
-        ).order_by("username")
+        directory = staff_directory.get_directory()
+        query = request.query_params.get("q", "").strip()
+        page = request.query_params.get("page")
+
+        full = not query and page is None
+
+        if full:
+            etag = directory["etag"]
+        else:
+            # Results only change with the directory, so the ETag is derived
+            # from its ETag and the query
+            etag = staff_directory.make_etag(
+                f"{directory['etag']}|{query}|{page}|{request.query_params.get('page_size', '')}".encode()
+            )
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in self.if_none_match(request):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if full:
+            # The JSON renderer sends the cached body instead of rendering rows
+            self.prerendered = directory["body"]
+            return Response(directory["rows"], headers=headers)
+
+        rows = staff_directory.search(directory, query) if query else directory["rows"]
+        return Response(self.paginate(request, rows) if page is not None else rows, headers=headers)
 
-        serializer = UserMinimalSerializer(users, many=True)
-        return Response(serializer.data)
+    def if_none_match(self, request):
+        header = request.headers.get("If-None-Match", "")
+        return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+    def paginate(self, request, rows):
+        try:
+            page = max(1, int(request.query_params.get("page", 1)))
+            page_size = int(request.query_params.get("page_size", self.default_page_size))
+        except ValueError:
+            raise ValidationError({"page": "Expected integers for page and page_size."})
+        page_size = max(1, min(page_size, self.max_page_size))
+
+        start = (page - 1) * page_size
+        url = request.build_absolute_uri()
+        return {
+            "count": len(rows),
+            "next": replace_query_param(url, "page", page + 1) if start + page_size < len(rows) else None,
+            "previous": replace_query_param(url, "page", page - 1) if page > 1 else None,
+            "results": rows[start:start + page_size],
+        }
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notifications'
+
+    def ready(self):
+        from . import unread  # noqa: F401  (keeps unread counters up to date)
+        from . import stream  # noqa: F401  (publishes saves to open event streams)
+        from . import signals  # noqa: F401  (creates escalation notifications)
@@ -0,0 +1,55 @@
+"""
+Coalescing of repeated notifications.
+
+``notify`` folds a notification into the user's unread one for the same
+task and kind created in the last ``NOTIFICATION_COALESCE_WINDOW``
+seconds: that row gets the newest message and its ``count`` goes up, so a
+burst of escalations is one row in the list and one unread. The merged
+row is saved with a new ``updated_at``, which publishes it to open event
+streams again and lets pollers and reconnecting streams find it.
+
+The task row is locked while looking for a recent notification, so two
+concurrent first calls for a task cannot both find none and insert two.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from tasks.models import Task
+
+from .models import Notification
+
+
+def get_window():
+    return getattr(settings, "NOTIFICATION_COALESCE_WINDOW", 600)
+
+
+def notify(user, message, task=None, kind=Notification.Kind.GENERAL, now=None):
+    """Create a notification or merge it into a recent one; returns the row"""
+    window = get_window()
+    if task is not None and window:
+        now = now or timezone.now()
+        with transaction.atomic():
+            list(Task.objects.select_for_update().filter(pk=task.pk).values_list("pk", flat=True))
+            recent = (
+                Notification.objects.select_for_update()
+                .filter(
+                    user=user,
+                    task=task,
+                    kind=kind,
+                    read=False,
+                    created_at__gte=now - timedelta(seconds=window),
+                )
+                .order_by("-created_at", "-id")
+                .first()
+            )
+            if recent is not None:
+                recent.count += 1
+                recent.message = message
+                recent.save(update_fields=["count", "message", "updated_at"])
+                return recent
+            return Notification.objects.create(user=user, task=task, kind=kind, message=message)
+
+    return Notification.objects.create(user=user, task=task, kind=kind, message=message)
@@ -1,15 +1,132 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
 from django.conf import settings
 from tasks.models import Task
 
 User = settings.AUTH_USER_MODEL
 
+
+class NotificationQuerySet(models.QuerySet):
+    def _lock_unread_users(self):
+        # One user id per unread row, locked so concurrent calls cannot
+        # count the same rows twice
+        return Counter(self.filter(read=False).select_for_update().values_list("user_id", flat=True))
+
+    def mark_read(self, user_id=None):
+        """
+        Mark the unread notifications read; returns how many were. Pass
+        ``user_id`` when they all belong to one user: the counter is then
+        adjusted by the UPDATE's row count, without locking the rows first.
+        """
+        if user_id is not None:
+            with transaction.atomic():
+                updated = self.filter(user_id=user_id, read=False).update(read=True)
+                UnreadCount.objects.adjust({user_id: -updated})
+            return updated
+
+        with transaction.atomic():
+            unread = self._lock_unread_users()
+            if not unread:
+                return 0
+            updated = self.filter(read=False).update(read=True)
+            UnreadCount.objects.adjust({user_id: -count for user_id, count in unread.items()})
+        return updated
+
+    def delete(self):
+        with transaction.atomic():
+            unread = self._lock_unread_users()
+            result = super().delete()
+            UnreadCount.objects.adjust({user_id: -count for user_id, count in unread.items()})
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Notification(models.Model):
+    class Kind(models.TextChoices):
+        GENERAL = "general", "General"
+        PRIORITY_ESCALATED = "priority_escalated", "Priority escalated"
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     task = models.ForeignKey(Task, on_delete=models.CASCADE, null=True, blank=True)
+    kind = models.CharField(max_length=32, choices=Kind.choices, default=Kind.GENERAL)
     message = models.TextField()
+    # Occurrences merged into this row (see notifications/coalescing.py)
+    count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also moves when another occurrence is merged in, so streams resend it
+    updated_at = models.DateTimeField(auto_now=True)
     read = models.BooleanField(default=False)
 
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Newest-first pages of a user's notifications
+            models.Index(fields=["user", "-created_at", "-id"], name="notif_user_created_idx"),
+            models.Index(fields=["user", "read"], name="notif_user_read_idx"),
+            # Notifications saved since a stream's last poll or event
+            models.Index(fields=["user", "updated_at"], name="notif_user_updated_idx"),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user}"
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            if not self.read:
+                UnreadCount.objects.adjust({self.user_id: -1})
+            return super().delete(*args, **kwargs)
+
+
+class UnreadCountManager(models.Manager):
+    def get_count(self, user_id):
+        """
+        Unread notifications of a user. The counter is created from a count
+        the first time it is read; after that it is kept up to date by
+        ``adjust`` and reading it is a primary key lookup.
+        """
+        unread = self.filter(user_id=user_id).values_list("unread", flat=True).first()
+        if unread is not None:
+            return unread
+        count = Notification.objects.filter(user_id=user_id, read=False).count()
+        counter, _ = self.get_or_create(user_id=user_id, defaults={"unread": count})
+        return counter.unread
+
+    def adjust(self, deltas):
+        """
+        Add ``deltas`` (user id -> change) to existing counters in one
+        UPDATE. Users without a counter are skipped: theirs is counted
+        when first read.
+        """
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        change = Case(
+            *(When(user_id=user_id, then=Value(delta)) for user_id, delta in deltas.items()),
+            default=Value(0),
+        )
+        return self.filter(user_id__in=deltas).update(unread=Greatest(F("unread") + change, Value(0)))
+
+    def recount(self, user_ids=None):
+        """Reset counters from the notifications table"""
+        counters = self.all() if user_ids is None else self.filter(user_id__in=user_ids)
+        for user_id in list(counters.values_list("user_id", flat=True)):
+            unread = Notification.objects.filter(user_id=user_id, read=False).count()
+            self.filter(user_id=user_id).update(unread=unread)
+
+
+class UnreadCount(models.Model):
+    """Denormalized number of unread notifications per user"""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    unread = models.PositiveIntegerField(default=0)
+
+    objects = UnreadCountManager()
+
+    def __str__(self):
+        return f"{self.unread} unread for {self.user_id}"
@@ -6,4 +6,24 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notification
-        fields = ['id', 'task', 'task_title', 'message', 'created_at']
+        fields = ['id', 'task', 'task_title', 'kind', 'message', 'count', 'created_at', 'updated_at', 'read']
+        read_only_fields = ['kind', 'count', 'read']
+
+
+class MarkReadSerializer(serializers.Serializer):
+    """Either ``ids`` or ``up_to``: a notification id or a stream event id"""
+
+    ids = serializers.ListField(child=serializers.IntegerField(), max_length=1000, required=False)
+    up_to = serializers.CharField(required=False)
+
+    def validate_up_to(self, value):
+        # Stream event ids start with the highest notification id sent
+        try:
+            return int(value.split("-", 1)[0])
+        except ValueError:
+            raise serializers.ValidationError("Must be a notification id or a stream event id.")
+
+    def validate(self, attrs):
+        if ("ids" in attrs) == ("up_to" in attrs):
+            raise serializers.ValidationError("Provide exactly one of ids or up_to.")
+        return attrs
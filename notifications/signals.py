@@ -1,16 +1,26 @@
 from django.dispatch import receiver
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_save
 
+from .coalescing import notify
 from .models import Notification
 from tasks.models import Task
 
 
 @receiver(post_save, sender=Task)
 def create_priority_notification(sender, instance, created, **kwargs):
+    """
+    The one place escalation notifications are created, for tasks that
+    PriorityEscalationMiddleware escalated; it leaves the previous priority
+    in ``_priority_old``.
+    """
     old_priority = getattr(instance, "_priority_old", None)
-    if old_priority:
-        Notification.objects.create(
-            user=instance.assigned_to,
-            task=instance,
-            message=f"Priority escalated from {old_priority} to {instance.priority}"
-        )
+    if not old_priority:
+        return
+    # Later saves of the same instance are not new escalations
+    instance._priority_old = None
+    notify(
+        instance.assigned_to,
+        f"Priority of task '{instance.title}' escalated from {old_priority} to {instance.priority} due to upcoming deadline.",
+        task=instance,
+        kind=Notification.Kind.PRIORITY_ESCALATED,
+    )
@@ -0,0 +1,458 @@
+"""
+Server-Sent Events stream of a user's notifications and task changes.
+
+``GET /api/notifications/stream/`` keeps one coroutine per connection
+waiting on its own queue, so an open tab costs a little memory and no
+requests. ``broker`` fans events out to those queues: the ``post_save``
+receivers below publish each committed ``Notification`` to its user and
+each committed ``Task`` change, saved or written in bulk through
+tasks/changes.py, to its assignee and creator.
+
+The broker only sees saves made in its own process. When requests are
+served by several processes, a poller in each process reads the
+notifications and tasks saved since its last poll every
+``POLL_INTERVAL`` seconds, one query per table for all connections of the
+process, and publishes them too. Connections drop events they have sent
+already.
+
+Every event id is ``<notification id>-<microseconds>-<microseconds>``: the
+highest notification id sent, which ``mark-read`` accepts as ``up_to``,
+then the time of the newest notification change sent and of the newest
+task change sent, each advanced only by events of its own kind. The
+stream resumes from the two times. A client that reconnects
+with ``Last-Event-ID`` first gets the notifications and task changes it
+missed, read from the database. Under WSGI, which cannot hold the
+connection open, the stream sends those and ends, and the client
+reconnects after ``RETRY_MS``.
+
+Timestamps are set before the row commits, so a transaction that commits
+late saves rows older than ones already read. Polls and replays therefore
+reach ``OVERLAP_SECONDS`` back; the poller and each connection drop what
+they have seen, but a client that reconnects may get an event from that
+window twice and should ignore repeated ``(id, count)`` notifications and
+task snapshots. A transaction open longer than that can still be missed.
+
+Browsers' EventSource cannot send an Authorization header, so the client
+first gets a ticket from ``POST /api/notifications/stream-ticket/`` and
+passes it as ``?ticket=``. A ticket is valid for ``TICKET_MAX_AGE``
+seconds and carries no credentials, so a copy left in an access log is of
+little use.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from authentication import user_cache
+from authentication.authentication import ClaimsJWTAuthentication
+from tasks.changes import tasks_changed
+from tasks.models import Task
+
+from .models import Notification
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # A comment line is sent this often so proxies keep the connection open
+    "HEARTBEAT_SECONDS": 15,
+    # Events waiting for a slow connection; past this it is closed and resumes
+    "QUEUE_SIZE": 100,
+    # Milliseconds the client waits before reconnecting
+    "RETRY_MS": 3000,
+    # Missed notifications and task changes replayed on reconnect, each
+    "BACKLOG_LIMIT": 100,
+    # Seconds between polls for saves made by other processes; 0 disables
+    "POLL_INTERVAL": 5.0,
+    # Seconds polls and replays reach back for rows that committed late
+    "OVERLAP_SECONDS": 5.0,
+    # Seconds a stream ticket can be used to open a connection
+    "TICKET_MAX_AGE": 60,
+}
+
+TICKET_SALT = "notifications.stream"
+
+TASK_FIELDS = ["id", "title", "status", "priority", "assigned_to_id", "created_by_id", "deadline", "updated_at"]
+
+# Events remembered per connection to drop duplicates
+SEEN_LIMIT = 1000
+
+CLOSE = object()
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "NOTIFICATION_STREAM", {})}
+
+
+def to_micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class Event:
+    """A change to send to ``user_ids``"""
+
+    __slots__ = ("kind", "user_ids", "data", "notification_id", "moment")
+
+    def __init__(self, kind, user_ids, data, moment, notification_id=None):
+        self.kind = kind
+        self.user_ids = user_ids
+        self.data = data
+        self.moment = moment
+        self.notification_id = notification_id
+
+    @property
+    def key(self):
+        if self.kind == "notification":
+            # A coalesced notification is sent again with its new count
+            return ("notification", self.notification_id, self.data["count"])
+        return (self.kind, self.data["id"], to_micros(self.moment))
+
+    @classmethod
+    def for_notification(cls, notification):
+        return cls(
+            "notification",
+            [notification.user_id],
+            NotificationSerializer(notification).data,
+            notification.updated_at,
+            notification_id=notification.pk,
+        )
+
+    @classmethod
+    def for_task(cls, task):
+        data = {field.removesuffix("_id"): getattr(task, field) for field in TASK_FIELDS}
+        user_ids = {task.assigned_to_id, task.created_by_id} - {None}
+        return cls("task", list(user_ids), data, task.updated_at)
+
+
+class Subscription:
+    def __init__(self, user_id, loop, queue_size):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def put(self, event):
+        # Runs on the subscription's loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind: close, the client resumes from the database
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(CLOSE)
+
+
+class EventBroker:
+    def __init__(self, config=None):
+        # Without a config, settings are read on every use
+        self._config = config
+        self._subscribers = {}  # user id -> set of Subscription
+        self._lock = threading.Lock()
+        self._poller = None
+        self._polled_since = None
+        self._polled = {}  # key -> moment of events the poller published
+
+    @property
+    def config(self):
+        return self._config or get_config()
+
+    def subscribe(self, user_id):
+        """Register a queue for ``user_id``; call from the connection's event loop"""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.config["QUEUE_SIZE"])
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        if self.config["POLL_INTERVAL"]:
+            self._ensure_poller()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_ids):
+        return any(user_id in self._subscribers for user_id in user_ids)
+
+    def publish(self, event):
+        """Hand ``event`` to its users' connections; safe from any thread"""
+        with self._lock:
+            subscriptions = [
+                subscription
+                for user_id in event.user_ids
+                for subscription in self._subscribers.get(user_id, ())
+            ]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The connection's loop is closed
+                self.unsubscribe(subscription)
+
+    # ---------- Saves made by other processes ----------
+    def _ensure_poller(self):
+        if self._poller is not None and not self._poller.done():
+            return
+        self._poller = asyncio.get_running_loop().create_task(self._poll())
+
+    async def _poll(self):
+        await sync_to_async(self._start_polling)()
+        while self._subscribers:
+            await asyncio.sleep(self.config["POLL_INTERVAL"])
+            try:
+                await sync_to_async(self.poll_once)()
+            except Exception:
+                logger.exception("Failed to poll for notification stream events")
+
+    def _start_polling(self):
+        self._polled_since = timezone.now()
+        self._polled = {}
+
+    def poll_once(self):
+        """Publish notifications and task changes saved since the last poll"""
+        user_ids = list(self._subscribers)
+        if not user_ids:
+            return 0
+        now = timezone.now()
+        since = self._polled_since - timedelta(seconds=self.config["OVERLAP_SECONDS"])
+        notifications = (
+            Notification.objects.filter(user_id__in=user_ids, updated_at__gt=since)
+            .select_related("task")
+            .order_by("updated_at", "id")
+        )
+        tasks = Task.objects.filter(
+            Q(assigned_to_id__in=user_ids) | Q(created_by_id__in=user_ids), updated_at__gt=since
+        ).only(*TASK_FIELDS).order_by("updated_at")
+        events = [Event.for_notification(n) for n in notifications] + [Event.for_task(t) for t in tasks]
+
+        published = 0
+        for event in events:
+            if event.key not in self._polled:
+                self._polled[event.key] = event.moment
+                self.publish(event)
+                published += 1
+        # Only keys the next overlap can return again are worth keeping
+        next_since = now - timedelta(seconds=self.config["OVERLAP_SECONDS"])
+        self._polled = {key: moment for key, moment in self._polled.items() if moment > next_since}
+        self._polled_since = now
+        return published
+
+
+broker = EventBroker()
+
+
+# ---------- Publishing ----------
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, raw=False, **kwargs):
+    if raw or not broker.has_subscribers([instance.user_id]):
+        return
+    transaction.on_commit(lambda: broker.publish(Event.for_notification(instance)))
+
+
+@receiver(post_save, sender=Task)
+def publish_task(sender, instance, raw=False, **kwargs):
+    if raw or not broker.has_subscribers([instance.assigned_to_id, instance.created_by_id]):
+        return
+    transaction.on_commit(lambda: broker.publish(Event.for_task(instance)))
+
+
+@receiver(tasks_changed)
+def publish_tasks_changed(sender, task_ids, **kwargs):
+    # Bulk writes, sent once committed; only tasks someone here follows are read
+    user_ids = list(broker._subscribers)
+    if not user_ids:
+        return
+    tasks = Task.objects.filter(
+        Q(assigned_to_id__in=user_ids) | Q(created_by_id__in=user_ids), id__in=task_ids
+    ).only(*TASK_FIELDS)
+    for task in tasks:
+        broker.publish(Event.for_task(task))
+
+
+# ---------- Connections ----------
+
+class Cursor:
+    """
+    Position of a connection in its stream, sent as the event id: the
+    newest notification and the newest task change sent, kept apart so a
+    replay cut short for one kind does not skip the other.
+    """
+
+    def __init__(self, notifications_at=None, tasks_at=None, notification_id=0, resumed=True):
+        now = timezone.now()
+        self.notification_id = notification_id
+        self.notifications_at = notifications_at or now
+        self.tasks_at = tasks_at or now
+        # Only a resumed stream reaches back for late commits; a new one
+        # starts at the time it was opened
+        self.resumed = resumed
+        self._seen = OrderedDict()
+
+    @classmethod
+    def start(cls):
+        return cls(resumed=False)
+
+    @classmethod
+    def parse(cls, last_event_id):
+        try:
+            notification_id, notifications_at, tasks_at = last_event_id.split("-")
+            return cls(from_micros(int(notifications_at)), from_micros(int(tasks_at)), int(notification_id))
+        except (AttributeError, ValueError, OverflowError, OSError):
+            return None
+
+    def __str__(self):
+        return f"{self.notification_id}-{to_micros(self.notifications_at)}-{to_micros(self.tasks_at)}"
+
+    def advance(self, event):
+        """Move past ``event``; returns False if it was sent already"""
+        if event.key in self._seen:
+            return False
+        self._seen[event.key] = True
+        while len(self._seen) > SEEN_LIMIT:
+            self._seen.popitem(last=False)
+        if event.kind == "notification":
+            self.notification_id = max(self.notification_id, event.notification_id)
+            self.notifications_at = max(self.notifications_at, event.moment)
+        else:
+            self.tasks_at = max(self.tasks_at, event.moment)
+        return True
+
+
+def missed_events(user_id, cursor, limit, overlap=0):
+    """
+    Notifications and task changes after ``cursor``, oldest first, and up
+    to ``overlap`` seconds before it when the cursor was resumed
+    """
+    overlap = timedelta(seconds=overlap if cursor.resumed else 0)
+    notifications = (
+        Notification.objects.filter(user_id=user_id, updated_at__gt=cursor.notifications_at - overlap)
+        .select_related("task")
+        .order_by("updated_at", "id")[:limit]
+    )
+    tasks = (
+        Task.objects.filter(
+            Q(assigned_to_id=user_id) | Q(created_by_id=user_id), updated_at__gt=cursor.tasks_at - overlap
+        )
+        .only(*TASK_FIELDS)
+        .order_by("updated_at", "id")[:limit]
+    )
+    events = [Event.for_notification(n) for n in notifications] + [Event.for_task(t) for t in tasks]
+    return sorted(events, key=lambda event: event.moment)
+
+
+def format_event(event, cursor):
+    data = json.dumps(event.data, cls=DjangoJSONEncoder)
+    return f"id: {cursor}\nevent: {event.kind}\ndata: {data}\n\n".encode()
+
+
+async def event_stream(user_id, cursor, config):
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f"retry: {config['RETRY_MS']}\n\n".encode()
+        # Subscribed first, so nothing saved meanwhile falls in between
+        backlog = await sync_to_async(missed_events)(
+            user_id, cursor, config["BACKLOG_LIMIT"], config["OVERLAP_SECONDS"]
+        )
+        for event in backlog:
+            if cursor.advance(event):
+                yield format_event(event, cursor)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), config["HEARTBEAT_SECONDS"])
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if event is CLOSE:
+                return
+            if cursor.advance(event):
+                yield format_event(event, cursor)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def backlog_stream(events, cursor, config):
+    yield f"retry: {config['RETRY_MS']}\n\n".encode()
+    for event in events:
+        if cursor.advance(event):
+            yield format_event(event, cursor)
+
+
+def issue_ticket(user):
+    """A short-lived ticket that opens a stream for ``user``"""
+    return signing.dumps(user.pk, salt=TICKET_SALT)
+
+
+def authenticate(request, config):
+    """
+    The user from the ``ticket`` query parameter, or from the Authorization
+    header for clients that can send one.
+    """
+    ticket = request.GET.get("ticket")
+    if ticket is None:
+        result = ClaimsJWTAuthentication().authenticate(request)
+        return result[0] if result else None
+    try:
+        user_id = signing.loads(ticket, salt=TICKET_SALT, max_age=config["TICKET_MAX_AGE"])
+    except signing.BadSignature:
+        raise AuthenticationFailed("Invalid or expired stream ticket.")
+    user = user_cache.get_user(user_id)
+    if user is None or not user.is_active:
+        raise AuthenticationFailed("Invalid or expired stream ticket.")
+    return user
+
+
+async def notification_stream(request):
+    if request.method != "GET":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+    config = get_config()
+    try:
+        user = await sync_to_async(authenticate)(request, config)
+    except (AuthenticationFailed, InvalidToken, TokenError) as exc:
+        return JsonResponse({"detail": str(exc)}, status=401)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    cursor = Cursor.parse(last_event_id) or Cursor.start()
+
+    if isinstance(request, ASGIRequest):
+        content = event_stream(user.pk, cursor, config)
+    else:
+        events = await sync_to_async(missed_events)(
+            user.pk, cursor, config["BACKLOG_LIMIT"], config["OVERLAP_SECONDS"]
+        )
+        content = backlog_stream(events, cursor, config)
+
+    response = StreamingHttpResponse(content, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stops nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -83,7 +83,7 @@ class NotificationAPITest(APITestCase):
         response = self.client.get("/api/notifications/")
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     # TODO: Fix this test - notification serializer needs to be updated
     # def test_mark_notification_read(self):
@@ -131,5 +131,454 @@ class NotificationAPITest(APITestCase):
         response = self.client.get("/api/notifications/")
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["message"], "My notification")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["message"], "My notification")
+
+    def test_list_is_paginated_newest_first(self):
+        """Test notifications are returned in cursor pages, newest first"""
+        for i in range(5):
+            Notification.objects.create(user=self.user, message=f"n{i}")
+
+        response = self.client.get("/api/notifications/", {"page_size": 2})
+        self.assertEqual([n["message"] for n in response.data["results"]], ["n4", "n3"])
+
+        seen = []
+        url = "/api/notifications/?page_size=2"
+        while url:
+            response = self.client.get(url)
+            seen += [n["message"] for n in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(seen, ["n4", "n3", "n2", "n1", "n0"])
+
+    def test_list_does_not_query_per_task(self):
+        """Test task titles are loaded with the notifications"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        for i in range(5):
+            task = Task.objects.create(title=f"Task {i}", assigned_to=self.user, created_by=self.user)
+            Notification.objects.create(user=self.user, task=task, message=f"n{i}")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/notifications/")
+        self.assertEqual(response.data["results"][0]["task_title"], "Task 4")
+        task_queries = [q for q in queries if 'FROM "tasks_task"' in q["sql"] and "notifications" not in q["sql"]]
+        # Only the priority escalation middleware's query
+        self.assertLessEqual(len(task_queries), 1)
+
+
+class UnreadCountTest(APITestCase):
+    """Test the denormalized unread notification counter"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reader",
+            email="reader@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def unread(self):
+        return self.client.get("/api/notifications/unread-count/").data["unread_count"]
+
+    def test_counter_is_created_from_existing_rows(self):
+        """Test the first read counts the table and later reads use the counter"""
+        from notifications.models import UnreadCount
+
+        Notification.objects.bulk_create(Notification(user=self.user, message=f"n{i}") for i in range(3))
+        self.assertEqual(self.unread(), 3)
+        self.assertTrue(UnreadCount.objects.filter(user=self.user, unread=3).exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(UnreadCount.objects.get_count(self.user.pk), 3)
+
+    def test_counter_follows_inserts_reads_and_deletes(self):
+        """Test creating, marking read and deleting notifications update the counter"""
+        self.assertEqual(self.unread(), 0)
+        task = Task.objects.create(title="Task", assigned_to=self.user, created_by=self.user)
+        first = Notification.objects.create(user=self.user, message="first")
+        second = Notification.objects.create(user=self.user, message="second")
+        Notification.objects.create(user=self.user, task=task, message="on task")
+        self.assertEqual(self.unread(), 3)
+
+        response = self.client.post(f"/api/notifications/{first.id}/read/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["read"])
+        self.assertEqual(self.unread(), 2)
+
+        # Marking it again changes nothing
+        self.client.post(f"/api/notifications/{first.id}/read/")
+        self.assertEqual(self.unread(), 2)
+
+        first.refresh_from_db()
+        first.delete()
+        self.assertEqual(self.unread(), 2)
+        self.client.delete(f"/api/notifications/{second.id}/")
+        self.assertEqual(self.unread(), 1)
+
+        task.delete()
+        self.assertEqual(self.unread(), 0)
+
+    def test_bulk_delete_updates_counters(self):
+        """Test queryset deletes, as retention runs them, update every user's counter"""
+        from notifications.models import UnreadCount
+
+        other = User.objects.create_user(
+            username="other", email="other@test.com", password="pass123",
+            role="developer", is_email_verified=True
+        )
+        for user in (self.user, other):
+            for i in range(2):
+                Notification.objects.create(user=user, message=f"n{i}")
+            UnreadCount.objects.get_count(user.pk)
+        Notification.objects.filter(user=other, message="n0").mark_read()
+
+        Notification.objects.all().delete()
+        self.assertEqual(UnreadCount.objects.get_count(self.user.pk), 0)
+        self.assertEqual(UnreadCount.objects.get_count(other.pk), 0)
+
+
+class NotificationStreamTest(TestCase):
+    """Test the Server-Sent Events stream"""
+
+    url = "/api/notifications/stream/"
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+        from authentication.authentication import add_user_claims
+
+        self.user = User.objects.create_user(
+            username="streamer",
+            email="streamer@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        self.token = str(add_user_claims(AccessToken.for_user(self.user), self.user))
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {self.token}"}
+
+    def events(self, response):
+        body = b"".join(response.streaming_content).decode()
+        return [block for block in body.split("\n\n") if block.startswith("id:")]
+
+    def test_requires_authentication(self):
+        """Test the stream rejects missing and invalid tokens"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(self.url, {"ticket": "not-a-ticket"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stream_ticket(self):
+        """Test a ticket from the API opens the stream until it expires"""
+        import time
+        from unittest import mock
+
+        response = self.client.post("/api/notifications/stream-ticket/", **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ticket = response.data["ticket"]
+        self.assertNotIn(self.token, ticket)
+        self.assertEqual(self.client.get(self.url, {"ticket": ticket}).status_code, status.HTTP_200_OK)
+
+        with mock.patch("django.core.signing.time.time", return_value=time.time() + 61):
+            response = self.client.get(self.url, {"ticket": ticket})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_resumes_from_last_event_id(self):
+        """Test a reconnecting client gets what it missed, from the database"""
+        from django.test import override_settings
+        from notifications.stream import Cursor, get_config, issue_ticket
+
+        # Without the overlap for late commits, nothing is sent twice
+        no_overlap = override_settings(NOTIFICATION_STREAM={**get_config(), "OVERLAP_SECONDS": 0})
+        no_overlap.enable()
+        self.addCleanup(no_overlap.disable)
+
+        first = Notification.objects.create(user=self.user, message="seen")
+        cursor = Cursor(first.updated_at, first.updated_at)
+        task = Task.objects.create(title="Changed", assigned_to=self.user, created_by=self.user)
+        Notification.objects.create(user=self.user, message="missed")
+
+        response = self.client.get(self.url, HTTP_LAST_EVENT_ID=str(cursor), **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = self.events(response)
+        self.assertEqual(len(events), 2)
+        self.assertIn("event: task", events[0])
+        self.assertIn(f'"id": {task.id}', events[0])
+        self.assertIn("event: notification", events[1])
+        self.assertIn('"missed"', events[1])
+
+        # The last id resumes after everything sent, and marks what was sent read
+        last_id = events[-1].split("\n")[0].removeprefix("id: ")
+        self.assertTrue(last_id.startswith(f"{Notification.objects.latest('id').id}-"))
+        again = self.client.get(self.url, {"ticket": issue_ticket(self.user)}, HTTP_LAST_EVENT_ID=last_id)
+        self.assertEqual(self.events(again), [])
+
+    def test_replay_cut_short_keeps_both_kinds(self):
+        """Test a backlog limited per kind does not move past the other kind"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from notifications.stream import Cursor, missed_events
+
+        start = timezone.now() - timedelta(minutes=1)
+        Task.objects.create(title="Early", assigned_to=self.user, created_by=self.user)
+        Task.objects.create(title="Later", assigned_to=self.user, created_by=self.user)
+        Notification.objects.create(user=self.user, message="after both")
+
+        cursor = Cursor(start, start)
+        for event in missed_events(self.user.pk, cursor, limit=1):
+            cursor.advance(event)
+        rest = missed_events(self.user.pk, Cursor.parse(str(cursor)), limit=1)
+        self.assertEqual([event.data["title"] for event in rest], ["Later"])
+
+    def test_coalesced_notifications_are_replayed_and_polled(self):
+        """Test a notification merged into after it was sent is sent again"""
+        from unittest import mock
+        from notifications.coalescing import notify
+        from notifications.stream import Cursor, EventBroker, get_config, missed_events
+
+        task = Task.objects.create(title="Task", assigned_to=self.user, created_by=self.user)
+        first = notify(self.user, "first", task=task)
+        cursor = Cursor.parse(str(Cursor(first.updated_at, first.updated_at)))
+        events = EventBroker({**get_config(), "OVERLAP_SECONDS": 0})
+        events._subscribers[self.user.pk] = set()
+        events._polled_since = first.updated_at
+
+        merged = notify(self.user, "second", task=task)
+        self.assertEqual(merged.pk, first.pk)
+        replayed = missed_events(self.user.pk, cursor, 10)
+        self.assertEqual([(e.notification_id, e.data["count"]) for e in replayed], [(first.id, 2)])
+        with mock.patch.object(events, "publish") as publish:
+            self.assertEqual(events.poll_once(), 1)
+        self.assertEqual(publish.call_args.args[0].data["message"], "second")
+
+    def test_late_commits_are_replayed_and_polled(self):
+        """Test rows timestamped before the cursor but committed after it still arrive"""
+        from datetime import timedelta
+        from unittest import mock
+        from notifications.stream import Cursor, EventBroker, get_config, missed_events
+
+        late = Notification.objects.create(user=self.user, message="late")
+        cursor = Cursor.parse(str(Cursor(late.created_at + timedelta(seconds=1))))
+        self.assertEqual([e.notification_id for e in missed_events(self.user.pk, cursor, 10, 5)], [late.id])
+
+        events = EventBroker({**get_config(), "OVERLAP_SECONDS": 5})
+        events._subscribers[self.user.pk] = set()
+        events._polled_since = late.created_at + timedelta(seconds=1)
+        with mock.patch.object(events, "publish") as publish:
+            self.assertEqual(events.poll_once(), 1)
+            self.assertEqual(events.poll_once(), 0)
+        self.assertEqual(publish.call_args.args[0].notification_id, late.id)
+
+    def test_new_connection_has_no_backlog(self):
+        """Test a client without Last-Event-ID only gets new events"""
+        Notification.objects.create(user=self.user, message="old")
+        self.assertEqual(self.events(self.client.get(self.url, **self.auth)), [])
+
+    async def test_asgi_connection_stays_open(self):
+        """Test an ASGI request gets the live stream"""
+        response = await self.async_client.get(self.url, headers={"Authorization": f"Bearer {self.token}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+    async def test_streams_published_events(self):
+        """Test a connection receives events published for its user until it closes"""
+        import asyncio
+        from asgiref.sync import sync_to_async
+        from notifications.stream import Cursor, Event, broker, event_stream, get_config, to_micros
+
+        content = event_stream(self.user.pk, Cursor(), get_config())
+        try:
+            self.assertTrue((await anext(content)).startswith(b"retry:"))
+            self.assertTrue(broker.has_subscribers([self.user.pk]))
+
+            notification = await sync_to_async(Notification.objects.create)(user=self.user, message="live")
+            other = await sync_to_async(User.objects.create_user)(
+                username="other", email="other@test.com", password="pass123"
+            )
+            broker.publish(Event("task", [other.pk], {"id": 1}, notification.created_at))
+            event = await sync_to_async(Event.for_notification)(notification)
+            # Published twice (e.g. locally and by the poller), sent once
+            broker.publish(event)
+            broker.publish(event)
+
+            chunk = (await asyncio.wait_for(anext(content), 1)).decode()
+            self.assertTrue(chunk.startswith(f"id: {notification.id}-{to_micros(notification.updated_at)}-"))
+            self.assertIn('"live"', chunk)
+        finally:
+            await content.aclose()
+        self.assertFalse(broker.has_subscribers([self.user.pk]))
+
+    def test_saves_publish_on_commit(self):
+        """Test notification and task saves are published once committed"""
+        from unittest import mock
+        from notifications.stream import broker
+
+        with mock.patch.object(broker, "has_subscribers", return_value=True), \
+                mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                task = Task.objects.create(title="Task", assigned_to=self.user, created_by=self.user)
+                Notification.objects.create(user=self.user, task=task, message="hello")
+                publish.assert_not_called()
+
+        kinds = [call.args[0].kind for call in publish.call_args_list]
+        self.assertIn("task", kinds)
+        self.assertIn("notification", kinds)
+        notification_event = next(c.args[0] for c in publish.call_args_list if c.args[0].kind == "notification")
+        self.assertEqual(notification_event.user_ids, [self.user.pk])
+        self.assertEqual(notification_event.data["task_title"], "Task")
+
+    def test_bulk_task_writes_are_published(self):
+        """Test tasks written through tasks.changes reach the stream"""
+        from unittest import mock
+        from notifications.stream import broker
+        from tasks.changes import update_tasks
+
+        task = Task.objects.create(title="Bulk", assigned_to=self.user, created_by=self.user)
+        with mock.patch.dict(broker._subscribers, {self.user.pk: set()}), \
+                mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                update_tasks([task.id], status=Task.Status.IN_PROGRESS)
+
+        events = [call.args[0] for call in publish.call_args_list]
+        self.assertEqual([(e.kind, e.data["id"], e.data["status"]) for e in events],
+                         [("task", task.id, "in_progress")])
+
+
+class MarkReadTest(APITestCase):
+    """Test marking notifications read in bulk"""
+
+    url = "/api/notifications/mark-read/"
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="bulkreader",
+            email="bulkreader@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        self.other = User.objects.create_user(
+            username="other",
+            email="other@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        self.client.force_authenticate(self.user)
+        self.mine = [Notification.objects.create(user=self.user, message=f"n{i}") for i in range(4)]
+        self.theirs = Notification.objects.create(user=self.other, message="theirs")
+
+    def unread(self):
+        return set(Notification.objects.filter(read=False).values_list("id", flat=True))
+
+    def test_mark_ids_read(self):
+        """Test only the user's own listed notifications are marked"""
+        ids = [self.mine[0].id, self.mine[2].id, self.theirs.id]
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {"ids": ids}, format="json")
+        notification_queries = [q["sql"] for q in queries if '"notifications_notification"' in q["sql"]]
+        # One UPDATE; the COUNT creates the counter on first use
+        self.assertEqual(len([sql for sql in notification_queries if sql.startswith("UPDATE")]), 1)
+        self.assertEqual(len([sql for sql in notification_queries if not sql.startswith("UPDATE")]), 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"marked": 2, "unread_count": 2})
+        self.assertEqual(self.unread(), {self.mine[1].id, self.mine[3].id, self.theirs.id})
+
+    def test_mark_up_to(self):
+        """Test up_to marks that notification and everything before it"""
+        response = self.client.post(self.url, {"up_to": str(self.mine[2].id)}, format="json")
+        self.assertEqual(response.data["marked"], 3)
+        self.assertEqual(self.unread(), {self.mine[3].id, self.theirs.id})
+
+        # A stream event id works too
+        response = self.client.post(
+            self.url, {"up_to": f"{self.theirs.id}-1790000000000000-1790000000000000"}, format="json"
+        )
+        self.assertEqual(response.data, {"marked": 1, "unread_count": 0})
+        self.assertEqual(self.unread(), {self.theirs.id})
+
+    def test_invalid_requests(self):
+        """Test exactly one valid selector is required"""
+        for data in [{}, {"ids": [1], "up_to": "1"}, {"up_to": "latest"}, {"ids": ["x"]}]:
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+        self.assertEqual(len(self.unread()), 5)
+
+
+class CoalescingTest(TestCase):
+    """Test repeated notifications are merged"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="coalesce",
+            email="coalesce@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        self.task = Task.objects.create(title="Task", assigned_to=self.user, created_by=self.user)
+
+    def test_notifications_merge_within_window(self):
+        """Test same user, task and kind within the window is one row with a count"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from notifications.coalescing import notify
+        from notifications.models import UnreadCount
+
+        self.assertEqual(UnreadCount.objects.get_count(self.user.pk), 0)
+        first = notify(self.user, "first", task=self.task)
+        merged = notify(self.user, "second", task=self.task)
+        self.assertEqual(merged.pk, first.pk)
+        merged.refresh_from_db()
+        self.assertEqual((merged.count, merged.message), (2, "second"))
+        self.assertEqual(UnreadCount.objects.get_count(self.user.pk), 1)
+
+        # Another kind, no task, or outside the window: new rows
+        kinds = notify(self.user, "escalated", task=self.task, kind=Notification.Kind.PRIORITY_ESCALATED)
+        self.assertNotEqual(kinds.pk, first.pk)
+        self.assertNotEqual(notify(self.user, "a").pk, notify(self.user, "b").pk)
+        later = notify(self.user, "later", task=self.task, now=timezone.now() + timedelta(hours=1))
+        self.assertNotEqual(later.pk, first.pk)
+
+        # A read notification is not reopened
+        Notification.objects.filter(pk=later.pk).mark_read(user_id=self.user.pk)
+        self.assertNotEqual(notify(self.user, "again", task=self.task).pk, later.pk)
+
+    def test_first_notification_locks_the_task(self):
+        """Test the task row is locked before looking for a notification to merge into"""
+        from unittest import mock
+        from notifications.coalescing import notify
+
+        with mock.patch("django.db.models.query.QuerySet.select_for_update",
+                        autospec=True, side_effect=lambda qs, **kwargs: qs) as lock:
+            notify(self.user, "first", task=self.task)
+        self.assertEqual([call.args[0].model for call in lock.call_args_list], [Task, Notification])
+
+    def test_escalation_notifies_once(self):
+        """Test middleware escalations are notified once, by the post_save receiver"""
+        from datetime import timedelta
+        from django.http import HttpRequest, HttpResponse
+        from django.utils import timezone
+        from tasks.middlewares.middlewares import PriorityEscalationMiddleware
+
+        Task.objects.filter(pk=self.task.pk).update(deadline=timezone.now() + timedelta(hours=2))
+        PriorityEscalationMiddleware(lambda request: HttpResponse())(HttpRequest())
+
+        notifications = Notification.objects.filter(task=self.task)
+        self.assertEqual(notifications.count(), 1)
+        notification = notifications.get()
+        self.assertEqual(notification.kind, Notification.Kind.PRIORITY_ESCALATED)
+        self.assertIn("escalated from medium to high", notification.message)
+
+        # Saving the task again is not a new escalation
+        task = Task.objects.get(pk=self.task.pk)
+        task.title = "Renamed"
+        task.save()
+        self.assertEqual(Notification.objects.filter(task=self.task).get().count, 1)
+
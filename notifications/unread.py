@@ -0,0 +1,30 @@
+"""
+Keeps ``UnreadCount`` in step with the notifications table.
+
+Marking read and deleting through ``NotificationQuerySet`` adjust the
+counters themselves; these receivers cover new notifications and those
+deleted along with their task, which the database cascade removes without
+going through the queryset.
+"""
+from collections import Counter
+
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from tasks.models import Task
+
+from .models import Notification, UnreadCount
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not instance.read:
+        UnreadCount.objects.adjust({instance.user_id: 1})
+
+
+@receiver(pre_delete, sender=Task)
+def uncount_task_notifications(sender, instance, **kwargs):
+    unread = Counter(
+        Notification.objects.filter(task=instance, read=False).values_list("user_id", flat=True)
+    )
+    UnreadCount.objects.adjust({user_id: -count for user_id, count in unread.items()})
@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .stream import notification_stream
 from .views import NotificationViewSet
 
 router = DefaultRouter()
 router.register(r'', NotificationViewSet, basename='notification') 
 
 urlpatterns = [
+    # Before the router, whose detail route would match "stream/"
+    path('stream/', notification_stream, name='notification-stream'),
     path('', include(router.urls)),
 ]
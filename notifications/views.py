@@ -1,12 +1,69 @@
 # notifications/views.py
 from rest_framework import viewsets, permissions
-from .models import Notification
-from .serializers import NotificationSerializer
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from tasks.pagination import KeysetPagination
+from . import stream
+from .models import Notification, UnreadCount
+from .serializers import MarkReadSerializer, NotificationSerializer
+
+
+class NotificationPagination(KeysetPagination):
+    ordering_field = "created_at"
+
 
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         """Return only notifications for the current user"""
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return (
+            Notification.objects.filter(user=self.request.user)
+            .select_related('task')
+            .order_by('-created_at', '-id')
+        )
+
+    @action(detail=False, methods=["get"], url_path="unread-count")
+    def unread_count(self, request):
+        """Number of unread notifications, read from the user's counter"""
+        return Response({"unread_count": UnreadCount.objects.get_count(request.user.pk)})
+
+    @action(detail=False, methods=["post"], url_path="stream-ticket")
+    def stream_ticket(self, request):
+        """Short-lived ticket for opening the event stream as ``?ticket=``"""
+        return Response({
+            "ticket": stream.issue_ticket(request.user),
+            "expires_in": stream.get_config()["TICKET_MAX_AGE"],
+        })
+
+    @action(detail=True, methods=["post"])
+    def read(self, request, pk=None):
+        """Mark one notification read"""
+        notification = self.get_object()
+        Notification.objects.filter(pk=notification.pk).mark_read(user_id=request.user.pk)
+        notification.read = True
+        return Response(self.get_serializer(notification).data)
+
+    @action(detail=False, methods=["post"], url_path="mark-read", serializer_class=MarkReadSerializer)
+    def mark_read(self, request):
+        """
+        Mark the given notifications, or every notification up to and
+        including ``up_to``, read in one UPDATE.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        notifications = Notification.objects.all()
+        if "ids" in serializer.validated_data:
+            notifications = notifications.filter(id__in=serializer.validated_data["ids"])
+        else:
+            notifications = notifications.filter(id__lte=serializer.validated_data["up_to"])
+        marked = notifications.mark_read(user_id=request.user.pk)
+
+        return Response({
+            "marked": marked,
+            "unread_count": UnreadCount.objects.get_count(request.user.pk),
+        })
@@ -11,7 +11,9 @@ from django.utils import timezone
 from django.utils.html import format_html
 from django.contrib.auth import get_user_model
 
-from .models import Task
+from . import jobs
+from .changes import update_tasks
+from .models import AuditLogPartition, BlockedIP, BulkJob, Task
 
 User = get_user_model()
 
@@ -166,7 +168,23 @@ class TaskAdmin(admin.ModelAdmin):
                 messages.WARNING,
             )
 
-        updated_count = queryset.update(assigned_to=new_user)
+        task_ids = list(queryset.values_list("id", flat=True))
+
+        if len(task_ids) > jobs.SYNC_LIMIT:
+            job = jobs.submit(
+                BulkJob.Kind.REASSIGN,
+                {"task_ids": task_ids, "assigned_to": new_user.id},
+                request.user,
+                total=len(task_ids),
+            )
+            self.message_user(
+                request,
+                f"Reassignment of {len(task_ids)} tasks queued as job #{job.id}.",
+                messages.INFO,
+            )
+            return HttpResponseRedirect(request.get_full_path())
+
+        updated_count = update_tasks(task_ids, assigned_to=new_user)
 
         self.message_user(
             request,
@@ -177,3 +195,45 @@ class TaskAdmin(admin.ModelAdmin):
         return HttpResponseRedirect(request.get_full_path())
 
     reassign_tasks.short_description = "Reassign Tasks"
+
+
+
+@admin.register(BulkJob)
+class BulkJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "kind",
+        "state",
+        "processed",
+        "total",
+        "failed",
+        "created_by",
+        "created_at",
+    )
+    list_filter = ("kind", "state")
+    readonly_fields = (
+        "kind",
+        "state",
+        "payload",
+        "created_by",
+        "total",
+        "processed",
+        "failed",
+        "errors",
+        "created_at",
+        "started_at",
+        "finished_at",
+    )
+
+
+@admin.register(AuditLogPartition)
+class AuditLogPartitionAdmin(admin.ModelAdmin):
+    list_display = ("name", "range_start", "range_end", "created_at")
+    readonly_fields = ("name", "range_start", "range_end", "created_at")
+
+
+@admin.register(BlockedIP)
+class BlockedIPAdmin(admin.ModelAdmin):
+    list_display = ("ip_address", "blocked_at", "expires_at", "captcha_question")
+    search_fields = ("ip_address",)
+    ordering = ("-blocked_at",)
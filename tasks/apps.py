@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
+
+    def ready(self):
+        from . import facets  # noqa: F401  (registers cache invalidation receivers)
+        from . import blocklist  # noqa: F401  (publishes BlockedIP changes to workers)
+        from . import bitmap_index  # noqa: F401  (keeps the index current; it builds on first use)
@@ -0,0 +1,360 @@
+"""
+Archival of old APIAuditLog and TaskHistory rows to compressed JSONL.
+
+Expiring rows are streamed in (timestamp, id) order with a server-side
+cursor and written to gzip segments, one directory per day::
+
+    <PATH>/<app_label.model>/2026/01/31/<first id>-<last id>.jsonl.gz
+    <PATH>/<app_label.model>/manifest.jsonl
+
+A segment is closed when the day changes or it holds ``SEGMENT_ROWS`` rows.
+It is written to a temporary file, fsynced and renamed into place, then
+recorded in the manifest, and only then are its rows deleted from the
+database. A crash therefore leaves at worst rows that are both archived and
+still in the database, never rows that are in neither.
+
+Models marked ``partitioned`` (APIAuditLog, see tasks/partitions.py) are
+archived one whole partition at a time instead, once its range is older
+than ``max_age_days``. Their rows are read within the partition's bounds
+and never deleted here: the partition is marked archived, and retention
+drops it as a whole. Their segments are named after the partition
+(``<partition>.<n>.jsonl.gz``), and archiving a partition first removes
+any segments an interrupted run left for it, so a re-run replaces them
+rather than adding duplicate rows.
+
+``manage.py audit_archive_query`` scans segments by time range using the
+manifest and reads them line by line.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLogPartition
+
+DEFAULTS = {
+    "PATH": "archive",
+    "SEGMENT_ROWS": 100000,
+    "DELETE_CHUNK_SIZE": 1000,
+    "MODELS": {
+        "tasks.APIAuditLog": {"field": "timestamp", "max_age_days": 25, "partitioned": True},
+        "tasks.TaskHistory": {"field": "timestamp", "max_age_days": 300},
+    },
+}
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder truncates datetimes to milliseconds; archives keep
+    # the full value
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "AUDIT_ARCHIVE", {})}
+
+
+def model_dir(label, config=None):
+    config = config or get_config()
+    return Path(config["PATH"]) / label.lower()
+
+
+def archives_partitions(config=None):
+    """Whether audit log partitions must be archived before they are dropped"""
+    config = config or get_config()
+    return config["MODELS"].get("tasks.APIAuditLog", {}).get("partitioned", False)
+
+
+def _fsync_dir(path):
+    # Makes the rename itself durable; not supported on every platform
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SegmentWriter:
+    """One gzip JSONL segment, written to a temp file until closed"""
+
+    def __init__(self, root, day, name=None):
+        self.root = root
+        self.day = day
+        # File name without suffix; defaults to the id range written
+        self.name = name
+        self.directory = root / f"{day:%Y}" / f"{day:%m}" / f"{day:%d}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.temp_path = self.directory / f".segment-{os.getpid()}.tmp"
+        self._raw = open(self.temp_path, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self.ids = []
+        self.start = None
+        self.end = None
+
+    def write(self, row, moment):
+        line = json.dumps(row, cls=ArchiveJSONEncoder, separators=(",", ":"))
+        self._gzip.write(line.encode("utf-8") + b"\n")
+        self.ids.append(row["id"])
+        self.start = moment if self.start is None else self.start
+        self.end = moment
+
+    def close(self):
+        """Flush and fsync the segment, move it into place and return its manifest entry"""
+        self._gzip.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+
+        name = self.name or f"{self.ids[0]}-{self.ids[-1]}"
+        path = self.directory / f"{name}.jsonl.gz"
+        os.replace(self.temp_path, path)
+        _fsync_dir(self.directory)
+
+        return {
+            "file": path.relative_to(self.root).as_posix(),
+            "start": self.start,
+            "end": self.end,
+            "rows": len(self.ids),
+            "first_id": self.ids[0],
+            "last_id": self.ids[-1],
+            "size": path.stat().st_size,
+            "created_at": timezone.now(),
+        }
+
+    def discard(self):
+        self._gzip.close()
+        self._raw.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+def _append_manifest(root, entry):
+    with open(root / MANIFEST_NAME, "a", encoding="utf-8") as manifest:
+        manifest.write(json.dumps(entry, cls=ArchiveJSONEncoder) + "\n")
+        manifest.flush()
+        os.fsync(manifest.fileno())
+
+
+def _forget_segments(root, prefix):
+    """Remove segments whose file name starts with ``prefix`` and their manifest entries"""
+    manifest = root / MANIFEST_NAME
+    if not manifest.exists():
+        return
+    with open(manifest, encoding="utf-8") as lines:
+        entries = [line for line in lines if line.strip()]
+    keep = []
+    for line in entries:
+        entry = json.loads(line)
+        if Path(entry["file"]).name.startswith(prefix):
+            (root / entry["file"]).unlink(missing_ok=True)
+        else:
+            keep.append(line)
+    if len(keep) == len(entries):
+        return
+
+    temp_path = root / f".{MANIFEST_NAME}-{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as rewritten:
+        rewritten.writelines(keep)
+        rewritten.flush()
+        os.fsync(rewritten.fileno())
+    os.replace(temp_path, manifest)
+    _fsync_dir(root)
+
+
+def archive_partitions(label, cutoff, config=None):
+    """
+    Archive every partition of ``label`` whose range ends by ``cutoff`` and
+    mark it archived; no rows are deleted. Returns (rows archived, segments
+    written).
+    """
+    config = config or get_config()
+    model = apps.get_model(label)
+    field = config["MODELS"][label]["field"]
+    root = model_dir(label, config)
+    root.mkdir(parents=True, exist_ok=True)
+    columns = [f.attname for f in model._meta.concrete_fields]
+
+    archived = 0
+    segments = 0
+    expired = AuditLogPartition.objects.filter(range_end__lte=cutoff, archived_at__isnull=True)
+    for partition in expired.order_by("range_start"):
+        # Segments of an interrupted run are replaced, not added to
+        _forget_segments(root, f"{partition.name}.")
+
+        # The bounds let PostgreSQL read this partition only
+        rows = (
+            model._default_manager
+            .filter(**{f"{field}__gte": partition.range_start, f"{field}__lt": partition.range_end})
+            .order_by(field, "id")
+            .values(*columns)
+        )
+        written = []
+        segment = None
+        try:
+            for row in rows.iterator(chunk_size=2000):
+                moment = row[field]
+                day = moment.astimezone(dt_timezone.utc).date()
+                if segment and (segment.day != day or len(segment.ids) >= config["SEGMENT_ROWS"]):
+                    _append_manifest(root, segment.close())
+                    written.append(len(segment.ids))
+                    segment = None
+                if segment is None:
+                    # Numbered within the partition, so a re-run writes the same names
+                    segment = SegmentWriter(root, day, f"{partition.name}.{len(written):04d}")
+                segment.write(row, moment)
+
+            if segment:
+                _append_manifest(root, segment.close())
+                written.append(len(segment.ids))
+                segment = None
+        finally:
+            if segment:
+                segment.discard()
+
+        archived += sum(written)
+        segments += len(written)
+
+        partition.archived_at = timezone.now()
+        partition.save(update_fields=["archived_at"])
+
+    return archived, segments
+
+
+def archive_model(label, cutoff, config=None):
+    """
+    Archive and delete rows of ``label`` older than ``cutoff``.
+    Returns (rows archived, segments written).
+    """
+    config = config or get_config()
+    if config["MODELS"][label].get("partitioned"):
+        return archive_partitions(label, cutoff, config)
+    model = apps.get_model(label)
+    field = config["MODELS"][label]["field"]
+    root = model_dir(label, config)
+    root.mkdir(parents=True, exist_ok=True)
+
+    columns = [f.attname for f in model._meta.concrete_fields]
+    rows = (
+        model._default_manager
+        .filter(**{f"{field}__lt": cutoff})
+        .order_by(field, "id")
+        .values(*columns)
+    )
+
+    archived = 0
+    segments = 0
+    segment = None
+
+    def finish(segment):
+        entry = segment.close()
+        _append_manifest(root, entry)
+        _delete_ids(model, segment.ids, config["DELETE_CHUNK_SIZE"])
+        return entry["rows"]
+
+    try:
+        # iterator() uses a server-side cursor where the backend has one
+        for row in rows.iterator(chunk_size=2000):
+            moment = row[field]
+            day = moment.astimezone(dt_timezone.utc).date()
+            if segment and (segment.day != day or len(segment.ids) >= config["SEGMENT_ROWS"]):
+                archived += finish(segment)
+                segments += 1
+                segment = None
+            if segment is None:
+                segment = SegmentWriter(root, day)
+            segment.write(row, moment)
+
+        if segment:
+            archived += finish(segment)
+            segments += 1
+            segment = None
+    finally:
+        if segment:
+            segment.discard()
+
+    return archived, segments
+
+
+def _delete_ids(model, ids, chunk_size):
+    for start in range(0, len(ids), chunk_size):
+        with transaction.atomic():
+            model._default_manager.filter(id__in=ids[start:start + chunk_size]).delete()
+
+
+def archive_expired(only=None, now=None):
+    """
+    Archive every configured model past its ``max_age_days``.
+    Returns {label: (rows archived, segments written)}.
+    """
+    config = get_config()
+    now = now or timezone.now()
+    results = {}
+    for label, options in config["MODELS"].items():
+        if only and label not in only:
+            continue
+        cutoff = now - timedelta(days=options["max_age_days"])
+        results[label] = archive_model(label, cutoff, config)
+    return results
+
+
+# ---------- Reading ----------
+
+def read_manifest(label, config=None):
+    path = model_dir(label, config) / MANIFEST_NAME
+    if not path.exists():
+        return
+    with open(path, encoding="utf-8") as manifest:
+        for line in manifest:
+            if line.strip():
+                entry = json.loads(line)
+                entry["start"] = parse_datetime(entry["start"])
+                entry["end"] = parse_datetime(entry["end"])
+                yield entry
+
+
+def scan(label, since=None, until=None, config=None):
+    """
+    Yield archived rows (dicts) with ``since <= timestamp < until``.
+    Only segments whose manifest range overlaps the window are opened, and
+    each one is decompressed as a stream.
+    """
+    config = config or get_config()
+    field = config["MODELS"][label]["field"]
+    root = model_dir(label, config)
+
+    seen = set()
+    for entry in read_manifest(label, config):
+        # A segment re-archived after a crash before its delete is listed twice
+        if entry["file"] in seen:
+            continue
+        seen.add(entry["file"])
+        if since and entry["end"] < since:
+            continue
+        if until and entry["start"] >= until:
+            continue
+        with gzip.open(root / entry["file"], "rt", encoding="utf-8") as segment:
+            for line in segment:
+                row = json.loads(line)
+                moment = parse_datetime(row[field])
+                if since and moment < since:
+                    continue
+                if until and moment >= until:
+                    # Rows in a segment are in timestamp order
+                    break
+                yield row
@@ -0,0 +1,207 @@
+"""
+Buffered, asynchronous writer for API audit records.
+
+``AuditLoggingMiddleware`` hands each record to ``audit_writer.submit`` which
+only puts it on a bounded in-process queue. A background thread drains the
+queue and inserts records with ``bulk_create`` whenever ``BATCH_SIZE``
+records are waiting or ``FLUSH_INTERVAL`` seconds have passed. Records left
+in the queue are flushed when the process exits.
+
+When the queue is full the ``OVERFLOW`` policy applies:
+
+- ``block``: wait up to ``BLOCK_TIMEOUT`` seconds for room, then drop
+- ``drop``: discard the record and count it
+- ``spill``: append the record to ``SPILL_PATH`` (JSON lines), which can be
+  loaded later with ``manage.py replay_audit_spill``
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+
+from .models import APIAuditLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ASYNC": True,
+    "QUEUE_SIZE": 10000,
+    "BATCH_SIZE": 500,
+    "FLUSH_INTERVAL": 1.0,
+    "OVERFLOW": "spill",
+    "BLOCK_TIMEOUT": 1.0,
+    "SPILL_PATH": "audit_spill.jsonl",
+}
+
+OVERFLOW_POLICIES = ("block", "drop", "spill")
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "AUDIT_LOG_WRITER", {})}
+
+
+class AuditLogWriter:
+    def __init__(self, config=None):
+        # Without a config, settings are read on every use so
+        # override_settings reaches the module-level writer
+        self._config = config
+        config = self.config
+        if config["OVERFLOW"] not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy {config['OVERFLOW']!r}")
+
+        self.queue = queue.Queue(maxsize=config["QUEUE_SIZE"])
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    @property
+    def config(self):
+        return self._config or get_config()
+
+    # ---------- Producer side ----------
+    def submit(self, record):
+        """
+        Queue one audit record (a dict of APIAuditLog field values).
+        """
+        if not self.config["ASYNC"]:
+            self._write([record])
+            return
+
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        policy = self.config["OVERFLOW"]
+        if policy == "block":
+            try:
+                self.queue.put(record, timeout=self.config["BLOCK_TIMEOUT"])
+                return
+            except queue.Full:
+                self._drop(1)
+        elif policy == "drop":
+            self._drop(1)
+        else:
+            self._spill([record])
+
+    def _drop(self, count):
+        # Producers on several request threads count at once
+        with self._stats_lock:
+            self.dropped += count
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+        }
+
+    # ---------- Consumer side ----------
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="audit-log-writer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._collect_batch()
+            if batch:
+                close_old_connections()
+                self._write(batch)
+
+    def _collect_batch(self):
+        """
+        Wait for the first record, then keep collecting until the batch is
+        full or the flush interval has passed.
+        """
+        interval = self.config["FLUSH_INTERVAL"]
+        try:
+            batch = [self.queue.get(timeout=interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + interval
+        while len(batch) < self.config["BATCH_SIZE"]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything currently queued from the calling thread"""
+        while True:
+            batch = []
+            while len(batch) < self.config["BATCH_SIZE"]:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                APIAuditLog.objects.bulk_create(
+                    [APIAuditLog(**record) for record in batch],
+                    batch_size=self.config["BATCH_SIZE"],
+                )
+                self.written += len(batch)
+            except Exception:
+                logger.exception("Failed to write %d audit records", len(batch))
+                if self.config["ASYNC"]:
+                    self._spill(batch)
+                else:
+                    raise
+
+    def _spill(self, records):
+        path = Path(self.config["SPILL_PATH"])
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._spill_lock, path.open("a", encoding="utf-8") as spill_file:
+                for record in records:
+                    spill_file.write(json.dumps(record, cls=DjangoJSONEncoder) + "\n")
+                self.spilled += len(records)
+        except OSError:
+            logger.exception("Failed to spill %d audit records", len(records))
+            self._drop(len(records))
+
+
+audit_writer = AuditLogWriter()
+atexit.register(audit_writer.shutdown)
@@ -0,0 +1,87 @@
+"""
+Background flushing of write buffers kept in process memory.
+
+Request rollups, failed login counts and session activity are buffered per
+process and written in batches. ``BackgroundFlusher`` is their common part:
+a daemon thread, started on first use, calls ``flush()`` every
+``FLUSH_INTERVAL`` seconds, and everything left is flushed at exit. With
+``BACKGROUND`` off (tests, commands) no thread is started and callers flush
+explicitly. Instances made without a config read it from the settings on
+every use, so ``override_settings`` reaches the module-level ones.
+
+A subclass takes the entries it writes out of its buffer under ``_lock``
+and writes them through ``write_or_restore``: when the write fails, they
+are merged back with ``restore`` and go out with the next flush instead of
+being lost.
+"""
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundFlusher:
+    # Name of the thread, also used in log messages
+    thread_name = "flusher"
+
+    def __init__(self, get_config, config=None):
+        self._get_config = get_config
+        self._config = config
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    @property
+    def config(self):
+        return self._config or self._get_config()
+
+    def flush(self, everything=False):
+        """Write buffered entries; returns the number of rows written"""
+        raise NotImplementedError
+
+    def restore(self, entries):
+        """Merge ``entries`` taken for a failed write back into the buffer; called with ``_lock`` held"""
+        raise NotImplementedError
+
+    def write_or_restore(self, entries, write):
+        """``write(entries)``, putting ``entries`` back in the buffer if it raises"""
+        try:
+            return write(entries)
+        except Exception:
+            with self._lock:
+                self.restore(entries)
+            raise
+
+    def maybe_start(self):
+        """Start the flush thread unless running in the foreground"""
+        if self.config["BACKGROUND"]:
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.config["FLUSH_INTERVAL"]):
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush %s", self.thread_name)
+
+    def shutdown(self):
+        self._stopping.set()
+        if self._thread is None:
+            # Foreground mode (tests, commands): callers flush explicitly
+            return
+        try:
+            self.flush(everything=True)
+        except Exception:
+            logger.exception("Failed to flush %s on exit", self.thread_name)
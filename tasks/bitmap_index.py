@@ -0,0 +1,441 @@
+"""
+Optional in-process bitmap index over task ids.
+
+Keeps one bitmap of task ids per tag, status, priority and assignee so the
+task list filters can be resolved by intersecting bitmaps instead of joining
+``Task.tags`` in SQL. The index is built in the background on first use,
+kept current from Task/Tag signals and ``tasks_changed`` once the writing
+transaction commits, and rebuilt when older than
+``TASK_BITMAP_INDEX_MAX_AGE`` to pick up writes made by other processes.
+
+The index can lag behind those writes, so it never decides alone. The list
+query keeps the tasks the index found together with every task whose
+``updated_at`` is later than the start of the snapshot (less
+``RECHECK_SLACK``, for transactions still open then), and applies every
+filter to them in SQL: stale entries are dropped and tasks the index has not
+seen yet are still found. Writes that bypass ``save()`` must set
+``updated_at``, as ``tasks.changes.update_tasks`` does.
+
+Enable it with ``TASK_BITMAP_INDEX_ENABLED = True``.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .changes import tasks_changed
+from .models import Tag, Task
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+CHUNK_BYTES = (1 << CHUNK_BITS) // 8
+
+# Tasks updated this long before a snapshot started are also rechecked in
+# SQL: their transaction may have committed after the snapshot was read
+RECHECK_SLACK = timedelta(seconds=60)
+
+
+def is_enabled():
+    return getattr(settings, "TASK_BITMAP_INDEX_ENABLED", False)
+
+
+def max_in_ids():
+    # Larger id sets are filtered in SQL instead of one huge IN list
+    return getattr(settings, "TASK_BITMAP_INDEX_MAX_IN_IDS", 10000)
+
+
+class Bitmap:
+    """
+    Compressed set of non-negative integers.
+
+    Ids are split into containers of 2**16 values keyed by their high bits;
+    each container is a Python int used as a bit set, and empty containers
+    are not stored. Set operations only visit containers present on both
+    sides, so sparse bitmaps stay small and fast.
+    """
+
+    __slots__ = ("_chunks",)
+
+    def __init__(self, values=()):
+        self._chunks = {}
+        for value in values:
+            self.add(value)
+
+    @classmethod
+    def _from_chunks(cls, chunks):
+        bitmap = cls()
+        bitmap._chunks = chunks
+        return bitmap
+
+    def copy(self):
+        return Bitmap._from_chunks(dict(self._chunks))
+
+    def add(self, value):
+        key = value >> CHUNK_BITS
+        self._chunks[key] = self._chunks.get(key, 0) | (1 << (value & CHUNK_MASK))
+
+    def discard(self, value):
+        key = value >> CHUNK_BITS
+        bits = self._chunks.get(key)
+        if bits is None:
+            return
+        bits &= ~(1 << (value & CHUNK_MASK))
+        if bits:
+            self._chunks[key] = bits
+        else:
+            del self._chunks[key]
+
+    def __contains__(self, value):
+        bits = self._chunks.get(value >> CHUNK_BITS, 0)
+        return bool(bits >> (value & CHUNK_MASK) & 1)
+
+    def __and__(self, other):
+        small, large = sorted((self._chunks, other._chunks), key=len)
+        chunks = {}
+        for key, bits in small.items():
+            common = bits & large.get(key, 0)
+            if common:
+                chunks[key] = common
+        return Bitmap._from_chunks(chunks)
+
+    def __or__(self, other):
+        chunks = dict(self._chunks)
+        for key, bits in other._chunks.items():
+            chunks[key] = chunks.get(key, 0) | bits
+        return Bitmap._from_chunks(chunks)
+
+    def __len__(self):
+        return sum(bits.bit_count() for bits in self._chunks.values())
+
+    def __bool__(self):
+        return bool(self._chunks)
+
+    def __iter__(self):
+        for key in sorted(self._chunks):
+            base = key << CHUNK_BITS
+            data = self._chunks[key].to_bytes(CHUNK_BYTES, "little")
+            for offset, byte in enumerate(data):
+                while byte:
+                    low = byte & -byte
+                    yield base + offset * 8 + low.bit_length() - 1
+                    byte ^= low
+
+
+def union(bitmaps):
+    result = Bitmap()
+    for bitmap in bitmaps:
+        result = result | bitmap
+    return result
+
+
+class TaskBitmapIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self.built_at = 0.0
+        # Wall-clock start of the snapshot in use
+        self.snapshot_at = None
+        self._building = False
+        self._dirty = set()
+        self._reset()
+
+    def _reset(self):
+        self.by_status = defaultdict(Bitmap)
+        self.by_priority = defaultdict(Bitmap)
+        self.by_assignee = defaultdict(Bitmap)
+        self.by_tag = defaultdict(Bitmap)  # tag id -> task ids
+        self.tag_ids = {}  # tag name -> tag id
+        self.tasks = {}  # task id -> (status, priority, assignee id)
+        self.task_tags = defaultdict(set)  # task id -> tag ids
+
+    # ---------- Building ----------
+    def build(self):
+        """Load every task and tag link; swaps the new state in atomically"""
+        with self._lock:
+            self._building = True
+            self._dirty = set()
+        started = timezone.now()
+
+        fresh = TaskBitmapIndex.__new__(TaskBitmapIndex)
+        fresh._reset()
+
+        rows = Task.objects.values_list("id", "status", "priority", "assigned_to_id")
+        for task_id, status, priority, assignee_id in rows.iterator(chunk_size=5000):
+            fresh._set_task(task_id, status, priority, assignee_id)
+
+        fresh.tag_ids = dict(Tag.objects.values_list("name", "id"))
+        links = Task.tags.through.objects.values_list("task_id", "tag_id")
+        for task_id, tag_id in links.iterator(chunk_size=5000):
+            fresh._link(task_id, tag_id)
+
+        with self._lock:
+            for name in ("by_status", "by_priority", "by_assignee", "by_tag",
+                         "tag_ids", "tasks", "task_tags"):
+                setattr(self, name, getattr(fresh, name))
+            dirty, self._dirty = self._dirty, set()
+            self._building = False
+            self.ready = True
+            self.built_at = time.monotonic()
+            self.snapshot_at = started
+
+        # Writes that happened while the snapshot was loading
+        if dirty:
+            self.reload_tasks(dirty)
+
+    def build_in_background(self):
+        def run():
+            try:
+                self.build()
+            except Exception:
+                # e.g. tables not migrated yet; the index builds lazily later
+                logger.warning("Task bitmap index build failed", exc_info=True)
+                with self._lock:
+                    self._building = False
+            finally:
+                connection.close()
+
+        threading.Thread(target=run, name="task-bitmap-index", daemon=True).start()
+
+    def is_stale(self):
+        max_age = getattr(settings, "TASK_BITMAP_INDEX_MAX_AGE", 300)
+        return not self.ready or time.monotonic() - self.built_at > max_age
+
+    def ensure_ready(self):
+        """
+        Whether queries can be served from the index. A missing or stale
+        index is rebuilt in the background; callers fall back to SQL until
+        the first build finishes.
+        """
+        with self._lock:
+            rebuild = self.is_stale() and not self._building
+            if rebuild:
+                self._building = True
+        if rebuild:
+            self.build_in_background()
+        return self.ready
+
+    @property
+    def tracking(self):
+        """Whether changes must be applied, or remembered for the build running now"""
+        return self.ready or self._building
+
+    def changed_since(self):
+        """Tasks updated at or after this may be missing from the index"""
+        return self.snapshot_at - RECHECK_SLACK
+
+    # ---------- Updates ----------
+    def _set_task(self, task_id, status, priority, assignee_id):
+        previous = self.tasks.get(task_id)
+        if previous:
+            self.by_status[previous[0]].discard(task_id)
+            self.by_priority[previous[1]].discard(task_id)
+            self.by_assignee[previous[2]].discard(task_id)
+
+        self.tasks[task_id] = (status, priority, assignee_id)
+        self.by_status[status].add(task_id)
+        self.by_priority[priority].add(task_id)
+        self.by_assignee[assignee_id].add(task_id)
+
+    def _link(self, task_id, tag_id):
+        self.by_tag[tag_id].add(task_id)
+        self.task_tags[task_id].add(tag_id)
+
+    def _unlink(self, task_id, tag_id):
+        self.by_tag[tag_id].discard(task_id)
+        self.task_tags[task_id].discard(tag_id)
+
+    def _mark_dirty(self, task_ids):
+        if self._building:
+            self._dirty.update(task_ids)
+
+    def update_task(self, task_id, status, priority, assignee_id):
+        with self._lock:
+            self._mark_dirty([task_id])
+            self._set_task(task_id, status, priority, assignee_id)
+
+    def remove_task(self, task_id):
+        with self._lock:
+            self._mark_dirty([task_id])
+            previous = self.tasks.pop(task_id, None)
+            if previous:
+                self.by_status[previous[0]].discard(task_id)
+                self.by_priority[previous[1]].discard(task_id)
+                self.by_assignee[previous[2]].discard(task_id)
+            for tag_id in self.task_tags.pop(task_id, ()):
+                self.by_tag[tag_id].discard(task_id)
+
+    def link_tags(self, pairs):
+        with self._lock:
+            self._mark_dirty(task_id for task_id, _ in pairs)
+            for task_id, tag_id in pairs:
+                self._link(task_id, tag_id)
+
+    def unlink_tags(self, pairs):
+        with self._lock:
+            self._mark_dirty(task_id for task_id, _ in pairs)
+            for task_id, tag_id in pairs:
+                self._unlink(task_id, tag_id)
+
+    def set_tag(self, tag_id, name):
+        with self._lock:
+            for old_name, old_id in list(self.tag_ids.items()):
+                if old_id == tag_id:
+                    del self.tag_ids[old_name]
+            self.tag_ids[name] = tag_id
+
+    def remove_tag(self, tag_id, name):
+        with self._lock:
+            self.tag_ids.pop(name, None)
+            for task_id in self.by_tag.pop(tag_id, Bitmap()):
+                self.task_tags[task_id].discard(tag_id)
+
+    def reload_tasks(self, task_ids):
+        """
+        Re-read tasks changed without signals (queryset.update, bulk_create).
+        """
+        task_ids = list(task_ids)
+        if not task_ids:
+            return
+        if not self.ready:
+            # The build running now reloads them once its snapshot is in
+            with self._lock:
+                self._mark_dirty(task_ids)
+            return
+
+        rows = Task.objects.filter(id__in=task_ids).values_list(
+            "id", "status", "priority", "assigned_to_id"
+        )
+        links = Task.tags.through.objects.filter(task_id__in=task_ids).values_list(
+            "task_id", "tag_id"
+        )
+
+        with self._lock:
+            for task_id in task_ids:
+                self.remove_task(task_id)
+            for row in rows:
+                self._set_task(*row)
+            for task_id, tag_id in links:
+                self._link(task_id, tag_id)
+
+    # ---------- Queries ----------
+    def _tag_ids(self, names):
+        tag_ids = {name: self.tag_ids.get(name) for name in names}
+        missing = [name for name, tag_id in tag_ids.items() if tag_id is None]
+        if missing:
+            # Tags created with bulk_create send no post_save signal; read
+            # them before taking the lock
+            found = dict(Tag.objects.filter(name__in=missing).values_list("name", "id"))
+            with self._lock:
+                self.tag_ids.update(found)
+            tag_ids.update(found)
+        return tag_ids
+
+    def resolve(self, statuses=(), priorities=(), assignees=(), tag_names=()):
+        """
+        Task ids matching every given dimension: any of the statuses,
+        priorities and assignees, and all of the tags.
+        """
+        tag_ids = self._tag_ids(tag_names)
+        with self._lock:
+            dimensions = []
+            if statuses:
+                dimensions.append(union(self.by_status.get(s, Bitmap()) for s in statuses))
+            if priorities:
+                dimensions.append(union(self.by_priority.get(p, Bitmap()) for p in priorities))
+            if assignees:
+                dimensions.append(union(self.by_assignee.get(a, Bitmap()) for a in assignees))
+            for name in tag_names:
+                dimensions.append(self.by_tag.get(tag_ids[name], Bitmap()))
+
+            if not dimensions:
+                return None
+
+            # Intersect the smallest bitmaps first
+            dimensions.sort(key=len)
+            result = dimensions[0].copy()
+            for bitmap in dimensions[1:]:
+                if not result:
+                    break
+                result = result & bitmap
+            return result
+
+
+task_index = TaskBitmapIndex()
+
+
+# ---------- Signal receivers ----------
+
+@receiver(tasks_changed)
+def index_tasks_changed(sender, task_ids, **kwargs):
+    # Bulk writes made through tasks/changes.py
+    if is_enabled() and task_index.tracking:
+        task_index.reload_tasks(task_ids)
+
+# Task and tag signals change the index only once the write commits, so a
+# rolled back transaction leaves it untouched. They are applied from the
+# moment a build starts, so writes made during the first build are reloaded
+# once it finishes.
+
+@receiver(post_save, sender=Task)
+def index_task_saved(sender, instance, **kwargs):
+    if is_enabled() and task_index.tracking:
+        row = (instance.id, instance.status, instance.priority, instance.assigned_to_id)
+        transaction.on_commit(lambda: task_index.update_task(*row))
+
+
+@receiver(post_delete, sender=Task)
+def index_task_deleted(sender, instance, **kwargs):
+    if is_enabled() and task_index.tracking:
+        task_id = instance.id
+        transaction.on_commit(lambda: task_index.remove_task(task_id))
+
+
+@receiver(post_save, sender=Tag)
+def index_tag_saved(sender, instance, **kwargs):
+    if is_enabled() and task_index.tracking:
+        tag_id, name = instance.id, instance.name
+        transaction.on_commit(lambda: task_index.set_tag(tag_id, name))
+
+
+@receiver(post_delete, sender=Tag)
+def index_tag_deleted(sender, instance, **kwargs):
+    if is_enabled() and task_index.tracking:
+        tag_id, name = instance.id, instance.name
+        transaction.on_commit(lambda: task_index.remove_tag(tag_id, name))
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def index_tag_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if not (is_enabled() and task_index.tracking):
+        return
+
+    if action == "post_clear":
+        # pk_set is not provided for clear(); re-read the affected tasks
+        if reverse:
+            task_ids = list(task_index.by_tag.get(instance.id, Bitmap()))
+        else:
+            task_ids = [instance.id]
+        transaction.on_commit(lambda: task_index.reload_tasks(task_ids))
+        return
+
+    if action not in ("post_add", "post_remove"):
+        return
+
+    if reverse:
+        pairs = [(task_id, instance.id) for task_id in pk_set]
+    else:
+        pairs = [(instance.id, tag_id) for tag_id in pk_set]
+
+    if action == "post_add":
+        transaction.on_commit(lambda: task_index.link_tags(pairs))
+    else:
+        transaction.on_commit(lambda: task_index.unlink_tags(pairs))
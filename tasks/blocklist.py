@@ -0,0 +1,125 @@
+"""
+Blocked IP addresses, persisted in ``BlockedIP`` and mirrored in every
+worker's memory.
+
+``SmartSecurityMiddleware`` checks each request against an in-process dict
+of blocked addresses, so a request from an address that is not blocked
+costs no cache or database call. Any change to ``BlockedIP`` bumps a
+version stamp in the shared cache. Workers re-read the stamp at most every
+``REFRESH_INTERVAL`` seconds and reload the (small) set of active blocks
+from the database when it has moved, so a block reaches every worker
+within that interval.
+"""
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import BlockedIP
+from .tiered_cache import TieredCache
+
+DEFAULTS = {
+    "REFRESH_INTERVAL": 2.0,
+    "BLOCK_SECONDS": 3600,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "BLOCKLIST", {})}
+
+
+def make_captcha():
+    a, b = random.randint(1, 9), random.randint(1, 9)
+    return f"What is {a} + {b}?", a + b
+
+
+class IPBlocklist:
+    def __init__(self, refresh_interval=None):
+        config = get_config()
+        interval = config["REFRESH_INTERVAL"] if refresh_interval is None else refresh_interval
+        # Only the namespace version of the tiered cache is used: it is the
+        # stamp, re-read from the shared cache once per interval
+        self.stamp = TieredCache("blocklist", l1_ttl=interval)
+        self._entries = {}  # ip -> (expires_at, captcha_question, captcha_answer)
+        self._loaded_version = None
+        self._lock = threading.Lock()
+
+    # ---------- Lookups ----------
+    def get(self, ip):
+        """The active block of ``ip`` as (expires_at, question, answer), or None"""
+        version = self.stamp.version()
+        if version != self._loaded_version:
+            self.reload(version)
+
+        entry = self._entries.get(ip)
+        if entry is None or entry[0] <= timezone.now():
+            return None
+        return entry
+
+    def reload(self, version=None):
+        version = self.stamp.version() if version is None else version
+        now = timezone.now()
+        active = BlockedIP.objects.filter(
+            Q(expires_at__gt=now)
+            | Q(expires_at__isnull=True, blocked_at__gt=now - timedelta(hours=1))
+        )
+        entries = {
+            block.ip_address: (block.get_expires_at(), block.captcha_question, block.captcha_answer)
+            for block in active
+        }
+        with self._lock:
+            self._entries = entries
+            self._loaded_version = version
+
+    # ---------- Changes ----------
+    def block(self, ip, seconds=None):
+        """Block ``ip`` (or extend its block) behind a new CAPTCHA"""
+        seconds = get_config()["BLOCK_SECONDS"] if seconds is None else seconds
+        question, answer = make_captcha()
+        now = timezone.now()
+        block, _ = BlockedIP.objects.update_or_create(
+            ip_address=ip,
+            defaults={
+                "captcha_question": question,
+                "captcha_answer": answer,
+                "blocked_at": now,
+                "expires_at": now + timedelta(seconds=seconds),
+            },
+        )
+        with self._lock:
+            self._entries = {**self._entries, ip: (block.expires_at, question, answer)}
+        return block
+
+    def unblock(self, ip):
+        BlockedIP.objects.filter(ip_address=ip).delete()
+        with self._lock:
+            entries = dict(self._entries)
+            entries.pop(ip, None)
+            self._entries = entries
+
+    def clear_local(self):
+        with self._lock:
+            self._entries = {}
+            self._loaded_version = None
+        self.stamp.clear_local()
+
+    def publish(self):
+        """Tell every worker to reload; called once the change is committed"""
+        self.stamp.invalidate()
+
+
+blocklist = IPBlocklist()
+
+
+# ---------- Invalidation ----------
+
+@receiver(post_save, sender=BlockedIP)
+@receiver(post_delete, sender=BlockedIP)
+def publish_on_change(sender, **kwargs):
+    transaction.on_commit(blocklist.publish)
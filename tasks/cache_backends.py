@@ -0,0 +1,215 @@
+"""
+Shared cache backend stored in a local SQLite file.
+
+Every worker process on the host opens the same file, so rate limit
+counters, IP blocks and cached payloads are shared without running a cache
+server. The file is in WAL mode: readers never block and writes are short.
+
+Integers are stored as SQLite integers, which lets ``incr``/``decr`` run as
+a single atomic ``UPDATE ... RETURNING``; everything else is pickled.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "tasks.cache_backends.SQLiteCache",
+            "LOCATION": "/var/lib/taskmanagement/cache.sqlite3",
+        }
+    }
+"""
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL
+) WITHOUT ROWID
+"""
+
+# Rows with no expiry never match "expires <= now"
+LIVE = "(expires IS NULL OR expires > ?)"
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = Path(location)
+        options = params.get("OPTIONS", {})
+        self.busy_timeout = options.get("BUSY_TIMEOUT", 5.0)
+        self.cull_every = options.get("CULL_EVERY", 100)
+        self._local = threading.local()
+        self._sets = 0
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    # ---------- Connection ----------
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._ensure_schema(connection)
+        return connection
+
+    def _ensure_schema(self, connection):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            connection.execute(SCHEMA)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)"
+            )
+            self._schema_ready = True
+
+    def close(self, **kwargs):
+        # Connections are per thread and reused across requests
+        pass
+
+    # ---------- Encoding ----------
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -(2 ** 63) <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    # ---------- API ----------
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f"SELECT value FROM cache_entries WHERE key = ? AND {LIVE}",
+            (key, time.time()),
+        ).fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        placeholders = ",".join("?" * len(key_map))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM cache_entries WHERE key IN ({placeholders}) AND {LIVE}",
+            (*key_map, time.time()),
+        ).fetchall()
+        return {key_map[key]: self._decode(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._connection().execute(
+            "INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            (key, self._encode(value), self.get_backend_timeout(timeout)),
+        )
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version), self._encode(value), expires)
+            for key, value in data.items()
+        ]
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+                rows,
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # Inserts, or replaces an expired row; a live row is left alone
+        cursor = self._connection().execute(
+            "INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache_entries.expires IS NOT NULL AND cache_entries.expires <= ?",
+            (key, self._encode(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            f"UPDATE cache_entries SET expires = ? WHERE key = ? AND {LIVE}",
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # fetchall() finishes the statement so the write lock is released
+        rows = self._connection().execute(
+            f"UPDATE cache_entries SET value = value + ? "
+            f"WHERE key = ? AND typeof(value) = 'integer' AND {LIVE} RETURNING value",
+            (delta, key, time.time()),
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"Key '{key}' not found or not an integer")
+        return rows[0][0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ",".join("?" * len(keys))
+            self._connection().execute(
+                f"DELETE FROM cache_entries WHERE key IN ({placeholders})", keys
+            )
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f"SELECT 1 FROM cache_entries WHERE key = ? AND {LIVE}",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entries")
+
+    # ---------- Culling ----------
+    def _maybe_cull(self):
+        """Every CULL_EVERY sets, drop expired rows and trim to MAX_ENTRIES"""
+        self._sets += 1
+        if self._sets % self.cull_every:
+            return
+
+        connection = self._connection()
+        connection.execute("DELETE FROM cache_entries WHERE expires <= ?", (time.time(),))
+        count = connection.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        if count > self._max_entries:
+            # Oldest-expiring first; entries without expiry go last
+            connection.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                "SELECT key FROM cache_entries ORDER BY expires IS NULL, expires LIMIT ?)",
+                (count - self._max_entries,),
+            )
@@ -0,0 +1,41 @@
+"""
+Writes to many tasks at once.
+
+``QuerySet.update()`` and ``bulk_create()`` send no ``post_save``, so
+everything kept in step with tasks through that signal (the bitmap index,
+notification streams) would miss them. Bulk writes go through
+``update_tasks`` and ``create_tasks`` instead: once the transaction
+commits, ``tasks_changed`` is sent with the ids written, and every
+dependent index or stream listens to it next to ``post_save``.
+"""
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Task
+
+# Sent with ``task_ids`` after a committed bulk write
+tasks_changed = Signal()
+
+
+def changed(task_ids):
+    """Send ``tasks_changed`` for ``task_ids`` when the transaction commits"""
+    task_ids = list(task_ids)
+    if task_ids:
+        transaction.on_commit(lambda: tasks_changed.send(sender=Task, task_ids=task_ids))
+
+
+def update_tasks(task_ids, **values):
+    """Set ``values`` on the given tasks in one UPDATE; returns the row count"""
+    task_ids = list(task_ids)
+    values.setdefault("updated_at", timezone.now())
+    updated = Task.objects.filter(id__in=task_ids).update(**values)
+    changed(task_ids)
+    return updated
+
+
+def create_tasks(tasks):
+    """Insert ``tasks`` with one ``bulk_create``; returns them"""
+    created = Task.objects.bulk_create(tasks)
+    changed(task.pk for task in created if task.pk)
+    return created
@@ -0,0 +1,89 @@
+"""
+Tag autocomplete and per-tag task counts.
+
+Counts come from one grouped query over the ``Task.tags`` through table and
+are cached in the ``tag-facets`` namespace of the two-tier cache, whose
+version is bumped whenever tags or task-tag links change, so stale entries
+are never read after an invalidation.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .filters import TASK_FILTER_PARAMS, apply_task_filters, has_task_filters
+from .models import Tag, Task
+from .tiered_cache import get_cache
+
+CACHE_TIMEOUT = getattr(settings, "TAG_FACETS_CACHE_TIMEOUT", 300)
+# Filter-scoped counts also depend on task fields (status, assignee...),
+# which do not bump the version, so they are kept for a shorter time.
+SCOPED_CACHE_TIMEOUT = getattr(settings, "TAG_FACETS_SCOPED_CACHE_TIMEOUT", 30)
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+facet_cache = get_cache("tag-facets")
+
+
+def invalidate():
+    facet_cache.invalidate()
+
+
+def tag_facets(prefix="", limit=DEFAULT_LIMIT, params=None):
+    """
+    Tags whose name starts with ``prefix`` with the number of tasks using
+    them. When task filter params are given, only matching tasks are
+    counted and tags without any match are left out.
+    """
+    scoped = params is not None and has_task_filters(params)
+    cache_key = _cache_key(prefix, limit, params if scoped else None)
+
+    facets = facet_cache.get(cache_key)
+    if facets is not None:
+        return facets
+
+    tags = Tag.objects.all()
+    if prefix:
+        # Case-sensitive prefix match so the name index can serve it
+        tags = tags.filter(name__startswith=prefix)
+
+    if scoped:
+        matching = apply_task_filters(Task.objects.all(), params).values("id")
+        tags = tags.annotate(
+            task_count=Count("tasks", filter=Q(tasks__in=matching))
+        ).filter(task_count__gt=0)
+    else:
+        tags = tags.annotate(task_count=Count("tasks"))
+
+    facets = list(
+        tags.order_by("-task_count", "name").values("id", "name", "task_count")[:limit]
+    )
+    facet_cache.set(cache_key, facets, SCOPED_CACHE_TIMEOUT if scoped else CACHE_TIMEOUT)
+    return facets
+
+
+def _cache_key(prefix, limit, params):
+    parts = [prefix, str(limit)]
+    if params is not None:
+        for name in TASK_FILTER_PARAMS:
+            parts.append(f"{name}={','.join(sorted(params.getlist(name)))}")
+
+    return hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()
+
+
+# ---------- Invalidation ----------
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Task)
+def invalidate_on_change(sender, **kwargs):
+    invalidate()
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def invalidate_on_tag_links(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate()
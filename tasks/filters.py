@@ -1,7 +1,12 @@
 from django.contrib.admin import SimpleListFilter
-from datetime import timedelta, timezone
+from datetime import timedelta, timezone as dt_timezone
 
-from tasks import models
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from tasks import bitmap_index
 from tasks.models import Task
 
 class NeedsAttentionFilter(SimpleListFilter):
@@ -18,8 +23,157 @@ class NeedsAttentionFilter(SimpleListFilter):
             now = timezone.now()
             three_days_ago = now - timedelta(days=3)
             return queryset.filter(
-                models.Q(status=Task.Status.BLOCKED) |
-                models.Q(deadline__lt=three_days_ago, status__in=[Task.Status.PENDING, Task.Status.IN_PROGRESS]) |
-                models.Q(actual_hours__gt=models.F('estimated_hours') * 1.5)
+                Q(status=Task.Status.BLOCKED) |
+                Q(deadline__lt=three_days_ago, status__in=[Task.Status.PENDING, Task.Status.IN_PROGRESS]) |
+                Q(actual_hours__gt=F('estimated_hours') * 1.5)
             )
         return queryset
+
+
+# ---------- API task filters ----------
+# Query params sent by the frontend task list. Multi-value params accept
+# repeated keys (?status=a&status=b) and comma separated values (?status=a,b).
+TASK_FILTER_PARAMS = ("status", "priority", "assigned_to", "tags", "overdue", "search")
+
+
+def get_list_param(params, name):
+    values = []
+    for raw in params.getlist(name):
+        values.extend(value.strip() for value in raw.split(",") if value.strip())
+    return list(dict.fromkeys(values))
+
+
+def get_int_list_param(params, name):
+    try:
+        return [int(value) for value in get_list_param(params, name)]
+    except ValueError:
+        raise ValidationError({name: "Expected a list of integer ids."})
+
+
+def has_task_filters(params):
+    return any(params.get(name) for name in TASK_FILTER_PARAMS)
+
+
+def tasks_with_all_tags(tag_names, task_ids=None, changed_since=None):
+    """
+    Subquery of task ids carrying every one of the given tag names,
+    optionally among ``task_ids`` and the tasks updated since
+    ``changed_since`` only
+    """
+    links = Task.tags.through.objects.all()
+    if task_ids is not None:
+        scope = Q(task_id__in=task_ids)
+        if changed_since is not None:
+            scope |= Q(task__updated_at__gte=changed_since)
+        links = links.filter(scope)
+    return (
+        links
+        .filter(tag__name__in=tag_names)
+        .values("task_id")
+        .annotate(matched=Count("tag_id", distinct=True))
+        .filter(matched=len(tag_names))
+        .values("task_id")
+    )
+
+
+def apply_task_filters(queryset, params):
+    """
+    Filter a Task queryset by status, priority, assignee, tags (all must
+    match), overdue flag and title search.
+
+    With the bitmap index enabled, the status/priority/assignee/tag part is
+    resolved in memory first. The index may lag behind writes from other
+    processes, so the candidates are the tasks it found plus every task
+    updated since its snapshot, and the predicates are still applied to
+    them in SQL.
+    """
+    statuses = get_list_param(params, "status")
+    priorities = get_list_param(params, "priority")
+    assignees = get_int_list_param(params, "assigned_to")
+    tag_names = get_list_param(params, "tags")
+
+    candidates = changed_since = None
+    indexed = statuses or priorities or assignees or tag_names
+    index = bitmap_index.task_index
+    if indexed and bitmap_index.is_enabled() and index.ensure_ready():
+        task_ids = index.resolve(statuses, priorities, assignees, tag_names)
+        if len(task_ids) <= bitmap_index.max_in_ids():
+            candidates = list(task_ids)
+            changed_since = index.changed_since()
+            queryset = queryset.filter(Q(id__in=candidates) | Q(updated_at__gte=changed_since))
+
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+
+    if priorities:
+        queryset = queryset.filter(priority__in=priorities)
+
+    if assignees:
+        queryset = queryset.filter(assigned_to_id__in=assignees)
+
+    if tag_names:
+        queryset = queryset.filter(id__in=tasks_with_all_tags(tag_names, candidates, changed_since))
+
+    if params.get("overdue", "").lower() == "true":
+        queryset = queryset.filter(
+            status__in=[Task.Status.PENDING, Task.Status.IN_PROGRESS],
+            deadline__lt=timezone.now()
+        )
+
+    search = params.get("search", "").strip()
+    if search:
+        queryset = queryset.filter(title__icontains=search)
+
+    return queryset
+
+
+# ---------- Audit log filters ----------
+STATUS_CLASSES = {"1xx", "2xx", "3xx", "4xx", "5xx"}
+
+
+def get_datetime_param(params, name):
+    raw = params.get(name, "").strip()
+    if not raw:
+        return None
+    value = parse_datetime(raw)
+    if value is None:
+        raise ValidationError({name: "Expected an ISO 8601 datetime."})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def apply_audit_log_filters(queryset, params):
+    """
+    Filter APIAuditLog rows by user id, endpoint prefix, HTTP method,
+    status class (e.g. ``4xx``) and a ``since``/``until`` time window.
+    Every filter maps onto one of the composite indexes of APIAuditLog.
+    """
+    users = get_int_list_param(params, "user")
+    if users:
+        queryset = queryset.filter(user_id__in=users)
+
+    endpoint = params.get("endpoint", "").strip()
+    if endpoint:
+        queryset = queryset.filter(endpoint__startswith=endpoint)
+
+    methods = [method.upper() for method in get_list_param(params, "method")]
+    if methods:
+        queryset = queryset.filter(method__in=methods)
+
+    status_class = params.get("status", "").strip().lower()
+    if status_class:
+        if status_class not in STATUS_CLASSES:
+            raise ValidationError({"status": "Expected one of 1xx, 2xx, 3xx, 4xx, 5xx."})
+        low = int(status_class[0]) * 100
+        queryset = queryset.filter(status_code__gte=low, status_code__lt=low + 100)
+
+    since = get_datetime_param(params, "since")
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+
+    until = get_datetime_param(params, "until")
+    if until:
+        queryset = queryset.filter(timestamp__lt=until)
+
+    return queryset
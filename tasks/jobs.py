@@ -0,0 +1,339 @@
+"""
+Background execution of bulk task operations.
+
+Large bulk updates, reassignments and creates are stored as ``BulkJob`` rows
+and processed by a local worker thread in chunks. Every chunk runs in its own
+short transaction, so a 100k-task job never holds one long transaction and
+progress is visible through ``GET /api/tasks/jobs/{id}/`` while it runs.
+
+Every item is validated before any is applied, and a job with invalid
+items fails with their errors and changes nothing. Validation sees the
+tasks as they were when the job started. Unlike the synchronous endpoints,
+a job that passed validation is not atomic:
+
+- an item that stopped being valid before its chunk was applied (its task
+  was deleted, or the parent of a new task was) is skipped, counted in
+  ``failed`` and listed in ``errors``;
+- a job that fails while applying keeps the chunks committed before.
+
+Each chunk records the job's progress (``position``) and renews its lease
+(``heartbeat_at``) in the chunk's own transaction. A RUNNING job whose lease
+is older than ``BULK_JOB_LEASE_SECONDS``, left behind by a worker that died,
+is claimed again and resumes after its last committed chunk; the remaining
+items are validated again first.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .changes import create_tasks, update_tasks
+from .models import BulkJob, Task
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, "BULK_JOB_CHUNK_SIZE", 500)
+# Requests touching more tasks than this are turned into jobs automatically
+SYNC_LIMIT = getattr(settings, "BULK_JOB_SYNC_LIMIT", 1000)
+# A RUNNING job not heard from for this long is claimed again
+LEASE_SECONDS = getattr(settings, "BULK_JOB_LEASE_SECONDS", 300)
+MAX_STORED_ERRORS = 100
+
+_worker = None
+_worker_lock = threading.Lock()
+# Set by wake_worker while a worker runs; the worker drains the queue again
+# before exiting, so a job committed as it finds the queue empty still runs
+_rerun = False
+
+
+def submit(kind, payload, user, total):
+    """
+    Store a pending job and wake the worker once the row is committed.
+    """
+    job = BulkJob.objects.create(
+        kind=kind,
+        payload=payload,
+        created_by=user,
+        total=total,
+    )
+    transaction.on_commit(wake_worker)
+    return job
+
+
+def wake_worker():
+    """
+    Start the worker thread unless one is already draining the queue.
+    """
+    global _worker, _rerun
+
+    with _worker_lock:
+        if _worker is not None:
+            _rerun = True
+            return
+        _worker = threading.Thread(
+            target=_worker_loop,
+            name="bulk-job-worker",
+            daemon=True,
+        )
+        _worker.start()
+
+
+def _worker_loop():
+    global _worker, _rerun
+
+    try:
+        while True:
+            try:
+                run_pending_jobs()
+            except Exception:
+                logger.exception("Bulk job worker crashed")
+            with _worker_lock:
+                if not _rerun:
+                    _worker = None
+                    return
+                _rerun = False
+    finally:
+        with _worker_lock:
+            if _worker is threading.current_thread():
+                _worker = None
+        connection.close()
+
+
+def run_pending_jobs():
+    """
+    Process pending jobs oldest first until the queue is empty.
+    Returns the number of jobs processed.
+    """
+    count = 0
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+        if job is None:
+            return count
+        process_job(job)
+        count += 1
+
+
+class LeaseLost(Exception):
+    """The job was claimed again by another worker while this one ran it"""
+
+
+def claim_next_job():
+    """
+    Move the oldest pending job, or a running job whose lease expired, to
+    RUNNING under a new lease. The conditional update makes the claim safe
+    when several workers or processes poll the same table.
+    """
+    now = timezone.now()
+    claimable = BulkJob.objects.filter(
+        Q(state=BulkJob.State.PENDING)
+        | Q(state=BulkJob.State.RUNNING, heartbeat_at__lt=now - timedelta(seconds=LEASE_SECONDS))
+    ).order_by("id")
+
+    for job_id, state, heartbeat_at in claimable.values_list("id", "state", "heartbeat_at")[:10]:
+        values = {"state": BulkJob.State.RUNNING, "heartbeat_at": now}
+        if state == BulkJob.State.PENDING:
+            values["started_at"] = now
+        claimed = BulkJob.objects.filter(
+            pk=job_id,
+            state=state,
+            heartbeat_at=heartbeat_at
+        ).update(**values)
+
+        if claimed:
+            return BulkJob.objects.get(pk=job_id)
+
+    return None
+
+
+def process_job(job):
+    validate, apply = HANDLERS[job.kind]
+    # A reclaimed job resumes after its last committed chunk
+    items = _job_items(job)[job.position:]
+
+    try:
+        errors = []
+        for chunk in _chunks(items, CHUNK_SIZE):
+            errors.extend(validate(job, chunk))
+            _renew_lease(job)
+        if errors:
+            BulkJob.objects.filter(pk=job.pk).update(
+                state=BulkJob.State.FAILED,
+                failed=F("failed") + len(errors),
+                finished_at=timezone.now()
+            )
+            _append_errors(job, errors)
+            return
+
+        for chunk in _chunks(items, CHUNK_SIZE):
+            with transaction.atomic():
+                done, skipped = apply(job, chunk)
+                _record_progress(job, len(chunk), done, skipped)
+    except LeaseLost:
+        logger.warning("Bulk job %s was claimed by another worker", job.pk)
+        return
+    except Exception as exc:
+        logger.exception("Bulk job %s failed", job.pk)
+        BulkJob.objects.filter(pk=job.pk).update(
+            state=BulkJob.State.FAILED,
+            finished_at=timezone.now()
+        )
+        _append_errors(job, [{"error": str(exc)}])
+        return
+
+    BulkJob.objects.filter(pk=job.pk).update(
+        state=BulkJob.State.COMPLETED,
+        finished_at=timezone.now()
+    )
+
+
+def _job_items(job):
+    if job.kind == BulkJob.Kind.CREATE:
+        return job.payload.get("tasks", [])
+    return job.payload.get("task_ids", [])
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _renew_lease(job):
+    """Extend the lease on ``job``; raises LeaseLost if another worker took it over"""
+    now = timezone.now()
+    renewed = BulkJob.objects.filter(pk=job.pk, heartbeat_at=job.heartbeat_at).update(heartbeat_at=now)
+    if not renewed:
+        raise LeaseLost(job.pk)
+    job.heartbeat_at = now
+
+
+def _record_progress(job, handled, done, skipped):
+    # Called in the chunk's transaction: LeaseLost rolls the chunk back
+    _renew_lease(job)
+    BulkJob.objects.filter(pk=job.pk).update(
+        position=F("position") + handled,
+        processed=F("processed") + done,
+        failed=F("failed") + len(skipped),
+    )
+    if skipped:
+        _append_errors(job, skipped)
+
+
+def _append_errors(job, errors):
+    # Only the worker writes this column, so read-modify-write is safe here
+    stored = BulkJob.objects.values_list("errors", flat=True).get(pk=job.pk)
+    room = MAX_STORED_ERRORS - len(stored)
+    if room > 0:
+        BulkJob.objects.filter(pk=job.pk).update(errors=stored + errors[:room])
+
+
+# ---------- Handlers ----------
+# Each kind has a validator, which returns the per-item errors of a chunk,
+# and an applier, which writes a validated chunk inside a transaction and
+# returns the number of items applied and the errors of the items it had to
+# skip because they changed since validation.
+
+def _missing_task_errors(task_ids, found, error="Task does not exist."):
+    return [
+        {"task_id": task_id, "error": error}
+        for task_id in task_ids if task_id not in found
+    ]
+
+
+def _lock_existing(task_ids):
+    """Lock the tasks of ``task_ids`` that still exist; returns (ids, errors for the rest)"""
+    found = set(Task.objects.select_for_update().filter(id__in=task_ids).values_list("id", flat=True))
+    return [task_id for task_id in task_ids if task_id in found], _missing_task_errors(
+        task_ids, found, "Task was deleted before the job applied it."
+    )
+
+
+def _validate_status_update(job, task_ids):
+    new_status = job.payload["status"]
+    tasks = Task.objects.filter(id__in=task_ids).select_related("parent_task")
+    found = {task.id: task for task in tasks}
+    errors = _missing_task_errors(task_ids, found)
+
+    if new_status == Task.Status.COMPLETED:
+        incomplete_parents = (
+            Task.objects.filter(parent_task_id__in=found)
+            .exclude(status=Task.Status.COMPLETED)
+            .values_list("parent_task_id", flat=True)
+            .distinct()
+        )
+        for task_id in incomplete_parents:
+            errors.append({
+                "task_id": task_id,
+                "error": "Cannot complete parent task with incomplete children."
+            })
+
+    if new_status == Task.Status.BLOCKED:
+        for task in found.values():
+            if task.parent_task and task.parent_task.status == Task.Status.COMPLETED:
+                errors.append({
+                    "task_id": task.id,
+                    "error": "Cannot block child under completed parent."
+                })
+    return errors
+
+
+def _apply_status_update(job, task_ids):
+    task_ids, skipped = _lock_existing(task_ids)
+    return update_tasks(task_ids, status=job.payload["status"]), skipped
+
+
+def _validate_reassign(job, task_ids):
+    found = set(Task.objects.filter(id__in=task_ids).values_list("id", flat=True))
+    return _missing_task_errors(task_ids, found)
+
+
+def _apply_reassign(job, task_ids):
+    task_ids, skipped = _lock_existing(task_ids)
+    return update_tasks(task_ids, assigned_to_id=job.payload["assigned_to"]), skipped
+
+
+def _create_item_serializers(items):
+    from .serializers import BulkTaskCreateItemSerializer
+
+    for index, item in enumerate(items):
+        serializer = BulkTaskCreateItemSerializer(data=item)
+        yield index, item, serializer, serializer.is_valid()
+
+
+def _validate_create(job, items):
+    return [
+        {"item": item.get("title", index), "error": serializer.errors}
+        for index, item, serializer, valid in _create_item_serializers(items)
+        if not valid
+    ]
+
+
+def _apply_create(job, items):
+    user = job.created_by
+    tasks = []
+    skipped = []
+    for index, item, serializer, valid in _create_item_serializers(items):
+        if not valid:
+            # Changed since validation, e.g. the parent task was deleted
+            skipped.append({"item": item.get("title", index), "error": serializer.errors})
+            continue
+
+        data = serializer.validated_data
+        # Same assignment rules as TaskWriteSerializer.create
+        if user.role == "developer":
+            data["assigned_to"] = user
+
+        tasks.append(Task(created_by=user, **data))
+
+    return len(create_tasks(tasks)), skipped
+
+
+HANDLERS = {
+    BulkJob.Kind.STATUS_UPDATE: (_validate_status_update, _apply_status_update),
+    BulkJob.Kind.REASSIGN: (_validate_reassign, _apply_reassign),
+    BulkJob.Kind.CREATE: (_validate_create, _apply_create),
+}
@@ -0,0 +1,112 @@
+"""
+Failed login tracking for ``CustomTokenObtainPairView``.
+
+Each failure is counted in two sliding windows, one per client IP and one
+per username, using the atomic counters of ``SlidingWindowLimiter`` in the
+shared cache. When either count goes over its threshold the IP is blocked
+through the blocklist, behind a CAPTCHA.
+
+Failures are not written one row at a time: they are summed in process
+memory per (window, IP, username) and a background thread bulk-inserts
+the finished windows into ``FailedAuthAttempt`` every ``FLUSH_INTERVAL``
+seconds. A burst of failed logins therefore costs one row per window and
+pair, whatever its size.
+"""
+import atexit
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+from .background import BackgroundFlusher
+from .blocklist import blocklist
+from .models import FailedAuthAttempt
+from .rate_limiter import SlidingWindowLimiter
+
+DEFAULTS = {
+    "WINDOW_SECONDS": 300,
+    "IP_THRESHOLD": 20,
+    "USERNAME_THRESHOLD": 10,
+    "BLOCK_SECONDS": 900,
+    "BACKGROUND": True,
+    "FLUSH_INTERVAL": 10.0,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "LOGIN_FAILURES", {})}
+
+
+def username_key(username):
+    # Usernames may hold characters that are not valid in cache keys
+    return hashlib.sha1(username.lower().encode("utf-8")).hexdigest()[:20]
+
+
+class FailedLoginTracker(BackgroundFlusher):
+    thread_name = "failed-logins"
+
+    def __init__(self, config=None):
+        super().__init__(get_config, config)
+        self.window = self.config["WINDOW_SECONDS"]
+        self.limiter = SlidingWindowLimiter(window=self.window)
+        self._pending = {}  # (window index, ip, username) -> count
+
+    def record(self, ip, username, now=None):
+        """
+        Count one failed login. Returns True when it pushed the IP or the
+        username over its threshold and the IP was blocked.
+        """
+        now = time.time() if now is None else now
+        username = (username or "")[:150]
+
+        key = (int(now // self.window), ip, username)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+        self.maybe_start()
+
+        over_ip = not self.limiter.hit(f"login-fail:ip:{ip}", self.config["IP_THRESHOLD"], now).allowed
+        over_username = username and not self.limiter.hit(
+            f"login-fail:user:{username_key(username)}", self.config["USERNAME_THRESHOLD"], now
+        ).allowed
+
+        if over_ip or over_username:
+            blocklist.block(ip, self.config["BLOCK_SECONDS"])
+            return True
+        return False
+
+    def flush(self, everything=False, now=None):
+        """
+        Write pending counts to FailedAuthAttempt, one row per window, IP
+        and username. Only finished windows are written unless
+        ``everything`` is set. Returns the number of rows.
+        """
+        now = time.time() if now is None else now
+        current = int(now // self.window)
+        with self._lock:
+            keys = [key for key in self._pending if everything or key[0] < current]
+            ready = {key: self._pending.pop(key) for key in keys}
+
+        if not ready:
+            return 0
+        return self.write_or_restore(ready, self._write)
+
+    def _write(self, ready):
+        FailedAuthAttempt.objects.bulk_create([
+            FailedAuthAttempt(
+                ip_address=ip,
+                username=username,
+                count=count,
+                window_start=datetime.fromtimestamp(index * self.window, dt_timezone.utc),
+            )
+            for (index, ip, username), count in ready.items()
+        ])
+        return len(ready)
+
+    def restore(self, entries):
+        for key, count in entries.items():
+            self._pending[key] = self._pending.get(key, 0) + count
+
+
+tracker = FailedLoginTracker()
+atexit.register(tracker.shutdown)
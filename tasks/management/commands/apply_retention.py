@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from tasks.retention import apply_retention
+
+
+class Command(BaseCommand):
+    help = "Delete expired rows from ever-growing tables in small, throttled chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            metavar="APP_LABEL.MODEL",
+            help="Only apply these policies",
+        )
+        parser.add_argument("--chunk-size", type=int, default=None)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=None,
+            help="Seconds to pause between chunks",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        reports = apply_retention(
+            only=options["only"],
+            chunk_size=options["chunk_size"],
+            sleep=options["sleep"],
+            dry_run=options["dry_run"],
+        )
+
+        verb = "would delete" if options["dry_run"] else "deleted"
+        total = 0
+        for report in reports:
+            total += report["deleted"]
+            self.stdout.write(
+                f"{report['model']}: {verb} {report['deleted']} rows "
+                f"in {report['chunks']} chunks, {report['seconds']}s "
+                f"({report['rows_per_second']} rows/s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Retention {verb} {total} rows"))
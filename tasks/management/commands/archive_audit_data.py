@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from tasks.archive import archive_expired
+
+
+class Command(BaseCommand):
+    help = "Move old audit log and task history rows to compressed JSONL archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            metavar="APP_LABEL.MODEL",
+            help="Only archive these models",
+        )
+
+    def handle(self, *args, **options):
+        results = archive_expired(only=options["only"])
+        for label, (rows, segments) in results.items():
+            self.stdout.write(f"{label}: archived {rows} rows in {segments} segments")
+        self.stdout.write(self.style.SUCCESS("Archive complete"))
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from tasks.archive import get_config, scan
+from tasks.filters import get_datetime_param
+
+
+class Command(BaseCommand):
+    help = "Print archived rows in a time range as JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default="tasks.APIAuditLog")
+        parser.add_argument("--since", help="ISO 8601 datetime (inclusive)")
+        parser.add_argument("--until", help="ISO 8601 datetime (exclusive)")
+        parser.add_argument(
+            "--where",
+            nargs="+",
+            default=[],
+            metavar="FIELD=VALUE",
+            help="Only rows whose field equals the value",
+        )
+        parser.add_argument("--limit", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["model"] not in get_config()["MODELS"]:
+            raise CommandError(f"{options['model']} is not archived")
+
+        try:
+            bounds = {
+                name: get_datetime_param({name: options[name] or ""}, name)
+                for name in ("since", "until")
+            }
+        except ValidationError:
+            raise CommandError("--since and --until must be ISO 8601 datetimes")
+
+        conditions = []
+        for condition in options["where"]:
+            field, _, value = condition.partition("=")
+            conditions.append((field, value))
+
+        printed = 0
+        for row in scan(options["model"], bounds["since"], bounds["until"]):
+            if any(str(row.get(field)) != value for field, value in conditions):
+                continue
+            self.stdout.write(json.dumps(row))
+            printed += 1
+            if options["limit"] and printed >= options["limit"]:
+                break
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.partitions import drop_partitions_before, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = "Drop API audit log partitions older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "AUDIT_LOG_RETENTION_DAYS", 30),
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if not options["dry_run"]:
+            # Keep future partitions in place even if the cron job for
+            # create_audit_partitions is missing
+            ensure_partitions()
+
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        dropped = drop_partitions_before(cutoff, dry_run=options["dry_run"])
+
+        verb = "Would drop" if options["dry_run"] else "Dropped"
+        for name, rows in dropped:
+            rows = "unknown" if rows is None else rows
+            self.stdout.write(f"{verb} {name} ({rows} rows)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(dropped)} audit log partitions older than {cutoff:%Y-%m-%d}"
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from tasks.partitions import ensure_partitions
+
+
+class Command(BaseCommand):
+    help = "Create API audit log partitions for the current and upcoming periods"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=None,
+            help="Number of future partitions (defaults to AUDIT_LOG_PARTITIONS_AHEAD)",
+        )
+
+    def handle(self, *args, **options):
+        created = ensure_partitions(ahead=options["ahead"])
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} audit log partitions"))
@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tasks.audit_writer import get_config
+from tasks.models import APIAuditLog
+
+
+class Command(BaseCommand):
+    help = "Insert audit records spilled to disk while the audit queue was full"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(get_config()["SPILL_PATH"])
+        replaying = path.with_suffix(path.suffix + ".replaying")
+
+        inserted = 0
+        # A file left over by a run that failed part way goes first; each
+        # file is replayed in one transaction, so nothing of it was kept
+        if replaying.exists():
+            inserted += self.replay(replaying, options["batch_size"])
+
+        if path.exists():
+            # Move the file aside so records spilled meanwhile go to a new file
+            path.rename(replaying)
+            inserted += self.replay(replaying, options["batch_size"])
+        elif not inserted:
+            self.stdout.write("No spilled audit records")
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"Replayed {inserted} audit records"))
+
+    def replay(self, replaying, batch_size):
+        inserted = 0
+        batch = []
+        with transaction.atomic(), replaying.open(encoding="utf-8") as spill_file:
+            for line in spill_file:
+                if not line.strip():
+                    continue
+                batch.append(APIAuditLog(**json.loads(line)))
+                if len(batch) >= batch_size:
+                    APIAuditLog.objects.bulk_create(batch)
+                    inserted += len(batch)
+                    batch = []
+
+            if batch:
+                APIAuditLog.objects.bulk_create(batch)
+                inserted += len(batch)
+
+        replaying.unlink()
+        return inserted
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks import jobs
+
+
+class Command(BaseCommand):
+    help = "Process pending bulk task jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new jobs instead of exiting when the queue is empty",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls in --loop mode",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = jobs.run_pending_jobs()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"Processed {processed} bulk jobs"))
+
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -1,65 +1,109 @@
-import json
+import time
+
+from django.conf import settings
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 from django.http import HttpRequest
 
-from tasks.models import APIAuditLog
+from tasks.audit_writer import audit_writer
+from tasks.middlewares.body_capture import BodyCapture, CapturingStream
+from tasks.rollups import aggregator, endpoint_pattern
 
 
 SENSITIVE_KEYS = {"password", "token", "secret"}
+CAPTURE_METHODS = ("POST", "PUT", "PATCH")
+
 
+def is_json_type(content_type):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return content_type == "application/json" or content_type.endswith("+json")
 
-def mask_sensitive(data):
-    if isinstance(data, dict):
-        return {
-            k: ("********" if k.lower() in SENSITIVE_KEYS else mask_sensitive(v))
-            for k, v in data.items()
-        }
-    if isinstance(data, list):
-        return [mask_sensitive(i) for i in data]
-    return data
+
+def body_limit():
+    # Bytes of each body kept in the log; the rest is only hashed and counted
+    return getattr(settings, "AUDIT_LOG_BODY_LIMIT", 8192)
 
 
 class AuditLoggingMiddleware(MiddlewareMixin):
 
+    def process_request(self, request: HttpRequest):
+        if not self.should_log(request):
+            return None
+
+        request._audit_started = time.perf_counter()
+        if request.method not in CAPTURE_METHODS:
+            return None
+
+        capture = BodyCapture(body_limit(), SENSITIVE_KEYS, is_json_type(request.content_type))
+        if hasattr(request, "_body"):
+            # Already read by an earlier middleware
+            capture.feed(request._body)
+        else:
+            request._stream = CapturingStream(request._stream, capture)
+        request._audit_capture = capture
+        return None
+
     def process_response(self, request: HttpRequest, response):
-        if request.path.startswith("/api/tasks/analytics/"):
+        if not self.should_log(request):
             return response
 
-        if not request.path.startswith("/api/"):
-            return response
+        started = getattr(request, "_audit_started", None)
+        duration_ms = (time.perf_counter() - started) * 1000 if started is not None else None
+
+        request_body = request_size = request_sha256 = None
+        capture = getattr(request, "_audit_capture", None)
+        if capture is not None:
+            if isinstance(request._stream, CapturingStream):
+                request._stream.drain()
+            request_body = capture.body()
+            request_size = capture.size
+            request_sha256 = capture.sha256
+
+        # Log response body ONLY for errors, and never for streamed responses
+        response_body = response_size = response_sha256 = None
+        if response.status_code >= 400 and not response.streaming:
+            response_capture = BodyCapture(
+                body_limit(),
+                SENSITIVE_KEYS,
+                is_json_type(response.get("Content-Type")),
+            )
+            response_capture.feed(response.content)
+            response_body = response_capture.body()
+            response_size = response_capture.size
+            response_sha256 = response_capture.sha256
 
-        request_body = None
-        response_body = None
-
-        if request.method in ("POST", "PUT", "PATCH"):
-            try:
-                raw_body = request.body.decode("utf-8")
-                if raw_body:
-                    request_body = mask_sensitive(json.loads(raw_body))
-            except Exception:
-                request_body = None
-
-        # Log response body ONLY for errors
-        if response.status_code >= 400:
-            try:
-                response_body = json.loads(response.content.decode("utf-8"))
-            except Exception:
-                response_body = None
-
-        APIAuditLog.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            endpoint=request.path,
-            method=request.method,
-            status_code=response.status_code,
-            request_body=request_body,
-            response_body=response_body,
-            ip_address=self.get_client_ip(request),
-            timestamp=timezone.now(),
-        )
+        if duration_ms is not None:
+            aggregator.record(
+                endpoint_pattern(request),
+                request.method,
+                response.status_code,
+                duration_ms,
+            )
+
+        # Queued and written in batches by a background thread
+        audit_writer.submit({
+            "user_id": request.user.id if request.user.is_authenticated else None,
+            "endpoint": request.path,
+            "method": request.method,
+            "status_code": response.status_code,
+            "request_body": request_body,
+            "request_size": request_size,
+            "request_sha256": request_sha256,
+            "response_body": response_body,
+            "response_size": response_size,
+            "response_sha256": response_sha256,
+            "ip_address": self.get_client_ip(request),
+            "duration_ms": duration_ms,
+            "timestamp": timezone.now(),
+        })
 
         return response
 
+    def should_log(self, request):
+        if request.path.startswith("/api/tasks/analytics/"):
+            return False
+        return request.path.startswith("/api/")
+
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
         if x_forwarded_for:
@@ -0,0 +1,193 @@
+"""
+Bounded capture of request and response bodies for the audit log.
+
+Bodies are never held in full: ``BodyCapture`` is fed chunks as they go by,
+hashes and counts every byte, and keeps a masked copy of at most
+``limit`` bytes. Masking happens while the JSON is being read, so values of
+sensitive keys are never stored, even in a truncated preview.
+"""
+import codecs
+import hashlib
+import json
+
+MASK = '"********"'
+
+
+class StreamingJSONMasker:
+    """
+    Incremental JSON rewriter that replaces the value of every object key in
+    ``sensitive_keys`` with ``"********"``. Text can be fed in arbitrary
+    pieces; it does not validate the document.
+    """
+
+    def __init__(self, sensitive_keys):
+        self.sensitive_keys = sensitive_keys
+        self.stack = []
+        self.expect_key = False
+        self.in_string = False
+        self.escape = False
+        self.key_chars = None
+        self.last_key = ""
+        # State while dropping the value of a sensitive key
+        self.skipping = False
+        self.skip_depth = 0
+        self.skip_in_string = False
+
+    def feed(self, text):
+        out = []
+        for char in text:
+            if self.skipping and self._skip(char):
+                continue
+            self._copy(char, out)
+        return "".join(out)
+
+    def _skip(self, char):
+        """Consume one character of a masked value; False when it ends the value"""
+        if self.skip_in_string:
+            if self.escape:
+                self.escape = False
+            elif char == "\\":
+                self.escape = True
+            elif char == '"':
+                self.skip_in_string = False
+                if self.skip_depth == 0:
+                    self.skipping = False
+            return True
+
+        if char == '"':
+            self.skip_in_string = True
+        elif char in "{[":
+            self.skip_depth += 1
+        elif char in "}]":
+            if self.skip_depth == 0:
+                # Closes the enclosing container of a masked scalar
+                self.skipping = False
+                return False
+            self.skip_depth -= 1
+            if self.skip_depth == 0:
+                self.skipping = False
+        elif char == "," and self.skip_depth == 0:
+            self.skipping = False
+            return False
+        return True
+
+    def _copy(self, char, out):
+        out.append(char)
+
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif char == "\\":
+                self.escape = True
+            elif char == '"':
+                self.in_string = False
+                if self.key_chars is not None:
+                    self.last_key = "".join(self.key_chars)
+                    self.key_chars = None
+                return
+            if self.key_chars is not None:
+                self.key_chars.append(char)
+            return
+
+        in_object = bool(self.stack) and self.stack[-1] == "{"
+        if char == '"':
+            self.in_string = True
+            if in_object and self.expect_key:
+                self.key_chars = []
+        elif char == ":" and in_object:
+            self.expect_key = False
+            if self.last_key.lower() in self.sensitive_keys:
+                out.append(MASK)
+                self.skipping = True
+                self.skip_depth = 0
+        elif char == "," and in_object:
+            self.expect_key = True
+        elif char in "{[":
+            self.stack.append(char)
+            self.expect_key = char == "{"
+        elif char in "}]":
+            if self.stack:
+                self.stack.pop()
+            self.expect_key = False
+
+
+class BodyCapture:
+    """Hash, size and a masked, size-limited copy of one body"""
+
+    def __init__(self, limit, sensitive_keys, is_json=True):
+        self.limit = limit
+        self.size = 0
+        self.truncated = False
+        self._hash = hashlib.sha256()
+        self._masker = StreamingJSONMasker(sensitive_keys) if is_json else None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._parts = []
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        self._hash.update(chunk)
+        kept = max(0, self.limit - self.size)
+        self.size += len(chunk)
+
+        if self._masker is None or self.truncated:
+            return
+        if len(chunk) > kept:
+            chunk = chunk[:kept]
+            self.truncated = True
+        if chunk:
+            self._parts.append(self._masker.feed(self._decoder.decode(chunk)))
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def body(self):
+        """
+        The masked body as stored in APIAuditLog: the parsed JSON when the
+        whole body was captured, a preview dict when it was truncated, and
+        None for empty or non-JSON bodies.
+        """
+        if self._masker is None or not self.size:
+            return None
+
+        text = "".join(self._parts)
+        if not self.truncated:
+            text += self._masker.feed(self._decoder.decode(b"", final=True))
+            try:
+                return json.loads(text)
+            except ValueError:
+                return None
+        return {"truncated": True, "preview": text}
+
+
+class CapturingStream:
+    """
+    Wraps ``request._stream`` so the body is captured while the view (DRF
+    parsers, ``request.body``) reads it, without buffering a second copy.
+    """
+
+    def __init__(self, stream, capture):
+        self.stream = stream
+        self.capture = capture
+
+    def read(self, *args, **kwargs):
+        data = self.stream.read(*args, **kwargs)
+        self.capture.feed(data)
+        return data
+
+    def readline(self, *args, **kwargs):
+        data = self.stream.readline(*args, **kwargs)
+        self.capture.feed(data)
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def close(self):
+        self.stream.close()
+
+    def drain(self, chunk_size=64 * 1024):
+        """Read whatever the view left unread so size and hash cover the whole body"""
+        while self.read(chunk_size):
+            pass
@@ -1,11 +1,8 @@
 
 from datetime import timedelta
-import time
 from django.utils import timezone
-from django.core.cache import cache
-from notifications.models import Notification
 from tasks.models import Task
-from tasks.rate_limits import RATE_LIMITS, WINDOW_SECONDS
+from tasks.rate_limiter import limiter
 
 PRIORITY_ORDER = ["low", "medium", "high", "critical"]
 
@@ -36,14 +33,9 @@ class PriorityEscalationMiddleware:
                     old_priority = task.priority
                     task.priority = PRIORITY_ORDER[idx + 1]
                     task.priority_escalated = True
+                    # Notified by notifications.signals.create_priority_notification
+                    task._priority_old = old_priority
                     task.save()
-
-                    # Create notification
-                    Notification.objects.create(
-                        user=task.assigned_to,
-                        task=task,
-                        message=f"Priority of task '{task.title}' escalated from {old_priority} to {task.priority} due to upcoming deadline."
-                    )
             except ValueError:
                 # skip if priority is invalid
                 continue
@@ -53,34 +45,27 @@ class PriorityEscalationMiddleware:
 
 
 class SuccessfulRequestCountingMiddleware:
+    """
+    Only successful requests count against the rate limit: quota reserved by
+    RoleBasedThrottle is given back when the response is an error. Also
+    exposes the limit and remaining quota as response headers.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         response = self.get_response(request)
 
-        user = getattr(request, "user", None)
-        if not user or not user.is_authenticated:
+        decision = getattr(request, "rate_limit", None)
+        if decision is None:
             return response
 
-        if response.status_code >= 400:
-            return response  
-
-        method_type = "read" if request.method in ("GET", "HEAD", "OPTIONS") else "write"
-        role = user.role
-        limit = RATE_LIMITS.get(role, {}).get(method_type)
-
-        if limit in (None, 0):
-            return response
-
-        key = f"rate:{user.id}:{method_type}"
-        record = cache.get(key)
-
-        if not record:
-            record = {"count": 1, "start": time.time()}
+        response["X-RateLimit-Limit"] = str(decision.limit)
+        if decision.allowed and response.status_code >= 400:
+            limiter.refund(decision.reservation)
+            response["X-RateLimit-Remaining"] = str(decision.remaining + 1)
         else:
-            record["count"] += 1
+            response["X-RateLimit-Remaining"] = str(decision.remaining)
 
-        cache.set(key, record, WINDOW_SECONDS)
-
-        return response
\ No newline at end of file
+        return response
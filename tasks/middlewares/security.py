@@ -1,6 +1,37 @@
+import ipaddress
+
+from django.conf import settings
 from django.http import JsonResponse
-from django.utils import timezone
-from django.core.cache import cache
+
+from tasks.blocklist import blocklist
+
+
+def _trusted(address):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in ipaddress.ip_network(proxy, strict=False) for proxy in getattr(settings, "TRUSTED_PROXIES", []))
+
+
+def get_client_ip(request):
+    """
+    Address of the client, for blocking and failed login counts.
+
+    ``X-Forwarded-For`` is set by the client, so it is only read when the
+    request comes from one of ``TRUSTED_PROXIES``; then the nearest hop that
+    is not itself a trusted proxy is the client. Otherwise ``REMOTE_ADDR``.
+    """
+    ip = request.META.get("REMOTE_ADDR")
+    if not _trusted(ip):
+        return ip
+    hops = [hop.strip() for hop in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _trusted(hop):
+            return hop
+        ip = hop
+    return ip
+
 
 class SmartSecurityMiddleware:
     def __init__(self, get_response):
@@ -15,30 +46,27 @@ class SmartSecurityMiddleware:
         if request.path.startswith("/api/tasks/analytics/"):
             return self.get_response(request)
 
-        # Example: blocked IP logic
-        blocked_key = f"blocked:{ip}"
-        blocked_until = cache.get(blocked_key)
+        # In-process lookup; addresses that are not blocked cost no I/O
+        block = blocklist.get(ip)
 
-        if blocked_until and timezone.now() < blocked_until:
+        if block is not None:
+            _, captcha_question, expected = block
             # CAPTCHA requirement
             captcha_answer = request.headers.get("X-Captcha-Answer")
-            expected = cache.get(f"captcha:{ip}")
 
             if not captcha_answer or captcha_answer != str(expected):
                 return JsonResponse(
                     {
                         "detail": "IP blocked",
-                        "captcha_question": "What is 3 + 4?"
+                        "captcha_question": captcha_question
                     },
                     status=403
                 )
 
             # CAPTCHA solved → unblock
-            cache.delete(blocked_key)
-            cache.delete(f"captcha:{ip}")
+            blocklist.unblock(ip)
 
         return self.get_response(request)
 
     def get_client_ip(self, request):
-        xff = request.META.get("HTTP_X_FORWARDED_FOR")
-        return xff.split(",")[0] if xff else request.META.get("REMOTE_ADDR")
+        return get_client_ip(request)
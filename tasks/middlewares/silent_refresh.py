@@ -1,42 +1,24 @@
-from datetime import timedelta
-from django.utils.timezone import now
-from django.conf import settings
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import AccessToken
+from authentication.authentication import issue_refreshed_access_token
 
 
 class SilentRefreshMiddleware:
     """
     If access token is expiring within 2 minutes,
     issue a new one automatically.
+
+    Reuses the token and user that ClaimsJWTAuthentication put on the
+    request, so it never decodes the token or loads the user again.
+    Requests that were not authenticated with a token are left alone.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
-        self.jwt_auth = JWTAuthentication()
 
     def __call__(self, request):
         response = self.get_response(request)
 
-        header = request.headers.get("Authorization")
-        if not header or not header.startswith("Bearer "):
+        token = getattr(request, "jwt_token", None)
+        if token is None:
             return response
 
-        try:
-            token_str = header.split(" ")[1]
-            token = AccessToken(token_str)
-
-            exp_timestamp = token["exp"]
-            remaining = exp_timestamp - int(now().timestamp())
-
-            # Last 2 minutes
-            if remaining <= 120:
-                user = self.jwt_auth.get_user(token)
-
-                new_token = AccessToken.for_user(user)
-                response["X-New-Access-Token"] = str(new_token)
-
-        except Exception:
-            pass  # invalid token → ignore
-
-        return response
\ No newline at end of file
+        return issue_refreshed_access_token(response, request.jwt_user, token)
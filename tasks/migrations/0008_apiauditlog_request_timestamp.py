@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-19 01:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_tag_name_prefix_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apiauditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
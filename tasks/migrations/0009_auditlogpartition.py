@@ -0,0 +1,133 @@
+# Generated by Django 5.2.10 on 2026-10-19 01:02
+
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+
+PARENT = "tasks_apiauditlog"
+LEGACY = "tasks_apiauditlog_legacy"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def period_start(moment, interval):
+    if interval == "day":
+        return datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def next_period(start, interval):
+    if interval == "day":
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def legacy_boundary(APIAuditLog, interval):
+    """
+    Start of the period after the newest existing row, so the bounds follow
+    the data and not the time migrate happens to run
+    """
+    newest = APIAuditLog.objects.aggregate(newest=models.Max("timestamp"))["newest"]
+    if newest is None:
+        return EPOCH
+    return next_period(period_start(newest.astimezone(timezone.utc), interval), interval)
+
+
+def partition_audit_log(apps, schema_editor):
+    """
+    Turn tasks_apiauditlog into a range-partitioned table on PostgreSQL.
+
+    Existing rows stay where they are: the old table is attached as the
+    legacy partition covering everything before the period after its
+    newest row. Later periods are created by tasks.partitions.ensure_partitions
+    (create_audit_partitions, cleanup_audit_logs), which moves rows the
+    default partition caught in the meantime. On other databases only the
+    catalog is written (emulated layout).
+
+    The slow steps run before the table is locked: a unique index on
+    (id, timestamp) for the new primary key is built concurrently, and a
+    CHECK constraint matching the legacy range is added NOT VALID and then
+    validated, so ATTACH PARTITION neither builds an index nor scans the
+    table while holding its ACCESS EXCLUSIVE lock. Rows with a timestamp
+    past the boundary are rejected from then on, so do not run this across
+    a period boundary.
+    """
+    AuditLogPartition = apps.get_model("tasks", "AuditLogPartition")
+    APIAuditLog = apps.get_model("tasks", "APIAuditLog")
+    interval = getattr(settings, "AUDIT_LOG_PARTITION_INTERVAL", "month")
+    boundary = legacy_boundary(APIAuditLog, interval)
+    connection = schema_editor.connection
+
+    if connection.vendor == "postgresql":
+        user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+        prepare = [
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{LEGACY}_id_ts" '
+            f'ON "{PARENT}" ("id", "timestamp")',
+            f'ALTER TABLE "{PARENT}" ADD CONSTRAINT "{LEGACY}_range" '
+            f"CHECK (\"timestamp\" < '{boundary.isoformat()}') NOT VALID",
+            f'ALTER TABLE "{PARENT}" VALIDATE CONSTRAINT "{LEGACY}_range"',
+        ]
+        swap = [
+            f'ALTER TABLE "{PARENT}" RENAME TO "{LEGACY}"',
+            f'ALTER TABLE "{LEGACY}" ADD CONSTRAINT "{LEGACY}_id_ts" UNIQUE USING INDEX "{LEGACY}_id_ts"',
+            f'CREATE TABLE "{PARENT}" (LIKE "{LEGACY}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("timestamp")',
+            # Partitioned tables cannot own identity columns before PG 17,
+            # so ids come from a plain sequence continuing the old one.
+            f'CREATE SEQUENCE "{PARENT}_id_seq" OWNED BY "{PARENT}"."id"',
+            f"SELECT setval('\"{PARENT}_id_seq\"', "
+            f'COALESCE((SELECT MAX("id") FROM "{LEGACY}"), 0) + 1, false)',
+            f'ALTER TABLE "{PARENT}" ALTER COLUMN "id" '
+            f"SET DEFAULT nextval('\"{PARENT}_id_seq\"')",
+            f'ALTER TABLE "{LEGACY}" ALTER COLUMN "id" DROP IDENTITY IF EXISTS',
+            f'ALTER TABLE "{PARENT}" ADD PRIMARY KEY ("id", "timestamp")',
+            f'ALTER TABLE "{PARENT}" ADD CONSTRAINT "{PARENT}_user_id_fk" '
+            f'FOREIGN KEY ("user_id") REFERENCES "{user_table}" ("id") '
+            f'DEFERRABLE INITIALLY DEFERRED',
+            f'CREATE INDEX "{PARENT}_user_id_idx" ON "{PARENT}" ("user_id")',
+            f'ALTER TABLE "{PARENT}" ATTACH PARTITION "{LEGACY}" '
+            f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')",
+            f'ALTER TABLE "{LEGACY}" DROP CONSTRAINT "{LEGACY}_range"',
+            f'CREATE TABLE "{PARENT}_default" PARTITION OF "{PARENT}" DEFAULT',
+        ]
+        # Outside a transaction: CREATE INDEX CONCURRENTLY needs it, and the
+        # validation scan then holds no lock that blocks writes
+        with connection.cursor() as cursor:
+            for statement in prepare:
+                cursor.execute(statement)
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for statement in swap:
+                cursor.execute(statement)
+            AuditLogPartition.objects.create(name=LEGACY, range_start=EPOCH, range_end=boundary)
+        return
+
+    AuditLogPartition.objects.create(name=LEGACY, range_start=EPOCH, range_end=boundary)
+
+
+class Migration(migrations.Migration):
+    # See partition_audit_log: the index is built concurrently
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0008_apiauditlog_request_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=63, unique=True)),
+                ('range_start', models.DateTimeField()),
+                ('range_end', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['range_start'],
+            },
+        ),
+        # Not reversible on PostgreSQL: the partitioned layout is kept
+        migrations.RunPython(partition_audit_log, migrations.RunPython.noop, atomic=False),
+    ]
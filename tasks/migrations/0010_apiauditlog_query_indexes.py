@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-19 01:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_auditlogpartition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apiauditlog',
+            index=models.Index(fields=['timestamp', 'id'], name='audit_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apiauditlog',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='audit_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apiauditlog',
+            index=models.Index(fields=['endpoint', 'timestamp'], name='audit_endpoint_ts_idx', opclasses=['varchar_pattern_ops', 'timestamptz_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='apiauditlog',
+            index=models.Index(fields=['status_code', 'timestamp'], name='audit_status_ts_idx'),
+        ),
+    ]
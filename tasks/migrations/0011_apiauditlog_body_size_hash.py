@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-19 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_apiauditlog_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiauditlog',
+            name='request_sha256',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='apiauditlog',
+            name='request_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='apiauditlog',
+            name='response_sha256',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='apiauditlog',
+            name='response_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.10 on 2026-10-19 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_apiauditlog_body_size_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiauditlog',
+            name='duration_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RequestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField()),
+                ('endpoint', models.CharField(max_length=255)),
+                ('method', models.CharField(max_length=10)),
+                ('count', models.PositiveIntegerField()),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('client_errors', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField()),
+                ('max_ms', models.FloatField()),
+                ('p50_ms', models.FloatField(null=True)),
+                ('p95_ms', models.FloatField(null=True)),
+                ('p99_ms', models.FloatField(null=True)),
+                ('sketch', models.JSONField()),
+            ],
+            options={
+                'ordering': ['-minute'],
+                'indexes': [models.Index(fields=['minute'], name='rollup_minute_idx'), models.Index(fields=['endpoint', 'method', 'minute'], name='rollup_endpoint_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.10 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0013_blockedip_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedauthattempt',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='failedauthattempt',
+            name='username',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='failedauthattempt',
+            name='window_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='failedauthattempt',
+            index=models.Index(fields=['ip_address', 'window_start'], name='failed_auth_ip_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='failedauthattempt',
+            index=models.Index(fields=['username', 'window_start'], name='failed_auth_user_window_idx'),
+        ),
+    ]
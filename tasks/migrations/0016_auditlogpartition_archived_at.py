@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0015_task_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlogpartition',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
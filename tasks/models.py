@@ -1,6 +1,7 @@
 from datetime import timedelta, timezone
 from django.conf import settings
 from django.db import models
+from django.utils import timezone as django_timezone
 
 User = settings.AUTH_USER_MODEL
 
@@ -8,6 +9,17 @@ User = settings.AUTH_USER_MODEL
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
 
+    class Meta:
+        indexes = [
+            # Serves prefix (LIKE 'abc%') lookups for tag autocomplete;
+            # text_pattern_ops only applies on PostgreSQL.
+            models.Index(
+                fields=["name"],
+                name="tag_name_prefix_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -87,6 +99,12 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Recently changed tasks, rechecked next to bitmap index results
+            models.Index(fields=["updated_at"], name="task_updated_at_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -111,21 +129,153 @@ class APIAuditLog(models.Model):
     endpoint = models.CharField(max_length=255)
     method = models.CharField(max_length=10)
     status_code = models.PositiveIntegerField()
+    # Bodies are masked and cut at AUDIT_LOG_BODY_LIMIT bytes; size and
+    # sha256 always describe the full body
     request_body = models.JSONField(null=True, blank=True)
+    request_size = models.PositiveBigIntegerField(null=True, blank=True)
+    request_sha256 = models.CharField(max_length=64, null=True, blank=True)
     response_body = models.JSONField(null=True, blank=True)
+    response_size = models.PositiveBigIntegerField(null=True, blank=True)
+    response_sha256 = models.CharField(max_length=64, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    duration_ms = models.FloatField(null=True, blank=True)
+    # Set by the middleware at request time; records are inserted later in batches
+    timestamp = models.DateTimeField(default=django_timezone.now, editable=False)
 
     class Meta:
         ordering = ["-timestamp"]
+        # Composite indexes for the auditor API filters; every one ends in
+        # timestamp so the newest-first keyset pagination reads them in order
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="audit_ts_id_idx"),
+            models.Index(fields=["user", "timestamp", "id"], name="audit_user_ts_idx"),
+            models.Index(
+                fields=["endpoint", "timestamp"],
+                name="audit_endpoint_ts_idx",
+                opclasses=["varchar_pattern_ops", "timestamptz_ops"],
+            ),
+            models.Index(fields=["status_code", "timestamp"], name="audit_status_ts_idx"),
+        ]
 
     def __str__(self):
         return f"{self.method} {self.endpoint} [{self.status_code}]"
     
 
+class RequestRollup(models.Model):
+    """
+    Per-minute traffic and latency for one endpoint pattern and method,
+    written by tasks/rollups.py. Each process writes its own row per minute;
+    the sketch makes rows mergeable.
+    """
+    minute = models.DateTimeField()
+    endpoint = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    count = models.PositiveIntegerField()
+    errors = models.PositiveIntegerField(default=0)
+    client_errors = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField()
+    max_ms = models.FloatField()
+    p50_ms = models.FloatField(null=True)
+    p95_ms = models.FloatField(null=True)
+    p99_ms = models.FloatField(null=True)
+    sketch = models.JSONField()
+
+    class Meta:
+        ordering = ["-minute"]
+        indexes = [
+            models.Index(fields=["minute"], name="rollup_minute_idx"),
+            models.Index(fields=["endpoint", "method", "minute"], name="rollup_endpoint_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.minute:%Y-%m-%d %H:%M} {self.method} {self.endpoint}"
+
+
+class AuditLogPartition(models.Model):
+    """
+    Catalog of APIAuditLog time partitions (see tasks/partitions.py).
+    Mirrors the real partitions on PostgreSQL and is the emulated layout
+    on other databases.
+    """
+    name = models.CharField(max_length=63, unique=True)
+    range_start = models.DateTimeField()
+    range_end = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once tasks/archive.py has archived every row in the range
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["range_start"]
+
+    def __str__(self):
+        return self.name
+
+
+class BulkJob(models.Model):
+    """
+    A bulk task operation that runs outside the request in committed chunks.
+    """
+
+    class Kind(models.TextChoices):
+        STATUS_UPDATE = "status_update", "Status Update"
+        REASSIGN = "reassign", "Reassign"
+        CREATE = "create", "Create"
+
+    class State(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    state = models.CharField(
+        max_length=20,
+        choices=State.choices,
+        default=State.PENDING
+    )
+    payload = models.JSONField(default=dict)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="bulk_jobs"
+    )
+
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+
+    # Items handled (applied or skipped) in committed chunks
+    position = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Lease of the worker running the job, renewed with every chunk
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} job #{self.pk} [{self.state}]"
+
+
 class FailedAuthAttempt(models.Model):
+    """Failed logins of one (IP, username) pair, aggregated per window"""
     ip_address = models.GenericIPAddressField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    username = models.CharField(max_length=150, blank=True, default="")
+    count = models.PositiveIntegerField(default=1)
+    window_start = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ip_address", "window_start"], name="failed_auth_ip_window_idx"),
+            models.Index(fields=["username", "window_start"], name="failed_auth_user_window_idx"),
+        ]
 
 
 class BlockedIP(models.Model):
@@ -133,6 +283,11 @@ class BlockedIP(models.Model):
     captcha_question = models.CharField(max_length=100)
     captcha_answer = models.IntegerField()
     blocked_at = models.DateTimeField(auto_now_add=True)
+    # Blocks created before expires_at existed last one hour
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    def get_expires_at(self):
+        return self.expires_at or self.blocked_at + timedelta(hours=1)
 
     def is_expired(self):
-        return timezone.now() > self.blocked_at + timedelta(hours=1)
\ No newline at end of file
+        return django_timezone.now() > self.get_expires_at()
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Time partitions for APIAuditLog.
+
+On PostgreSQL ``tasks_apiauditlog`` is a table partitioned by range on
+``timestamp`` (see migration 0009): one partition per month or day, plus a
+default partition catching rows outside every range. Retention detaches and
+drops whole partitions, which is instant and leaves no bloat.
+
+A new partition may cover rows the default partition caught before it
+existed; PostgreSQL refuses to create it then. So it is created detached,
+those rows are moved into it and it is attached with a CHECK constraint
+that spares ATTACH its validation scan.
+
+Other backends (SQLite in development and tests) keep a single table and
+emulate the layout: partitions only exist in the ``AuditLogPartition``
+catalog, and dropping one deletes its time range in short, id-ranged
+chunks.
+
+When audit logs are archived (see tasks/archive.py), a partition is only
+dropped once it has been archived.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import archive
+from .models import APIAuditLog, AuditLogPartition
+
+PARENT_TABLE = APIAuditLog._meta.db_table
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+DELETE_CHUNK_SIZE = 5000
+
+
+def get_interval():
+    interval = getattr(settings, "AUDIT_LOG_PARTITION_INTERVAL", "month")
+    if interval not in ("month", "day"):
+        raise ValueError(f"Unsupported audit partition interval {interval!r}")
+    return interval
+
+
+def is_native():
+    return connection.vendor == "postgresql"
+
+
+def partition_start(moment, interval=None):
+    interval = interval or get_interval()
+    moment = moment.astimezone(dt_timezone.utc)
+    if interval == "day":
+        return datetime(moment.year, moment.month, moment.day, tzinfo=dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_start(start, interval=None):
+    interval = interval or get_interval()
+    if interval == "day":
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_name(start, interval=None):
+    interval = interval or get_interval()
+    if interval == "day":
+        return f"{PARENT_TABLE}_p{start:%Y_%m_%d}"
+    return f"{PARENT_TABLE}_p{start:%Y_%m}"
+
+
+def ensure_partitions(ahead=None, now=None):
+    """
+    Create the partition for the current period and ``ahead`` future ones.
+    Returns the names of newly created partitions.
+    """
+    if ahead is None:
+        ahead = getattr(settings, "AUDIT_LOG_PARTITIONS_AHEAD", 3)
+
+    start = partition_start(now or timezone.now())
+
+    created = []
+    for _ in range(ahead + 1):
+        end = next_start(start)
+        # Ranges already covered (e.g. by the legacy partition) are skipped
+        if AuditLogPartition.objects.filter(range_start__lt=end, range_end__gt=start).exists():
+            start = end
+            continue
+
+        name = partition_name(start)
+        with transaction.atomic():
+            if is_native():
+                _create_native_partition(name, start, end)
+            _, was_created = AuditLogPartition.objects.get_or_create(
+                name=name,
+                defaults={"range_start": start, "range_end": end},
+            )
+        if was_created:
+            created.append(name)
+        start = end
+
+    return created
+
+
+def _table_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [f'"{name}"'])
+    return cursor.fetchone()[0]
+
+
+def _create_native_partition(name, start, end):
+    """Create and attach partition ``name``, moving its rows out of the default partition"""
+    check = f"{name}_range"
+    with connection.cursor() as cursor:
+        if _table_exists(cursor, name):
+            return
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{PARENT_TABLE}" INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'ALTER TABLE "{name}" ADD CONSTRAINT "{check}" '
+            f'CHECK ("timestamp" >= %s AND "timestamp" < %s)',
+            [start, end],
+        )
+        if _table_exists(cursor, DEFAULT_PARTITION):
+            # ATTACH takes this lock anyway; taking it first stops rows for
+            # the range landing in the default partition after the move
+            cursor.execute(f'LOCK TABLE "{DEFAULT_PARTITION}" IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved',
+                [start, end],
+            )
+        cursor.execute(
+            f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+        # The partition bound now enforces the range
+        cursor.execute(f'ALTER TABLE "{name}" DROP CONSTRAINT "{check}"')
+
+
+def drop_partitions_before(cutoff, dry_run=False):
+    """
+    Drop every partition whose whole range is older than ``cutoff`` (and,
+    with archiving on, that has been archived).
+    Returns a list of (partition name, rows removed or None if unknown).
+    """
+    expired = AuditLogPartition.objects.filter(range_end__lte=cutoff).order_by("range_start")
+    if archive.archives_partitions():
+        expired = expired.filter(archived_at__isnull=False)
+    dropped = []
+
+    for partition in expired:
+        if dry_run:
+            dropped.append((partition.name, _count_rows(partition)))
+            continue
+
+        if is_native():
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{partition.name}"'
+                )
+                cursor.execute(f'DROP TABLE "{partition.name}"')
+                partition.delete()
+            dropped.append((partition.name, None))
+        else:
+            rows = _delete_range(partition.range_start, partition.range_end)
+            partition.delete()
+            dropped.append((partition.name, rows))
+
+    return dropped
+
+
+def _count_rows(partition):
+    return APIAuditLog.objects.filter(
+        timestamp__gte=partition.range_start,
+        timestamp__lt=partition.range_end,
+    ).count()
+
+
+def _delete_range(start, end):
+    """Emulated partition drop: delete a time range in short transactions"""
+    deleted = 0
+    rows = APIAuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+
+    while True:
+        ids = list(rows.order_by("id").values_list("id", flat=True)[:DELETE_CHUNK_SIZE])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            count, _ = APIAuditLog.objects.filter(id__in=ids).delete()
+        deleted += count
@@ -0,0 +1,132 @@
+"""
+Approximate sliding-window rate limiter built on atomic cache counters.
+
+Each (user, read/write) pair has one counter per fixed window of
+``WINDOW_SECONDS``. A request increments the current window's counter with
+a single ``cache.incr`` and is allowed when
+
+    previous window count * (share of the previous window still inside the
+    sliding window) + current count <= limit
+
+This is the two-window weighted estimate, not an exact sliding log: it
+assumes the previous window's requests were spread evenly over it, so a
+burst at the end of one window weighs in less than it would in an exact
+window. The count within a window is exact, so concurrent requests never
+admit more than ``limit`` in the current window.
+
+The previous window's count no longer changes once it has ended, so it is
+read from the cache once per window and then remembered in process memory.
+In the steady state every request therefore costs one atomic cache
+operation. Rejected requests, and requests whose response is an error, are
+given back with ``decr`` so only successful requests use up the quota.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.core.cache import cache as default_cache
+
+from tasks.rate_limits import WINDOW_SECONDS
+
+# Previous-window counts remembered per process
+MAX_REMEMBERED_WINDOWS = 10000
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int
+    # Counter key to give back with refund(); None when nothing was counted
+    reservation: str = None
+
+
+class SlidingWindowLimiter:
+    def __init__(self, cache=None, window=WINDOW_SECONDS):
+        self.cache = cache or default_cache
+        self.window = window
+        self._previous = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, name, index):
+        return f"rate:{name}:{index}"
+
+    def _incr(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # First request of the window; keep the counter through the next
+            # window, where it is read as the previous count
+            if self.cache.add(key, 1, timeout=self.window * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def _previous_count(self, name, index):
+        key = self._key(name, index - 1)
+        with self._lock:
+            if key in self._previous:
+                self._previous.move_to_end(key)
+                return self._previous[key]
+
+        count = self.cache.get(key, 0)
+        with self._lock:
+            self._previous[key] = count
+            if len(self._previous) > MAX_REMEMBERED_WINDOWS:
+                self._previous.popitem(last=False)
+        return count
+
+    def hit(self, name, limit, now=None):
+        """Count one request against ``name`` and decide whether it is allowed"""
+        now = time.time() if now is None else now
+        index, offset = divmod(now, self.window)
+        index = int(index)
+        weight = 1 - offset / self.window
+
+        key = self._key(name, index)
+        current = self._incr(key)
+        previous = self._previous_count(name, index)
+        used = previous * weight + current
+
+        if used <= limit:
+            return RateLimitDecision(
+                allowed=True,
+                limit=limit,
+                remaining=max(0, math.floor(limit - used)),
+                retry_after=0,
+                reservation=key,
+            )
+
+        self.refund(key)
+        return RateLimitDecision(
+            allowed=False,
+            limit=limit,
+            remaining=0,
+            retry_after=self._retry_after(previous, current - 1, limit, offset),
+        )
+
+    def _retry_after(self, previous, current, limit, offset):
+        """Seconds until one more request fits in the sliding window"""
+        room = limit - current - 1
+        if room >= 0 and previous:
+            # The previous window's weight must drop to room / previous
+            wait = self.window * (1 - room / previous) - offset
+            if wait <= self.window - offset:
+                return max(1, math.ceil(round(wait, 6)))
+        # Wait for the next window, where this one counts with falling weight
+        next_window = self.window - offset
+        room = limit - 1
+        if current and room < current:
+            next_window += self.window * (1 - room / current)
+        return max(1, math.ceil(round(next_window, 6)))
+
+    def refund(self, reservation):
+        try:
+            self.cache.decr(reservation)
+        except ValueError:
+            pass
+
+
+limiter = SlidingWindowLimiter()
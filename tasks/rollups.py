@@ -0,0 +1,287 @@
+"""
+Per-minute request rollups fed by ``AuditLoggingMiddleware``.
+
+Every logged request adds its duration to an in-process accumulator keyed by
+(minute, endpoint pattern, method). Finished minutes are flushed to
+``RequestRollup`` by a background thread every ``FLUSH_INTERVAL`` seconds,
+one row per key and process. Latency percentiles come from a mergeable
+quantile sketch stored with each row, so rows from several processes or
+minutes are combined at query time without touching raw audit rows.
+"""
+import atexit
+import math
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .background import BackgroundFlusher
+from .models import RequestRollup
+
+DEFAULTS = {
+    "ENABLED": True,
+    "BACKGROUND": True,
+    "FLUSH_INTERVAL": 10.0,
+    "SKETCH_ACCURACY": 0.01,
+}
+
+QUANTILES = {"p50_ms": 0.5, "p95_ms": 0.95, "p99_ms": 0.99}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "REQUEST_ROLLUPS", {})}
+
+
+# ---------- Quantile sketch ----------
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram (DDSketch): values are counted in buckets whose
+    bounds grow by ``gamma``, so any quantile is returned within
+    ``accuracy`` relative error. Two sketches merge by adding bucket counts.
+    """
+
+    MIN_VALUE = 1e-3
+
+    def __init__(self, accuracy=0.01):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= self.MIN_VALUE:
+            self.zeros += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Midpoint of the bucket, in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            "accuracy": self.accuracy,
+            "zeros": self.zeros,
+            "bins": {str(index): count for index, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["accuracy"])
+        sketch.zeros = data["zeros"]
+        sketch.bins = {int(index): count for index, count in data["bins"].items()}
+        sketch.count = sketch.zeros + sum(sketch.bins.values())
+        return sketch
+
+
+# ---------- Endpoint patterns ----------
+
+NAMED_GROUP = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+
+
+def endpoint_pattern(request):
+    """
+    The URL pattern a request matched (``/api/tasks/<pk>/``), so rollups do
+    not get one row per object id. Unmatched paths share one bucket.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None or match.route is None:
+        return "<unmatched>"
+    route = NAMED_GROUP.sub(r"<\1>", match.route).replace("^", "").replace("$", "")
+    return "/" + route
+
+
+# ---------- Aggregation ----------
+
+class Accumulator:
+    __slots__ = ("count", "errors", "client_errors", "total_ms", "max_ms", "sketch")
+
+    def __init__(self, accuracy):
+        self.count = 0
+        self.errors = 0
+        self.client_errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.sketch = QuantileSketch(accuracy)
+
+    def add(self, status_code, duration_ms):
+        self.count += 1
+        if status_code >= 500:
+            self.errors += 1
+        elif status_code >= 400:
+            self.client_errors += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.sketch.add(duration_ms)
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.client_errors += other.client_errors
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.sketch.merge(other.sketch)
+
+
+class RollupAggregator(BackgroundFlusher):
+    thread_name = "request-rollups"
+
+    def __init__(self, config=None):
+        super().__init__(get_config, config)
+        self._buckets = {}
+
+    def record(self, endpoint, method, status_code, duration_ms, moment=None):
+        if not self.config["ENABLED"]:
+            return
+        minute = (moment or timezone.now()).replace(second=0, microsecond=0)
+        key = (minute, endpoint, method)
+        with self._lock:
+            accumulator = self._buckets.get(key)
+            if accumulator is None:
+                accumulator = self._buckets[key] = Accumulator(self.config["SKETCH_ACCURACY"])
+            accumulator.add(status_code, duration_ms)
+        self.maybe_start()
+
+    def flush(self, everything=False):
+        """
+        Write accumulated minutes to RequestRollup. Only finished minutes are
+        written unless ``everything`` is set. Returns the number of rows.
+        """
+        current = timezone.now().replace(second=0, microsecond=0)
+        with self._lock:
+            keys = [key for key in self._buckets if everything or key[0] < current]
+            ready = {key: self._buckets.pop(key) for key in keys}
+
+        if not ready:
+            return 0
+        return self.write_or_restore(ready, self._write)
+
+    def _write(self, ready):
+        rows = []
+        for (minute, endpoint, method), acc in ready.items():
+            row = RequestRollup(
+                minute=minute,
+                endpoint=endpoint[:255],
+                method=method,
+                count=acc.count,
+                errors=acc.errors,
+                client_errors=acc.client_errors,
+                total_ms=acc.total_ms,
+                max_ms=acc.max_ms,
+                sketch=acc.sketch.to_dict(),
+            )
+            for field, q in QUANTILES.items():
+                setattr(row, field, acc.sketch.quantile(q))
+            rows.append(row)
+
+        RequestRollup.objects.bulk_create(rows)
+        return len(rows)
+
+    def restore(self, entries):
+        for key, accumulator in entries.items():
+            current = self._buckets.get(key)
+            if current is None:
+                self._buckets[key] = accumulator
+            else:
+                current.merge(accumulator)
+
+
+aggregator = RollupAggregator()
+atexit.register(aggregator.shutdown)
+
+
+# ---------- Queries ----------
+
+BUCKETS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Longest since..until span a query may cover per bucket size, so one
+# request reads at most about 44,000 minute rows per endpoint and method
+MAX_WINDOWS = {
+    "minute": timedelta(days=1),
+    "hour": timedelta(days=31),
+    "day": timedelta(days=366),
+}
+
+
+def bucket_start(moment, bucket):
+    if bucket == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+
+def summarize(queryset, bucket="hour"):
+    """
+    Merge rollup rows into one entry per (bucket, endpoint, method), newest
+    bucket first.
+    """
+    merged = {}
+    rows = queryset.values_list(
+        "minute", "endpoint", "method", "count", "errors",
+        "client_errors", "total_ms", "max_ms", "sketch",
+    )
+    for minute, endpoint, method, count, errors, client_errors, total_ms, max_ms, sketch in rows:
+        key = (bucket_start(minute, bucket), endpoint, method)
+        entry = merged.get(key)
+        if entry is None:
+            entry = merged[key] = {
+                "count": 0, "errors": 0, "client_errors": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "sketch": None,
+            }
+        entry["count"] += count
+        entry["errors"] += errors
+        entry["client_errors"] += client_errors
+        entry["total_ms"] += total_ms
+        entry["max_ms"] = max(entry["max_ms"], max_ms)
+        row_sketch = QuantileSketch.from_dict(sketch)
+        if entry["sketch"] is None:
+            entry["sketch"] = row_sketch
+        else:
+            entry["sketch"].merge(row_sketch)
+
+    results = []
+    for (start, endpoint, method), entry in sorted(merged.items(), key=lambda item: item[0], reverse=True):
+        result = {
+            "start": start,
+            "endpoint": endpoint,
+            "method": method,
+            "count": entry["count"],
+            "errors": entry["errors"],
+            "client_errors": entry["client_errors"],
+            "avg_ms": round(entry["total_ms"] / entry["count"], 3) if entry["count"] else None,
+            "max_ms": round(entry["max_ms"], 3),
+        }
+        for field, q in QUANTILES.items():
+            value = entry["sketch"].quantile(q)
+            result[field] = round(value, 3) if value is not None else None
+        results.append(result)
+    return results
@@ -1,8 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.utils import timezone
 
-from .models import Tag, Task, TaskHistory
+from .jobs import SYNC_LIMIT
+from .models import APIAuditLog, BulkJob, Tag, Task, TaskHistory
 
 User = get_user_model()
 
@@ -130,16 +132,51 @@ class TaskWriteSerializer(serializers.ModelSerializer):
             instance.save()
 
             if tags_data is not None:
-                instance.tags.clear()
-                self._handle_tags(instance, tags_data)
+                self._handle_tags(instance, tags_data, replace=True)
 
         return instance
 
     # ---------- TAG HANDLING ----------
-    def _handle_tags(self, task, tags_data):
-        for tag_name in tags_data:
-            tag, _ = Tag.objects.get_or_create(name=tag_name)
-            task.tags.add(tag)
+    def _handle_tags(self, task, tags_data, replace=False):
+        """
+        Sync task tags with the given names using set operations:
+        one lookup for existing tags, one conflict-ignoring insert for new
+        ones, then only the added/removed links touch the through table.
+        """
+        names = list(dict.fromkeys(tags_data))
+        wanted = set(self._resolve_tag_ids(names).values())
+
+        current = set()
+        if replace:
+            current = set(task.tags.values_list("id", flat=True))
+
+        to_add = wanted - current
+        to_remove = current - wanted
+
+        if to_remove:
+            task.tags.remove(*to_remove)
+        if to_add:
+            task.tags.add(*to_add)
+
+    def _resolve_tag_ids(self, names):
+        """Map tag names to ids, creating missing tags in one statement"""
+        if not names:
+            return {}
+
+        tag_ids = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+        missing = [name for name in names if name not in tag_ids]
+
+        if missing:
+            # ignore_conflicts covers tags created concurrently by another request
+            Tag.objects.bulk_create(
+                [Tag(name=name) for name in missing],
+                ignore_conflicts=True
+            )
+            tag_ids.update(
+                Tag.objects.filter(name__in=missing).values_list("name", "id")
+            )
+
+        return tag_ids
 
     # ---------- CASCADING STATUS ----------
     def _handle_cascading_status(self, task, new_status):
@@ -196,10 +233,17 @@ class BulkTaskUpdateSerializer(serializers.Serializer):
         allow_empty=False
     )
     status = serializers.ChoiceField(choices=Task.Status.choices)
+    run_async = serializers.BooleanField(required=False, default=False)
 
     def validate(self, attrs):
-        task_ids = attrs.get('task_ids')
+        task_ids = list(dict.fromkeys(attrs.get('task_ids')))
         status = attrs.get('status')
+        attrs['task_ids'] = task_ids
+
+        if attrs['run_async'] or len(task_ids) > SYNC_LIMIT:
+            # Parent-child rules are checked chunk by chunk by the job worker
+            attrs['run_async'] = True
+            return attrs
 
         tasks = Task.objects.filter(id__in=task_ids).select_related('parent_task')
         if tasks.count() != len(task_ids):
@@ -222,4 +266,99 @@ class BulkTaskUpdateSerializer(serializers.Serializer):
                         f"Cannot block child '{task.title}' under completed parent '{task.parent_task.title}'."
                     )
 
-        return attrs
\ No newline at end of file
+        return attrs
+
+class BulkTaskReassignSerializer(serializers.Serializer):
+    task_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False
+    )
+    assigned_to = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    run_async = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        attrs['task_ids'] = list(dict.fromkeys(attrs['task_ids']))
+        if len(attrs['task_ids']) > SYNC_LIMIT:
+            attrs['run_async'] = True
+        return attrs
+
+
+class BulkTaskCreateItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Task
+        fields = [
+            "title",
+            "description",
+            "status",
+            "priority",
+            "assigned_to",
+            "parent_task",
+            "estimated_hours",
+            "actual_hours",
+            "deadline",
+        ]
+
+
+class BulkTaskCreateSerializer(serializers.Serializer):
+    # Items are validated by the job worker, chunk by chunk
+    tasks = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False
+    )
+
+
+class BulkJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    throughput = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BulkJob
+        fields = [
+            "id",
+            "kind",
+            "state",
+            "total",
+            "processed",
+            "failed",
+            "progress",
+            "throughput",
+            "errors",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_progress(self, obj):
+        """Percentage of items processed"""
+        if not obj.total:
+            return 100.0 if obj.state == BulkJob.State.COMPLETED else 0.0
+        return round(obj.processed * 100 / obj.total, 2)
+
+    def get_throughput(self, obj):
+        """Items processed per second since the job started"""
+        if not obj.started_at:
+            return 0.0
+        end = obj.finished_at or timezone.now()
+        elapsed = (end - obj.started_at).total_seconds()
+        return round(obj.processed / elapsed, 2) if elapsed > 0 else float(obj.processed)
+
+
+class APIAuditLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = APIAuditLog
+        fields = [
+            "id",
+            "user",
+            "endpoint",
+            "method",
+            "status_code",
+            "ip_address",
+            "timestamp",
+            "duration_ms",
+            "request_body",
+            "request_size",
+            "request_sha256",
+            "response_body",
+            "response_size",
+            "response_sha256",
+        ]
@@ -327,3 +327,1028 @@ class TagTest(TestCase):
         
         self.assertEqual(task.tags.count(), 3)
         self.assertIn(tag1, task.tags.all())
+
+
+class AuditLogWriterTest(TestCase):
+    """Test the buffered audit log writer"""
+
+    def make_writer(self, **overrides):
+        from unittest import mock
+        from tasks.audit_writer import AuditLogWriter, get_config
+
+        config = {**get_config(), "ASYNC": True, **overrides}
+        writer = AuditLogWriter(config)
+        # Drain from the test thread instead of the background thread
+        patcher = mock.patch.object(writer, "_ensure_started")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return writer
+
+    def record(self, index=0):
+        return {
+            "user_id": None,
+            "endpoint": f"/api/tasks/{index}/",
+            "method": "GET",
+            "status_code": 200,
+            "request_body": None,
+            "response_body": None,
+            "ip_address": "127.0.0.1",
+            "timestamp": timezone.now() - timedelta(minutes=5),
+        }
+
+    def test_records_written_in_batches_on_flush(self):
+        """Test queued records are bulk inserted with their request timestamp"""
+        writer = self.make_writer(BATCH_SIZE=2)
+        records = [self.record(i) for i in range(5)]
+        for record in records:
+            writer.submit(record)
+
+        self.assertEqual(APIAuditLog.objects.count(), 0)
+
+        writer.flush()
+        self.assertEqual(APIAuditLog.objects.count(), 5)
+        self.assertEqual(writer.stats()["written"], 5)
+        self.assertEqual(
+            APIAuditLog.objects.get(endpoint="/api/tasks/0/").timestamp,
+            records[0]["timestamp"]
+        )
+
+    def test_drop_policy_counts_overflow(self):
+        """Test a full queue drops records and counts them"""
+        writer = self.make_writer(QUEUE_SIZE=2, OVERFLOW="drop")
+        for i in range(5):
+            writer.submit(self.record(i))
+
+        self.assertEqual(writer.stats()["dropped"], 3)
+        writer.flush()
+        self.assertEqual(APIAuditLog.objects.count(), 2)
+
+    def test_spill_policy_and_replay(self):
+        """Test overflow is spilled to disk and can be replayed"""
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+        from django.test import override_settings
+
+        spill_path = Path(tempfile.mkdtemp()) / "spill.jsonl"
+        writer = self.make_writer(QUEUE_SIZE=1, OVERFLOW="spill", SPILL_PATH=spill_path)
+        for i in range(3):
+            writer.submit(self.record(i))
+
+        self.assertEqual(writer.stats()["spilled"], 2)
+        self.assertEqual(len(spill_path.read_text().splitlines()), 2)
+
+        with override_settings(AUDIT_LOG_WRITER={"SPILL_PATH": spill_path}):
+            call_command("replay_audit_spill", stdout=StringIO())
+
+        self.assertEqual(APIAuditLog.objects.count(), 2)
+        self.assertFalse(spill_path.exists())
+
+    def test_replay_picks_up_leftover_file(self):
+        """Test a file left by a failed replay is replayed by the next run"""
+        import json
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+        from django.core.serializers.json import DjangoJSONEncoder
+        from django.test import override_settings
+
+        spill_path = Path(tempfile.mkdtemp()) / "spill.jsonl"
+        leftover = spill_path.with_suffix(".jsonl.replaying")
+        leftover.write_text(json.dumps(self.record(1), cls=DjangoJSONEncoder) + "\n")
+        spill_path.write_text(json.dumps(self.record(2), cls=DjangoJSONEncoder) + "\n")
+
+        with override_settings(AUDIT_LOG_WRITER={"SPILL_PATH": spill_path}):
+            call_command("replay_audit_spill", stdout=StringIO())
+
+        self.assertEqual(APIAuditLog.objects.count(), 2)
+        self.assertFalse(leftover.exists())
+        self.assertFalse(spill_path.exists())
+
+
+class AuditPartitionTest(TestCase):
+    """Test time partitioning of the audit log (emulated on SQLite)"""
+
+    def log_at(self, moment):
+        return APIAuditLog.objects.create(
+            endpoint="/api/tasks/",
+            method="GET",
+            status_code=200,
+            timestamp=moment,
+        )
+
+    def test_partition_bounds_and_names(self):
+        """Test monthly and daily partition ranges and names"""
+        from datetime import datetime, timezone as dt_timezone
+        from tasks import partitions
+
+        moment = datetime(2025, 12, 15, 10, 30, tzinfo=dt_timezone.utc)
+
+        start = partitions.partition_start(moment, "month")
+        self.assertEqual(start, datetime(2025, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.next_start(start, "month"),
+                         datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.partition_name(start, "month"),
+                         "tasks_apiauditlog_p2025_12")
+
+        start = partitions.partition_start(moment, "day")
+        self.assertEqual(partitions.next_start(start, "day"),
+                         datetime(2025, 12, 16, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.partition_name(start, "day"),
+                         "tasks_apiauditlog_p2025_12_15")
+
+    def test_ensure_partitions_is_idempotent(self):
+        """Test future partitions are created once and never overlap"""
+        from tasks import partitions
+        from tasks.models import AuditLogPartition
+
+        partitions.ensure_partitions(ahead=5)
+        count = AuditLogPartition.objects.count()
+        self.assertEqual(partitions.ensure_partitions(ahead=5), [])
+        self.assertEqual(AuditLogPartition.objects.count(), count)
+
+        ranges = list(AuditLogPartition.objects.values_list("range_start", "range_end"))
+        for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+            self.assertLessEqual(end, next_start)
+
+    def test_migration_bounds_follow_the_data(self):
+        """Test the legacy partition ends after the newest row, whenever migrate runs"""
+        from datetime import datetime, timezone as dt_timezone
+        from importlib import import_module
+
+        migration = import_module("tasks.migrations.0009_auditlogpartition")
+
+        self.assertEqual(migration.legacy_boundary(APIAuditLog, "month"), migration.EPOCH)
+        self.log_at(datetime(2025, 12, 15, 10, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(migration.legacy_boundary(APIAuditLog, "month"),
+                         datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(migration.legacy_boundary(APIAuditLog, "day"),
+                         datetime(2025, 12, 16, tzinfo=dt_timezone.utc))
+
+    def test_drop_removes_only_expired_partitions(self):
+        """Test retention removes whole expired ranges and keeps the rest"""
+        from datetime import datetime, timezone as dt_timezone
+        from tasks import partitions
+        from tasks.models import AuditLogPartition
+
+        AuditLogPartition.objects.all().delete()
+        now = datetime(2026, 3, 10, tzinfo=dt_timezone.utc)
+        partitions.ensure_partitions(ahead=0, now=datetime(2026, 1, 5, tzinfo=dt_timezone.utc))
+        partitions.ensure_partitions(ahead=0, now=datetime(2026, 2, 5, tzinfo=dt_timezone.utc))
+        partitions.ensure_partitions(ahead=1, now=now)
+
+        old = self.log_at(datetime(2026, 1, 20, tzinfo=dt_timezone.utc))
+        recent = self.log_at(datetime(2026, 2, 20, tzinfo=dt_timezone.utc))
+        current = self.log_at(datetime(2026, 3, 9, tzinfo=dt_timezone.utc))
+
+        # Cutoff inside February: only January is entirely expired, and it
+        # is kept until it has been archived
+        cutoff = datetime(2026, 2, 10, tzinfo=dt_timezone.utc)
+        self.assertEqual(partitions.drop_partitions_before(cutoff), [])
+        AuditLogPartition.objects.update(archived_at=now)
+        self.assertEqual(
+            partitions.drop_partitions_before(cutoff, dry_run=True),
+            [("tasks_apiauditlog_p2026_01", 1)],
+        )
+        self.assertTrue(APIAuditLog.objects.filter(pk=old.pk).exists())
+
+        dropped = partitions.drop_partitions_before(cutoff)
+
+        self.assertEqual(dropped, [("tasks_apiauditlog_p2026_01", 1)])
+        self.assertFalse(APIAuditLog.objects.filter(pk=old.pk).exists())
+        self.assertTrue(APIAuditLog.objects.filter(pk=recent.pk).exists())
+        self.assertTrue(APIAuditLog.objects.filter(pk=current.pk).exists())
+        self.assertFalse(AuditLogPartition.objects.filter(name="tasks_apiauditlog_p2026_01").exists())
+
+    def test_cleanup_command(self):
+        """Test the cleanup command drops partitions past retention"""
+        from io import StringIO
+        from django.core.management import call_command
+        from tasks.models import AuditLogPartition
+
+        AuditLogPartition.objects.all().delete()
+        AuditLogPartition.objects.create(
+            name="tasks_apiauditlog_p2020_01",
+            range_start=timezone.now() - timedelta(days=400),
+            range_end=timezone.now() - timedelta(days=370),
+            archived_at=timezone.now(),
+        )
+        self.log_at(timezone.now() - timedelta(days=380))
+        self.log_at(timezone.now())
+
+        call_command("cleanup_audit_logs", stdout=StringIO())
+
+        self.assertEqual(APIAuditLog.objects.count(), 1)
+        self.assertFalse(AuditLogPartition.objects.filter(name="tasks_apiauditlog_p2020_01").exists())
+        # Current and future partitions were pre-created
+        self.assertTrue(AuditLogPartition.objects.filter(range_end__gt=timezone.now()).exists())
+
+
+class AuditLogAPITest(APITestCase):
+    """Test the auditor audit log API"""
+
+    def setUp(self):
+        self.auditor = User.objects.create_user(
+            username="auditor",
+            email="auditor@test.com",
+            password="pass123",
+            role="auditor",
+            is_email_verified=True
+        )
+        self.developer = User.objects.create_user(
+            username="developer",
+            email="dev@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        self.now = timezone.now()
+        APIAuditLog.objects.bulk_create([
+            APIAuditLog(
+                user=self.developer if i % 2 else None,
+                endpoint=f"/api/tasks/{i}/",
+                method="PATCH" if i % 3 == 0 else "GET",
+                status_code=404 if i % 5 == 0 else 200,
+                timestamp=self.now - timedelta(hours=i),
+            )
+            for i in range(1, 13)
+        ])
+
+    def login(self, username):
+        response = self.client.post("/api/auth/login/", {
+            "username": username,
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_only_auditors_can_read(self):
+        """Test non-auditors are denied"""
+        self.login("developer")
+        response = self.client.get("/api/audit-logs/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_keyset_pages_cover_all_rows_in_order(self):
+        """Test following next links returns every row once, newest first"""
+        self.login("auditor")
+        seen = []
+        url = "/api/audit-logs/?endpoint=/api/tasks/&page_size=5"
+
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(len(seen), 12)
+        self.assertEqual([row["endpoint"] for row in seen],
+                         [f"/api/tasks/{i}/" for i in range(1, 13)])
+
+    def test_ties_on_timestamp_break_by_id(self):
+        """Test rows sharing a timestamp are not skipped between pages"""
+        APIAuditLog.objects.bulk_create([
+            APIAuditLog(endpoint="/api/same/", method="GET", status_code=200, timestamp=self.now)
+            for _ in range(4)
+        ])
+        self.login("auditor")
+
+        first = self.client.get("/api/audit-logs/?endpoint=/api/same/&page_size=3")
+        second = self.client.get(first.data["next"])
+
+        ids = [row["id"] for row in first.data["results"] + second.data["results"]]
+        self.assertEqual(len(set(ids)), 4)
+        self.assertIsNone(second.data["next"])
+
+    def test_filters(self):
+        """Test user, method, status class and time window filters"""
+        self.login("auditor")
+        base = "/api/audit-logs/?endpoint=/api/tasks/"
+
+        response = self.client.get(f"{base}&user={self.developer.id}")
+        self.assertEqual(len(response.data["results"]), 6)
+
+        response = self.client.get(f"{base}&method=patch")
+        self.assertEqual(len(response.data["results"]), 4)
+
+        response = self.client.get(f"{base}&status=4xx")
+        self.assertEqual({row["status_code"] for row in response.data["results"]}, {404})
+        self.assertEqual(len(response.data["results"]), 2)
+
+        since = (self.now - timedelta(hours=3, minutes=30)).isoformat()
+        response = self.client.get("/api/audit-logs/", {"endpoint": "/api/tasks/", "since": since})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_invalid_params(self):
+        """Test bad filters and cursors are rejected"""
+        self.login("auditor")
+        self.assertEqual(
+            self.client.get("/api/audit-logs/?status=7xx").status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.get("/api/audit-logs/?since=yesterday").status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.get("/api/audit-logs/?cursor=garbage").status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+    def test_only_statement_timeouts_become_503(self):
+        """Test a cancelled statement maps to a timeout and other errors do not"""
+        from django.db import OperationalError
+        from tasks.views import is_statement_timeout
+
+        def error(**codes):
+            # Stands in for the driver error Django wraps
+            cause = Exception()
+            cause.__dict__.update(codes)
+            exc = OperationalError()
+            exc.__cause__ = cause
+            return exc
+
+        self.assertTrue(is_statement_timeout(error(sqlstate="57014")))
+        self.assertTrue(is_statement_timeout(error(pgcode="57014")))
+        self.assertFalse(is_statement_timeout(error(sqlstate="08006")))
+        self.assertFalse(is_statement_timeout(OperationalError()))
+
+
+class AuditArchiveTest(TestCase):
+    """Test archival of old audit rows to gzip JSONL segments"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from pathlib import Path
+        from django.test import override_settings
+        from tasks.models import AuditLogPartition
+        from tasks.partitions import partition_name, partition_start
+
+        self.path = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+        override = override_settings(AUDIT_ARCHIVE={
+            "PATH": self.path,
+            "SEGMENT_ROWS": 3,
+            "MODELS": {"tasks.APIAuditLog": {"field": "timestamp", "max_age_days": 10, "partitioned": True}},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+        # Midday, so the rows of one day never straddle midnight
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        AuditLogPartition.objects.all().delete()
+        for days, count in ((20, 4), (15, 1), (1, 2)):
+            start = partition_start(self.now - timedelta(days=days), "day")
+            AuditLogPartition.objects.create(
+                name=partition_name(start, "day"),
+                range_start=start,
+                range_end=start + timedelta(days=1),
+            )
+            for i in range(count):
+                APIAuditLog.objects.create(
+                    endpoint=f"/api/tasks/{days}/{i}/",
+                    method="GET",
+                    status_code=200,
+                    timestamp=self.now - timedelta(days=days, minutes=i),
+                )
+
+    def test_archive_writes_partition_segments(self):
+        """Test expired partitions are archived whole and left for retention to drop"""
+        from tasks import partitions
+        from tasks.archive import archive_expired, read_manifest
+        from tasks.models import AuditLogPartition
+
+        results = archive_expired(now=self.now)
+
+        # 4 rows in one partition split by SEGMENT_ROWS, plus 1 in another
+        self.assertEqual(results["tasks.APIAuditLog"], (5, 3))
+        # Rows are not deleted row by row; the partitions are marked archived
+        self.assertEqual(APIAuditLog.objects.count(), 7)
+        self.assertEqual(AuditLogPartition.objects.filter(archived_at__isnull=False).count(), 2)
+
+        entries = list(read_manifest("tasks.APIAuditLog"))
+        self.assertEqual([entry["rows"] for entry in entries], [3, 1, 1])
+        oldest = partitions.partition_name(partitions.partition_start(self.now - timedelta(days=20), "day"), "day")
+        self.assertEqual(
+            [entry["file"].rsplit("/", 1)[1] for entry in entries[:2]],
+            [f"{oldest}.0000.jsonl.gz", f"{oldest}.0001.jsonl.gz"],
+        )
+        for entry in entries:
+            self.assertTrue((self.path / "tasks.apiauditlog" / entry["file"]).exists())
+        self.assertFalse(list(self.path.rglob("*.tmp")))
+
+        dropped = partitions.drop_partitions_before(self.now - timedelta(days=10))
+        self.assertEqual([rows for _, rows in dropped], [4, 1])
+        self.assertEqual(APIAuditLog.objects.count(), 2)
+
+    def test_rerun_replaces_segments(self):
+        """Test archiving a partition again replaces its segments instead of duplicating rows"""
+        from tasks.archive import archive_expired, read_manifest, scan
+        from tasks.models import AuditLogPartition
+
+        archive_expired(now=self.now)
+        # Crashed before the partitions were marked archived
+        AuditLogPartition.objects.update(archived_at=None)
+        self.assertEqual(archive_expired(now=self.now)["tasks.APIAuditLog"], (5, 3))
+
+        self.assertEqual(len(list(read_manifest("tasks.APIAuditLog"))), 3)
+        self.assertEqual(len(list(self.path.rglob("*.jsonl.gz"))), 3)
+        self.assertEqual(len(list(scan("tasks.APIAuditLog"))), 5)
+
+    def test_partition_kept_when_segment_write_fails(self):
+        """Test a partition is not marked archived when its segment cannot be written"""
+        from unittest import mock
+        from tasks.archive import archive_expired
+        from tasks.models import AuditLogPartition
+
+        with mock.patch("tasks.archive.os.fsync", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                archive_expired(now=self.now)
+
+        self.assertEqual(APIAuditLog.objects.count(), 7)
+        self.assertFalse(AuditLogPartition.objects.filter(archived_at__isnull=False).exists())
+
+    def test_unpartitioned_rows_are_deleted_once_archived(self):
+        """Test models without partitions have their archived rows deleted"""
+        from django.test import override_settings
+        from tasks.archive import archive_expired
+        from tasks.models import TaskHistory
+
+        user = User.objects.create_user(username="historian", email="historian@test.com", password="pass123")
+        task = Task.objects.create(title="Old", assigned_to=user, created_by=user)
+        for days in (20, 1):
+            entry = TaskHistory.objects.create(task=task, previous_status="pending", new_status="completed")
+            TaskHistory.objects.filter(pk=entry.pk).update(timestamp=self.now - timedelta(days=days))
+
+        with override_settings(AUDIT_ARCHIVE={
+            "PATH": self.path,
+            "MODELS": {"tasks.TaskHistory": {"field": "timestamp", "max_age_days": 10}},
+        }):
+            self.assertEqual(archive_expired(now=self.now)["tasks.TaskHistory"], (1, 1))
+        self.assertEqual(TaskHistory.objects.count(), 1)
+
+    def test_query_command_scans_time_range(self):
+        """Test archived rows can be read back by time range"""
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        from tasks.archive import archive_expired
+
+        archive_expired(now=self.now)
+        out = StringIO()
+
+        call_command(
+            "audit_archive_query",
+            "--since", (self.now - timedelta(days=16)).isoformat(),
+            "--until", (self.now - timedelta(days=5)).isoformat(),
+            stdout=out,
+        )
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row["endpoint"] for row in rows], ["/api/tasks/15/0/"])
+
+        out = StringIO()
+        call_command("audit_archive_query", "--where", "method=GET", "--limit", "2", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class AuditBodyCaptureTest(APITestCase):
+    """Test bounded, masked body capture in the audit middleware"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="capture",
+            email="capture@test.com",
+            password="pass123",
+            role="manager",
+            is_email_verified=True
+        )
+
+    def mask(self, document, chunk=3):
+        import json
+        from tasks.middlewares.body_capture import StreamingJSONMasker
+
+        masker = StreamingJSONMasker({"password", "token"})
+        text = json.dumps(document)
+        masked = "".join(masker.feed(text[i:i + chunk]) for i in range(0, len(text), chunk))
+        return json.loads(masked)
+
+    def test_streaming_masker_masks_any_value_type(self):
+        """Test sensitive values are masked across chunk boundaries"""
+        document = {
+            "username": "a",
+            "Password": "x\"y,}",
+            "nested": [{"token": {"a": [1, 2]}, "keep": "password"}],
+            "token": 12,
+            "last": None,
+        }
+
+        self.assertEqual(self.mask(document), {
+            "username": "a",
+            "Password": "********",
+            "nested": [{"token": "********", "keep": "password"}],
+            "token": "********",
+            "last": None,
+        })
+
+    def test_truncated_body_keeps_hash_and_size(self):
+        """Test large bodies are cut at the limit but hashed in full"""
+        import hashlib
+        from django.test import override_settings
+        from tasks.middlewares.body_capture import BodyCapture
+
+        body = b'{"password": "secret", "items": "' + b"x" * 500 + b'"}'
+        capture = BodyCapture(64, {"password"})
+        for i in range(0, len(body), 7):
+            capture.feed(body[i:i + 7])
+
+        self.assertEqual(capture.size, len(body))
+        self.assertEqual(capture.sha256, hashlib.sha256(body).hexdigest())
+        preview = capture.body()
+        self.assertTrue(preview["truncated"])
+        self.assertTrue(preview["preview"].startswith('{"password":"********", "items": "xxx'))
+        self.assertNotIn("secret", preview["preview"])
+
+        with override_settings(AUDIT_LOG_BODY_LIMIT=32):
+            self.client.post("/api/auth/login/", {
+                "username": "capture",
+                "password": "pass123",
+            }, format="json")
+        log = APIAuditLog.objects.get(endpoint="/api/auth/login/")
+        self.assertTrue(log.request_body["truncated"])
+        self.assertNotIn("pass123", log.request_body["preview"])
+        self.assertGreater(log.request_size, 32)
+
+    def test_json_request_body_captured_through_drf(self):
+        """Test bodies parsed by DRF are captured and masked"""
+        import hashlib
+        import json
+
+        payload = {"username": "capture", "password": "wrong"}
+        response = self.client.post("/api/auth/login/", payload, format="json")
+        # The test client renders compact JSON
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+
+        log = APIAuditLog.objects.get(endpoint="/api/auth/login/")
+        self.assertEqual(log.request_body, {"username": "capture", "password": "********"})
+        self.assertEqual(log.request_size, len(raw))
+        self.assertEqual(log.request_sha256, hashlib.sha256(raw).hexdigest())
+        self.assertEqual(log.response_size, len(response.content))
+
+    def test_streaming_response_not_captured(self):
+        """Test streaming error responses are logged without reading the body"""
+        from django.contrib.auth.models import AnonymousUser
+        from django.http import StreamingHttpResponse
+
+        def chunks():
+            raise AssertionError("streaming body must not be consumed")
+            yield b""
+
+        request = RequestFactory().get("/api/export/")
+        request.user = AnonymousUser()
+        response = StreamingHttpResponse(chunks(), status=500)
+
+        AuditLoggingMiddleware(lambda r: response).process_response(request, response)
+
+        log = APIAuditLog.objects.get(endpoint="/api/export/")
+        self.assertIsNone(log.response_body)
+        self.assertIsNone(log.response_size)
+
+
+class RequestRollupTest(APITestCase):
+    """Test per-minute latency rollups"""
+
+    def setUp(self):
+        self.auditor = User.objects.create_user(
+            username="auditor",
+            email="auditor@test.com",
+            password="pass123",
+            role="auditor",
+            is_email_verified=True
+        )
+
+    def test_sketch_quantiles_within_accuracy_and_mergeable(self):
+        """Test merged sketches give percentiles within the relative error"""
+        from tasks.rollups import QuantileSketch
+
+        first, second = QuantileSketch(0.01), QuantileSketch(0.01)
+        values = [float(v) for v in range(1, 1001)]
+        for value in values[::2]:
+            first.add(value)
+        for value in values[1::2]:
+            second.add(value)
+
+        merged = QuantileSketch.from_dict(first.to_dict())
+        merged.merge(second)
+
+        self.assertEqual(merged.count, 1000)
+        for q, exact in ((0.5, 500.5), (0.95, 950.05), (0.99, 990.01)):
+            self.assertAlmostEqual(merged.quantile(q), exact, delta=exact * 0.02)
+
+    def test_flush_writes_finished_minutes_only(self):
+        """Test only closed minutes are flushed unless forced"""
+        from tasks.models import RequestRollup
+        from tasks.rollups import RollupAggregator
+
+        aggregator = RollupAggregator({
+            "ENABLED": True, "BACKGROUND": False,
+            "FLUSH_INTERVAL": 1, "SKETCH_ACCURACY": 0.01,
+        })
+        earlier = timezone.now() - timedelta(minutes=2)
+        for duration, status_code in ((10, 200), (20, 200), (30, 500), (40, 404)):
+            aggregator.record("/api/tasks/", "GET", status_code, duration, earlier)
+        aggregator.record("/api/tasks/", "GET", 200, 5)
+
+        self.assertEqual(aggregator.flush(), 1)
+        row = RequestRollup.objects.get()
+        self.assertEqual((row.count, row.errors, row.client_errors), (4, 1, 1))
+        self.assertEqual(row.max_ms, 40)
+        self.assertAlmostEqual(row.p50_ms, 20, delta=0.5)
+
+        self.assertEqual(aggregator.flush(everything=True), 1)
+
+    def test_middleware_records_duration_and_pattern(self):
+        """Test requests are timed and grouped by URL pattern"""
+        from tasks.rollups import aggregator
+
+        aggregator.flush(everything=True)
+        response = self.client.post("/api/auth/login/", {
+            "username": "auditor",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.client.get("/api/tasks/jobs/12345/")
+
+        log = APIAuditLog.objects.get(endpoint="/api/tasks/jobs/12345/")
+        self.assertIsNotNone(log.duration_ms)
+
+        aggregator.flush(everything=True)
+        response = self.client.get("/api/audit-logs/rollups/", {"endpoint": "/api/tasks/jobs/"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["endpoint"], "/api/tasks/jobs/<int:pk>/")
+        self.assertEqual(response.data[0]["client_errors"], 1)
+
+    def test_window_is_capped_per_bucket(self):
+        """Test wide since/until spans are rejected for fine buckets"""
+        response = self.client.post("/api/auth/login/", {
+            "username": "auditor",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        until = timezone.now()
+
+        for bucket, days, expected in (
+            ("minute", 1, status.HTTP_200_OK),
+            ("minute", 2, status.HTTP_400_BAD_REQUEST),
+            ("hour", 31, status.HTTP_200_OK),
+            ("hour", 32, status.HTTP_400_BAD_REQUEST),
+            ("day", 366, status.HTTP_200_OK),
+            ("day", 367, status.HTTP_400_BAD_REQUEST),
+        ):
+            with self.subTest(bucket=bucket, days=days):
+                response = self.client.get("/api/audit-logs/rollups/", {
+                    "bucket": bucket,
+                    "since": (until - timedelta(days=days)).isoformat(),
+                    "until": until.isoformat(),
+                })
+                self.assertEqual(response.status_code, expected)
+
+        response = self.client.get("/api/audit-logs/rollups/", {
+            "since": until.isoformat(),
+            "until": (until - timedelta(hours=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SlidingWindowLimiterTest(APITestCase):
+    """Test the two-window sliding-window rate limiter"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def make_limiter(self, cache=None):
+        from tasks.rate_limiter import SlidingWindowLimiter
+        return SlidingWindowLimiter(cache=cache, window=60)
+
+    def test_limit_holds_under_concurrency(self):
+        """Test parallel hits on the SQLite cache allow the limit, no more"""
+        import tempfile
+        import threading
+        from tasks.cache_backends import SQLiteCache
+
+        # The production backend: incr must be atomic across connections
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        limiter = self.make_limiter(SQLiteCache(f"{tmp.name}/cache.sqlite3", {}))
+        barrier = threading.Barrier(40)
+        results = []
+
+        def hit():
+            barrier.wait()
+            results.append(limiter.hit("race:write", 15, now=1000.0).allowed)
+
+        threads = [threading.Thread(target=hit) for _ in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 15)
+        # Rejected hits were given back, so the counter equals the allowed hits
+        decision = limiter.hit("race:write", 16, now=1000.0)
+        self.assertTrue(decision.allowed)
+        self.assertEqual(decision.remaining, 0)
+
+    def test_previous_window_weighs_in(self):
+        """Test the sliding window carries over the previous window's load"""
+        limiter = self.make_limiter()
+        for _ in range(10):
+            self.assertTrue(limiter.hit("slide", 10, now=30.0).allowed)
+
+        # A quarter into the next window, 75% of the previous 10 still count
+        decision = limiter.hit("slide", 10, now=75.0)
+        self.assertTrue(decision.allowed)
+        self.assertEqual(decision.remaining, 1)
+        self.assertTrue(limiter.hit("slide", 10, now=75.0).allowed)
+
+        rejected = limiter.hit("slide", 10, now=75.0)
+        self.assertFalse(rejected.allowed)
+        # Room for one more once the previous window's weight is 0.7 (t=78)
+        self.assertEqual(rejected.retry_after, 3)
+
+    def test_headers_and_refund_for_failed_requests(self):
+        """Test responses carry limit headers and errors do not use quota"""
+        from tasks.rate_limits import RATE_LIMITS
+
+        User.objects.create_user(
+            username="limited",
+            email="limited@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        response = self.client.post("/api/auth/login/", {
+            "username": "limited",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        limit = RATE_LIMITS["developer"]["read"]
+
+        response = self.client.get("/api/tasks/")
+        self.assertEqual(response["X-RateLimit-Limit"], str(limit))
+        self.assertEqual(response["X-RateLimit-Remaining"], str(limit - 1))
+
+        response = self.client.get("/api/tasks/999999/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response["X-RateLimit-Remaining"], str(limit - 1))
+
+        response = self.client.get("/api/tasks/")
+        self.assertEqual(response["X-RateLimit-Remaining"], str(limit - 2))
+
+    def test_throttled_response_has_retry_after(self):
+        """Test rejected requests get 429 with Retry-After"""
+        from unittest import mock
+
+        User.objects.create_user(
+            username="burst",
+            email="burst@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+        response = self.client.post("/api/auth/login/", {
+            "username": "burst",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        with mock.patch.dict("tasks.throttles.RATE_LIMITS", {"developer": {"read": 2, "write": 2}}):
+            for _ in range(2):
+                self.assertEqual(self.client.get("/api/tasks/").status_code, status.HTTP_200_OK)
+            response = self.client.get("/api/tasks/")
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(response["X-RateLimit-Remaining"], "0")
+
+
+class TieredCacheTest(APITestCase):
+    """Test the SQLite cache backend and the in-process L1 tier"""
+
+    def setUp(self):
+        import tempfile
+        from django.core.cache import cache
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_backend(self, **options):
+        from tasks.cache_backends import SQLiteCache
+        return SQLiteCache(f"{self.tmp.name}/cache.sqlite3", {"OPTIONS": options})
+
+    def test_sqlite_backend_basics(self):
+        """Test get/set/add/expiry and integer counters in the SQLite backend"""
+        from unittest import mock
+
+        backend = self.make_backend()
+        backend.set("payload", {"a": [1, 2]}, 60)
+        self.assertEqual(backend.get("payload"), {"a": [1, 2]})
+        self.assertFalse(backend.add("payload", "other"))
+        self.assertTrue(backend.add("fresh", 1))
+        self.assertEqual(backend.incr("fresh", 4), 5)
+        self.assertEqual(backend.decr("fresh"), 4)
+        self.assertEqual(backend.get_many(["payload", "fresh", "absent"]), {"payload": {"a": [1, 2]}, "fresh": 4})
+        with self.assertRaises(ValueError):
+            backend.incr("absent")
+        with self.assertRaises(ValueError):
+            backend.incr("payload")
+
+        backend.set("short", "x", 10)
+        with mock.patch("tasks.cache_backends.time.time", return_value=__import__("time").time() + 11):
+            self.assertIsNone(backend.get("short"))
+            # An expired row can be claimed again by add()
+            self.assertTrue(backend.add("short", "y"))
+
+        # A second instance on the same file sees the same entries
+        self.assertEqual(self.make_backend().get("fresh"), 4)
+
+    def test_sqlite_incr_is_atomic_across_threads(self):
+        """Test concurrent incr() calls never lose an update"""
+        import threading
+
+        backend = self.make_backend()
+        backend.set("counter", 0)
+        barrier = threading.Barrier(8)
+
+        def bump():
+            barrier.wait()
+            for _ in range(50):
+                backend.incr("counter")
+
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(backend.get("counter"), 400)
+
+    def test_sqlite_culls_to_max_entries(self):
+        """Test the backend trims itself to MAX_ENTRIES"""
+        backend = self.make_backend(MAX_ENTRIES=10, CULL_EVERY=5)
+        for index in range(30):
+            backend.set(f"key-{index}", index)
+        count = backend._connection().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        self.assertLessEqual(count, 10)
+
+    def test_l1_serves_repeat_reads(self):
+        """Test repeat reads come from L1 without touching L2"""
+        from unittest import mock
+        from tasks.tiered_cache import TieredCache
+
+        l2 = self.make_backend()
+        tiered = TieredCache("facets-test", l2=l2, l1_ttl=60)
+        tiered.set("key", [1, 2, 3], 300)
+
+        with mock.patch.object(l2, "get", side_effect=AssertionError("L2 read")):
+            self.assertEqual(tiered.get("key"), [1, 2, 3])
+        self.assertEqual(tiered.stats["l1_hits"], 1)
+
+        # Another process starts with an empty L1 and reads through to L2
+        other = TieredCache("facets-test", l2=l2, l1_ttl=60)
+        self.assertEqual(other.get("key"), [1, 2, 3])
+        self.assertEqual(other.stats["l2_hits"], 1)
+        self.assertIsNone(other.get("missing"))
+        self.assertEqual(other.stats["misses"], 1)
+
+    def test_invalidation_reaches_other_processes(self):
+        """Test a version bump in one process is seen by another after L1_TTL"""
+        from unittest import mock
+        from tasks.tiered_cache import TieredCache
+
+        l2 = self.make_backend()
+        first = TieredCache("ns", l2=l2, l1_ttl=5)
+        second = TieredCache("ns", l2=l2, l1_ttl=5)
+        first.set("key", "old")
+        self.assertEqual(second.get("key"), "old")
+
+        first.invalidate()
+        self.assertIsNone(first.get("key"))
+
+        later = __import__("time").monotonic() + 6
+        with mock.patch("tasks.tiered_cache.time.monotonic", return_value=later):
+            self.assertIsNone(second.get("key"))
+
+    def test_tag_facets_use_tiered_cache_and_metrics(self):
+        """Test tag facets are cached per namespace and reported in metrics"""
+        from tasks import facets
+        from tasks.models import Tag
+
+        facets.facet_cache.clear_local()
+        Tag.objects.create(name="backend")
+        self.assertEqual(facets.tag_facets("back")[0]["name"], "backend")
+        facets.tag_facets("back")
+
+        manager = User.objects.create_user(
+            username="cachemgr",
+            email="cachemgr@test.com",
+            password="pass123",
+            role="manager",
+            is_email_verified=True
+        )
+        self.client.force_authenticate(manager)
+        response = self.client.get("/api/cache/metrics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(response.data["tag-facets"]["l1_hits"], 1)
+        self.assertIn("hit_ratio", response.data["tag-facets"])
+
+        Tag.objects.create(name="backlog")
+        names = [facet["name"] for facet in facets.tag_facets("back")]
+        self.assertIn("backlog", names)
+
+
+class BlocklistTest(APITestCase):
+    """Test the in-process blocked IP filter"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from tasks.blocklist import blocklist
+        cache.clear()
+        blocklist.clear_local()
+        self.addCleanup(blocklist.clear_local)
+        self.blocklist = blocklist
+
+    def test_clean_requests_make_no_io(self):
+        """Test requests from addresses that are not blocked skip cache and DB"""
+        from unittest import mock
+        from django.http import HttpResponse
+        from tasks.middlewares.security import SmartSecurityMiddleware
+
+        middleware = SmartSecurityMiddleware(lambda request: HttpResponse("ok"))
+        factory = RequestFactory()
+        # The first request loads the (empty) blocklist
+        middleware(factory.get("/api/tasks/", REMOTE_ADDR="10.0.0.1"))
+
+        with mock.patch("django.core.cache.cache.get", side_effect=AssertionError("cache read")):
+            with self.assertNumQueries(0):
+                for index in range(50):
+                    response = middleware(factory.get("/api/tasks/", REMOTE_ADDR=f"10.0.1.{index}"))
+                    self.assertEqual(response.status_code, 200)
+
+    def test_blocked_ip_must_answer_captcha(self):
+        """Test a blocked address gets a CAPTCHA and is unblocked by answering it"""
+        from tasks.models import BlockedIP
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block = self.blocklist.block("127.0.0.1")
+
+        response = self.client.get("/api/tasks/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json()["captcha_question"], block.captcha_question)
+
+        response = self.client.get("/api/tasks/", HTTP_X_CAPTCHA_ANSWER="wrong")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get("/api/tasks/", HTTP_X_CAPTCHA_ANSWER=str(block.captcha_answer))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(BlockedIP.objects.filter(ip_address="127.0.0.1").exists())
+
+    def test_blocks_reach_other_workers(self):
+        """Test another worker picks up a block through the version stamp"""
+        import time
+        from unittest import mock
+        from tasks.blocklist import IPBlocklist
+
+        other = IPBlocklist(refresh_interval=2)
+        self.assertIsNone(other.get("10.9.9.9"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blocklist.block("10.9.9.9")
+
+        # Within the interval the other worker still uses its loaded set
+        self.assertIsNone(other.get("10.9.9.9"))
+        with mock.patch("tasks.tiered_cache.time.monotonic", return_value=time.monotonic() + 3):
+            self.assertIsNotNone(other.get("10.9.9.9"))
+
+    def test_expired_blocks_are_ignored(self):
+        """Test BlockedIP.is_expired and expired blocks no longer apply"""
+        from tasks.models import BlockedIP
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block = self.blocklist.block("10.8.8.8", seconds=60)
+        self.assertFalse(block.is_expired())
+
+        BlockedIP.objects.filter(pk=block.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        block.refresh_from_db()
+        self.assertTrue(block.is_expired())
+        self.blocklist.reload()
+        self.assertIsNone(self.blocklist.get("10.8.8.8"))
+
+        legacy = BlockedIP.objects.create(ip_address="10.7.7.7", captcha_question="q", captcha_answer=1)
+        self.assertFalse(legacy.is_expired())
@@ -587,3 +587,747 @@ class AnalyticsTest(APITestCase):
         self.assertIn("by_status", my_tasks)
         self.assertIn("overdue_count", my_tasks)
         self.assertEqual(my_tasks["total"], 2)
+
+
+class BulkJobTest(APITestCase):
+    """Test bulk operations running as background jobs"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager",
+            email="manager@test.com",
+            password="pass123",
+            role="manager",
+            is_email_verified=True
+        )
+        self.developer = User.objects.create_user(
+            username="developer",
+            email="dev@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+
+        response = self.client.post("/api/auth/login/", {
+            "username": "manager",
+            "password": "pass123"
+        })
+        self.token = response.data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def test_async_bulk_update_returns_job(self):
+        """Test async bulk update is queued and processed in chunks"""
+        from tasks import jobs
+        from tasks.models import BulkJob
+
+        tasks = [
+            Task.objects.create(
+                title=f"Task {i}",
+                assigned_to=self.developer,
+                created_by=self.manager
+            )
+            for i in range(5)
+        ]
+
+        response = self.client.put("/api/tasks/bulk-update/", {
+            "task_ids": [task.id for task in tasks],
+            "status": "in_progress",
+            "run_async": True
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        job = BulkJob.objects.get(pk=response.data["job_id"])
+        self.assertEqual(job.state, BulkJob.State.PENDING)
+        self.assertEqual(job.total, 5)
+
+        self.assertEqual(jobs.run_pending_jobs(), 1)
+
+        self.assertEqual(
+            Task.objects.filter(status=Task.Status.IN_PROGRESS).count(), 5
+        )
+
+        response = self.client.get(response.data["status_url"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["state"], "completed")
+        self.assertEqual(response.data["processed"], 5)
+        self.assertEqual(response.data["progress"], 100.0)
+
+    def test_status_job_is_all_or_nothing(self):
+        """Test a job with parent-child violations fails with their errors and changes nothing"""
+        from tasks import jobs
+        from tasks.models import BulkJob
+
+        parent = Task.objects.create(
+            title="Parent",
+            status=Task.Status.IN_PROGRESS,
+            assigned_to=self.manager,
+            created_by=self.manager
+        )
+        Task.objects.create(
+            title="Child",
+            status=Task.Status.IN_PROGRESS,
+            parent_task=parent,
+            assigned_to=self.manager,
+            created_by=self.manager
+        )
+        other = Task.objects.create(
+            title="Other",
+            assigned_to=self.manager,
+            created_by=self.manager
+        )
+
+        job = jobs.submit(
+            BulkJob.Kind.STATUS_UPDATE,
+            {"task_ids": [parent.id, other.id, 999999], "status": "completed"},
+            self.manager,
+            total=3
+        )
+        jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, BulkJob.State.FAILED)
+        self.assertEqual(job.processed, 0)
+        self.assertEqual(job.failed, 2)
+        self.assertEqual(
+            {error["task_id"] for error in job.errors}, {parent.id, 999999}
+        )
+
+        parent.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(parent.status, Task.Status.IN_PROGRESS)
+        self.assertEqual(other.status, Task.Status.PENDING)
+
+    def test_bulk_create_job(self):
+        """Test bulk create runs as a job, enforces developer assignment and is all or nothing"""
+        from tasks import jobs
+
+        response = self.client.post("/api/auth/login/", {
+            "username": "developer",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        response = self.client.post("/api/tasks/bulk-create/", {
+            "tasks": [
+                {"title": "Bulk 1", "assigned_to": self.manager.id},
+                {"title": "Bulk 2", "assigned_to": self.manager.id},
+                {"assigned_to": self.manager.id},
+            ]
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        jobs.run_pending_jobs()
+
+        self.assertFalse(Task.objects.filter(title__startswith="Bulk").exists())
+        response = self.client.get(f"/api/tasks/jobs/{response.data['job_id']}/")
+        self.assertEqual(response.data["state"], "failed")
+        self.assertEqual(response.data["failed"], 1)
+
+        response = self.client.post("/api/tasks/bulk-create/", {
+            "tasks": [
+                {"title": "Bulk 1", "assigned_to": self.manager.id},
+                {"title": "Bulk 2", "assigned_to": self.manager.id},
+            ]
+        }, format="json")
+        jobs.run_pending_jobs()
+
+        created = Task.objects.filter(title__startswith="Bulk")
+        self.assertEqual(created.count(), 2)
+        self.assertTrue(all(task.assigned_to == self.developer for task in created))
+        response = self.client.get(f"/api/tasks/jobs/{response.data['job_id']}/")
+        self.assertEqual((response.data["state"], response.data["processed"]), ("completed", 2))
+
+    def test_task_deleted_before_apply_is_reported(self):
+        """Test a task deleted between validation and apply is skipped and listed in errors"""
+        from unittest import mock
+        from tasks import jobs
+        from tasks.models import BulkJob
+
+        kept, doomed = [
+            Task.objects.create(title=title, assigned_to=self.manager, created_by=self.manager)
+            for title in ("Kept", "Doomed")
+        ]
+        validate, apply = jobs.HANDLERS[BulkJob.Kind.STATUS_UPDATE]
+
+        def validate_then_delete(job, task_ids):
+            errors = validate(job, task_ids)
+            Task.objects.filter(pk=doomed.pk).delete()
+            return errors
+
+        job = jobs.submit(
+            BulkJob.Kind.STATUS_UPDATE,
+            {"task_ids": [kept.id, doomed.id], "status": "in_progress"},
+            self.manager,
+            total=2
+        )
+        with mock.patch.dict(jobs.HANDLERS, {BulkJob.Kind.STATUS_UPDATE: (validate_then_delete, apply)}):
+            jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, BulkJob.State.COMPLETED)
+        self.assertEqual((job.processed, job.failed, job.position), (1, 1, 2))
+        self.assertEqual(job.errors, [{"task_id": doomed.id, "error": "Task was deleted before the job applied it."}])
+        kept.refresh_from_db()
+        self.assertEqual(kept.status, Task.Status.IN_PROGRESS)
+
+    def test_stuck_running_job_is_reclaimed(self):
+        """Test a running job whose worker died resumes after its last committed chunk"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from tasks import jobs
+        from tasks.models import BulkJob
+
+        first, second = [
+            Task.objects.create(title=title, assigned_to=self.manager, created_by=self.manager)
+            for title in ("First", "Second")
+        ]
+        payload = {"task_ids": [first.id, second.id], "assigned_to": self.developer.id}
+        stale = timezone.now() - timedelta(seconds=jobs.LEASE_SECONDS + 1)
+        # The first chunk was committed before the worker died
+        stuck = BulkJob.objects.create(
+            kind=BulkJob.Kind.REASSIGN, payload=payload, created_by=self.manager, total=2,
+            state=BulkJob.State.RUNNING, started_at=stale, heartbeat_at=stale, position=1, processed=1,
+        )
+        live = BulkJob.objects.create(
+            kind=BulkJob.Kind.REASSIGN, payload=payload, created_by=self.manager, total=2,
+            state=BulkJob.State.RUNNING, started_at=stale, heartbeat_at=timezone.now(),
+        )
+
+        self.assertEqual(jobs.run_pending_jobs(), 1)
+
+        stuck.refresh_from_db()
+        self.assertEqual((stuck.state, stuck.processed, stuck.position), (BulkJob.State.COMPLETED, 2, 2))
+        self.assertEqual(stuck.started_at, stale)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.assigned_to, second.assigned_to), (self.manager, self.developer))
+        live.refresh_from_db()
+        self.assertEqual(live.state, BulkJob.State.RUNNING)
+
+    def test_wake_while_worker_exits_runs_again(self):
+        """Test a job committed as the worker finds the queue empty is not left pending"""
+        import threading
+        from unittest import mock
+        from tasks import jobs
+
+        drains = []
+
+        def drain():
+            drains.append(1)
+            if len(drains) == 1:
+                # The worker is still alive, so this only asks it to go on
+                jobs.wake_worker()
+            return 0
+
+        with mock.patch.object(jobs, "run_pending_jobs", side_effect=drain), \
+                mock.patch.object(jobs.connection, "close"), \
+                mock.patch.object(jobs, "_worker", threading.current_thread()):
+            jobs._worker_loop()
+            self.assertIsNone(jobs._worker)
+
+        self.assertEqual(len(drains), 2)
+
+    def test_bulk_writes_send_tasks_changed(self):
+        """Test job writes send tasks_changed once committed, for every dependent index and stream"""
+        from tasks import jobs
+        from tasks.changes import tasks_changed
+        from tasks.models import BulkJob
+
+        task = Task.objects.create(title="Changed", assigned_to=self.manager, created_by=self.manager)
+        received = []
+
+        def receiver(sender, task_ids, **kwargs):
+            received.append(task_ids)
+
+        tasks_changed.connect(receiver)
+        self.addCleanup(tasks_changed.disconnect, receiver)
+
+        jobs.submit(BulkJob.Kind.REASSIGN, {"task_ids": [task.id], "assigned_to": self.developer.id},
+                    self.manager, total=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.run_pending_jobs()
+        self.assertEqual(received, [[task.id]])
+
+    def test_bulk_reassign(self):
+        """Test managers can reassign tasks in bulk"""
+        task = Task.objects.create(
+            title="Reassign me",
+            assigned_to=self.manager,
+            created_by=self.manager
+        )
+
+        response = self.client.put("/api/tasks/bulk-reassign/", {
+            "task_ids": [task.id],
+            "assigned_to": self.developer.id
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated_count"], 1)
+
+        task.refresh_from_db()
+        self.assertEqual(task.assigned_to, self.developer)
+
+    def test_job_hidden_from_other_users(self):
+        """Test developers cannot see jobs of other users"""
+        from tasks import jobs
+        from tasks.models import BulkJob
+
+        job = jobs.submit(BulkJob.Kind.REASSIGN, {"task_ids": []}, self.manager, total=0)
+
+        response = self.client.post("/api/auth/login/", {
+            "username": "developer",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        response = self.client.get(f"/api/tasks/jobs/{job.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TagAssignmentTest(APITestCase):
+    """Test batched tag handling in TaskWriteSerializer"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager",
+            email="manager@test.com",
+            password="pass123",
+            role="manager",
+            is_email_verified=True
+        )
+
+        response = self.client.post("/api/auth/login/", {
+            "username": "manager",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        self.task = Task.objects.create(
+            title="Tagged",
+            assigned_to=self.manager,
+            created_by=self.manager
+        )
+
+    def _patch_tags(self, tags):
+        return self.client.patch(f"/api/tasks/{self.task.id}/", {
+            "assigned_to": self.manager.id,
+            "tags": tags
+        }, format="json")
+
+    def test_update_applies_tag_diff(self):
+        """Test only added and removed tags change"""
+        self._patch_tags(["backend", "api", "urgent"])
+        kept_link = Task.tags.through.objects.get(task=self.task, tag__name="backend")
+
+        response = self._patch_tags(["backend", "frontend", "frontend"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            set(self.task.tags.values_list("name", flat=True)),
+            {"backend", "frontend"}
+        )
+        # Unchanged links are not rewritten
+        self.assertTrue(Task.tags.through.objects.filter(pk=kept_link.pk).exists())
+        self.assertEqual(Tag.objects.filter(name="frontend").count(), 1)
+
+    def test_unchanged_tags_issue_no_writes(self):
+        """Test re-sending the same tags does not write tag rows"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._patch_tags(["backend", "api"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._patch_tags(["api", "backend"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        tag_writes = [
+            query["sql"] for query in ctx.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+            and ("tasks_tag" in query["sql"] or "tasks_task_tags" in query["sql"])
+        ]
+        self.assertEqual(tag_writes, [])
+
+
+class TagFacetTest(APITestCase):
+    """Test tag autocomplete, facet counts and task list filters"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.manager = User.objects.create_user(
+            username="manager",
+            email="manager@test.com",
+            password="pass123",
+            role="manager",
+            is_email_verified=True
+        )
+
+        response = self.client.post("/api/auth/login/", {
+            "username": "manager",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        self.backend = Tag.objects.create(name="backend")
+        self.bug = Tag.objects.create(name="bug")
+        self.urgent = Tag.objects.create(name="urgent")
+
+        self.pending = Task.objects.create(
+            title="Pending",
+            status=Task.Status.PENDING,
+            assigned_to=self.manager,
+            created_by=self.manager
+        )
+        self.pending.tags.add(self.backend, self.urgent)
+
+        self.blocked = Task.objects.create(
+            title="Blocked",
+            status=Task.Status.BLOCKED,
+            assigned_to=self.manager,
+            created_by=self.manager
+        )
+        self.blocked.tags.add(self.backend)
+
+    def test_prefix_autocomplete_with_counts(self):
+        """Test tags are suggested by prefix with task counts"""
+        response = self.client.get("/api/tasks/tags/", {"q": "b"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(tag["name"], tag["task_count"]) for tag in response.data],
+            [("backend", 2), ("bug", 0)]
+        )
+
+    def test_counts_scoped_by_task_filters(self):
+        """Test facet counts only include tasks matching the filters"""
+        response = self.client.get("/api/tasks/tags/", {"status": "pending"})
+
+        self.assertEqual(
+            {tag["name"]: tag["task_count"] for tag in response.data},
+            {"backend": 1, "urgent": 1}
+        )
+
+    def test_cache_invalidated_on_tag_change(self):
+        """Test cached counts are refreshed when task tags change"""
+        self.client.get("/api/tasks/tags/", {"q": "bug"})
+
+        self.blocked.tags.add(self.bug)
+
+        response = self.client.get("/api/tasks/tags/", {"q": "bug"})
+        self.assertEqual(response.data[0]["task_count"], 1)
+
+    def test_task_list_filters(self):
+        """Test the task list honours tag (all must match) and status filters"""
+        response = self.client.get("/api/tasks/?tags=backend&tags=urgent")
+        self.assertEqual([task["id"] for task in response.data], [self.pending.id])
+
+        response = self.client.get("/api/tasks/?tags=backend&status=pending,blocked")
+        self.assertEqual(len(response.data), 2)
+
+        response = self.client.get("/api/tasks/?status=completed")
+        self.assertEqual(len(response.data), 0)
+
+
+class BitmapIndexTest(APITestCase):
+    """Test the in-process bitmap index used by task list filters"""
+
+    def setUp(self):
+        from django.test import override_settings
+        from tasks.bitmap_index import task_index
+
+        self.settings_override = override_settings(TASK_BITMAP_INDEX_ENABLED=True)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.index = task_index
+        self.addCleanup(setattr, task_index, "ready", False)
+
+        self.manager = User.objects.create_user(
+            username="manager",
+            email="manager@test.com",
+            password="pass123",
+            role="manager",
+            is_email_verified=True
+        )
+        self.developer = User.objects.create_user(
+            username="developer",
+            email="dev@test.com",
+            password="pass123",
+            role="developer",
+            is_email_verified=True
+        )
+
+        self.backend = Tag.objects.create(name="backend")
+        self.urgent = Tag.objects.create(name="urgent")
+
+        self.task1 = Task.objects.create(
+            title="One",
+            status=Task.Status.PENDING,
+            assigned_to=self.developer,
+            created_by=self.manager
+        )
+        self.task1.tags.add(self.backend, self.urgent)
+        self.task2 = Task.objects.create(
+            title="Two",
+            status=Task.Status.BLOCKED,
+            assigned_to=self.manager,
+            created_by=self.manager
+        )
+        self.task2.tags.add(self.backend)
+
+        self.index.build()
+
+    def test_bitmap_set_operations(self):
+        """Test bitmap intersection, union and iteration across containers"""
+        from tasks.bitmap_index import Bitmap
+
+        a = Bitmap([1, 5, 70000, 200000])
+        b = Bitmap([5, 200000, 3])
+
+        self.assertEqual(list(a & b), [5, 200000])
+        self.assertEqual(list(a | b), [1, 3, 5, 70000, 200000])
+        self.assertEqual(len(a), 4)
+
+        a.discard(70000)
+        self.assertNotIn(70000, a)
+        self.assertEqual(len(a._chunks), 2)
+
+    def test_resolve_intersects_dimensions(self):
+        """Test tags must all match while statuses and assignees are alternatives"""
+        self.assertEqual(
+            set(self.index.resolve(tag_names=["backend", "urgent"])), {self.task1.id}
+        )
+        self.assertEqual(
+            set(self.index.resolve(
+                statuses=["pending", "blocked"],
+                assignees=[self.developer.id, self.manager.id],
+                tag_names=["backend"]
+            )),
+            {self.task1.id, self.task2.id}
+        )
+        self.assertEqual(set(self.index.resolve(tag_names=["missing"])), set())
+
+    def test_index_follows_signals(self):
+        """Test task and tag changes update the index without a rebuild"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task2.tags.add(self.urgent)
+            self.task1.tags.remove(self.urgent)
+            self.task1.status = Task.Status.COMPLETED
+            self.task1.save()
+
+        self.assertEqual(set(self.index.resolve(tag_names=["urgent"])), {self.task2.id})
+        self.assertEqual(set(self.index.resolve(statuses=["pending"])), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task2.delete()
+        self.assertEqual(set(self.index.resolve(tag_names=["backend"])), {self.task1.id})
+
+    def test_rolled_back_changes_do_not_reach_index(self):
+        """Test the index is only changed once the write commits"""
+        from django.db import transaction
+
+        try:
+            with transaction.atomic():
+                self.task1.status = Task.Status.COMPLETED
+                self.task1.save()
+                self.task1.tags.remove(self.urgent)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        self.assertEqual(set(self.index.resolve(statuses=["pending"])), {self.task1.id})
+        self.assertEqual(set(self.index.resolve(tag_names=["urgent"])), {self.task1.id})
+
+    def test_stale_index_rows_are_filtered_in_sql(self):
+        """Test rows the index still lists but no longer match are not returned"""
+        from django.http import QueryDict
+        from tasks.filters import apply_task_filters
+
+        # Written by another process: no signal reaches this index
+        Task.objects.filter(id=self.task1.id).update(status=Task.Status.COMPLETED)
+        Task.tags.through.objects.filter(task_id=self.task1.id, tag=self.urgent).delete()
+
+        for query in ("status=pending", "tags=urgent"):
+            queryset = apply_task_filters(Task.objects.all(), QueryDict(query))
+            self.assertEqual(list(queryset), [])
+
+    def test_tasks_missing_from_index_are_found_in_sql(self):
+        """Test tasks written without signals after the build still match"""
+        from django.http import QueryDict
+        from django.utils import timezone
+        from tasks.filters import apply_task_filters
+
+        # Written by another process: no signal reaches this index
+        [added] = Task.objects.bulk_create([Task(
+            title="Three",
+            status=Task.Status.PENDING,
+            assigned_to=self.manager,
+            created_by=self.manager,
+        )])
+        Task.tags.through.objects.create(task_id=added.id, tag=self.urgent)
+        Task.objects.filter(id=self.task2.id).update(
+            status=Task.Status.PENDING, updated_at=timezone.now()
+        )
+        self.assertNotIn(added.id, self.index.resolve(statuses=["pending"]))
+
+        for query, expected in (
+            ("status=pending", {self.task1.id, self.task2.id, added.id}),
+            ("tags=urgent", {self.task1.id, added.id}),
+            ("status=pending&tags=backend", {self.task1.id, self.task2.id}),
+        ):
+            queryset = apply_task_filters(Task.objects.all(), QueryDict(query))
+            self.assertEqual({task.id for task in queryset}, expected, query)
+
+    def test_writes_during_first_build_are_indexed(self):
+        """Test changes committed while the first snapshot loads are reloaded"""
+        from unittest import mock
+        from tasks.bitmap_index import TaskBitmapIndex, task_index
+
+        index = TaskBitmapIndex()
+        load_tags = Tag.objects.values_list
+
+        def values_list(*fields, **kwargs):
+            # Task rows have been read; this change commits before the swap
+            with self.captureOnCommitCallbacks(execute=True):
+                self.task2.status = Task.Status.COMPLETED
+                self.task2.save()
+            return load_tags(*fields, **kwargs)
+
+        with mock.patch("tasks.bitmap_index.task_index", index), \
+                mock.patch.object(Tag.objects, "values_list", side_effect=values_list):
+            index.build()
+
+        self.assertEqual(set(index.resolve(statuses=["completed"])), {self.task2.id})
+        self.assertEqual(set(index.resolve(statuses=["blocked"])), set())
+        self.assertIsNot(index, task_index)
+
+    def test_task_list_uses_index(self):
+        """Test filtered task list only checks tags of the tasks the index found"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        response = self.client.post("/api/auth/login/", {
+            "username": "manager",
+            "password": "pass123"
+        })
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/tasks/?tags=backend,urgent&status=pending")
+
+        self.assertEqual([task["id"] for task in response.data], [self.task1.id])
+        tag_queries = [
+            query["sql"] for query in ctx.captured_queries
+            if query["sql"].startswith('SELECT "tasks_task"."id"') and "tasks_task_tags" in query["sql"]
+        ]
+        self.assertEqual(len(tag_queries), 1)
+        self.assertIn(f'U0."task_id" IN ({self.task1.id})', tag_queries[0])
+
+
+class RetentionTest(TestCase):
+    """Test the chunked retention engine"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="retention",
+            email="retention@test.com",
+            password="pass123",
+            role="developer"
+        )
+        self.now = timezone.now()
+
+    def make_notifications(self, count, age_days):
+        Notification.objects.bulk_create(
+            Notification(user=self.user, message=f"n{i}") for i in range(count)
+        )
+        # created_at is auto_now_add, so backdate after insert
+        latest = Notification.objects.order_by("-id")[:count].values_list("id", flat=True)
+        Notification.objects.filter(id__in=list(latest)).update(
+            created_at=self.now - timedelta(days=age_days)
+        )
+
+    def run_retention(self, policy, **kwargs):
+        from django.test import override_settings
+        from tasks.retention import apply_retention
+
+        policies = {"notifications.Notification": policy}
+        with override_settings(RETENTION_POLICIES=policies):
+            return apply_retention(sleep=0, now=self.now, **kwargs)[0]
+
+    def test_expired_rows_deleted_in_chunks(self):
+        """Test rows past max age are deleted in pk-ranged chunks"""
+        self.make_notifications(25, age_days=100)
+        self.make_notifications(5, age_days=1)
+
+        report = self.run_retention(
+            {"field": "created_at", "max_age_days": 90},
+            chunk_size=10,
+        )
+
+        self.assertEqual(report["deleted"], 25)
+        self.assertEqual(report["chunks"], 3)
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_dry_run_deletes_nothing(self):
+        """Test dry run only counts the rows it would delete"""
+        self.make_notifications(4, age_days=100)
+
+        report = self.run_retention(
+            {"field": "created_at", "max_age_days": 90},
+            dry_run=True,
+        )
+
+        self.assertEqual(report["deleted"], 4)
+        self.assertEqual(Notification.objects.count(), 4)
+
+    def test_max_rows_per_user_keeps_newest(self):
+        """Test the per-user cap keeps only the newest rows"""
+        self.make_notifications(6, age_days=3)
+        self.make_notifications(4, age_days=1)
+        newest = set(Notification.objects.order_by("-created_at", "-id")
+                     .values_list("id", flat=True)[:5])
+
+        report = self.run_retention(
+            {"field": "created_at", "max_rows_per_user": 5},
+            chunk_size=2,
+        )
+
+        self.assertEqual(report["deleted"], 5)
+        self.assertEqual(set(Notification.objects.values_list("id", flat=True)), newest)
+
+    def test_blocks_kept_until_a_day_after_they_end(self):
+        """Test long blocks survive retention while expired and legacy ones go"""
+        from tasks.models import BlockedIP
+        from tasks.retention import DEFAULT_POLICIES, RetentionRun
+
+        def block(ip, blocked_days_ago, expires_in_days):
+            expires_at = None if expires_in_days is None else self.now + timedelta(days=expires_in_days)
+            row = BlockedIP.objects.create(
+                ip_address=ip, captcha_question="1 + 1", captcha_answer=2, expires_at=expires_at
+            )
+            BlockedIP.objects.filter(pk=row.pk).update(blocked_at=self.now - timedelta(days=blocked_days_ago))
+
+        block("10.0.0.1", blocked_days_ago=3, expires_in_days=7)
+        block("10.0.0.2", blocked_days_ago=5, expires_in_days=-2)
+        block("10.0.0.3", blocked_days_ago=3, expires_in_days=None)
+        block("10.0.0.4", blocked_days_ago=0.5, expires_in_days=None)
+
+        RetentionRun("tasks.BlockedIP", DEFAULT_POLICIES["tasks.BlockedIP"], sleep=0, now=self.now).run()
+
+        self.assertEqual(
+            set(BlockedIP.objects.values_list("ip_address", flat=True)), {"10.0.0.1", "10.0.0.4"}
+        )
+
+    def test_command_reports_rates(self):
+        """Test the management command reports rows per second"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        self.make_notifications(3, age_days=400)
+        out = StringIO()
+
+        call_command("apply_retention", "--sleep", "0", stdout=out)
+
+        self.assertIn("notifications.Notification: deleted 3 rows", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+        self.assertEqual(Notification.objects.count(), 0)
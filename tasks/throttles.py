@@ -1,18 +1,23 @@
-from rest_framework.throttling import UserRateThrottle
-import time
-from django.core.cache import cache
 from rest_framework.throttling import BaseThrottle
 from rest_framework.exceptions import Throttled
 
+from tasks.rate_limiter import limiter
+from tasks.rate_limits import RATE_LIMITS
 
-from tasks.rate_limits import RATE_LIMITS, WINDOW_SECONDS
+
+def method_type(request):
+    return "read" if request.method in ("GET", "HEAD", "OPTIONS") else "write"
 
 
 class RoleBasedThrottle(BaseThrottle):
-    
-    def allow_request(self, request, view):
-        print("THROTTLE HIT:", request.method, request.path)
+    """
+    Per-user, per-role limits from RATE_LIMITS over an approximate sliding
+    window (see tasks/rate_limiter.py).
+    The decision is kept on the request so SuccessfulRequestCountingMiddleware
+    can add rate limit headers and give back quota for failed requests.
+    """
 
+    def allow_request(self, request, view):
         # Ignore preflight
         if request.method == "OPTIONS":
             return True
@@ -21,10 +26,8 @@ class RoleBasedThrottle(BaseThrottle):
         if not user or not user.is_authenticated:
             return True
 
-        method_type = "read" if request.method == "GET" else "write"
-        role = user.role
-
-        limit = RATE_LIMITS.get(role, {}).get(method_type)
+        kind = method_type(request)
+        limit = RATE_LIMITS.get(user.role, {}).get(kind)
 
         # Unlimited (Auditor read)
         if limit is None:
@@ -34,31 +37,9 @@ class RoleBasedThrottle(BaseThrottle):
         if limit == 0:
             raise Throttled(detail="WRITE operations are not allowed.")
 
-        cache_key = f"rate:{user.id}:{method_type}"
-        record = cache.get(cache_key)
-        now = time.time()
-
-        if not record:
-            cache.set(
-                cache_key,
-                {"count": 1, "start": now},
-                timeout=WINDOW_SECONDS
-            )
-            return True
-
-        elapsed = now - record["start"]
-
-        if elapsed > WINDOW_SECONDS:
-            cache.set(
-                cache_key,
-                {"count": 1, "start": now},
-                timeout=WINDOW_SECONDS
-            )
-            return True
-
-        if record["count"] >= limit:
-            raise Throttled(detail="Rate limit exceeded.")
+        self.decision = limiter.hit(f"{user.id}:{kind}", limit)
+        request._request.rate_limit = self.decision
+        return self.decision.allowed
 
-        record["count"] += 1
-        cache.set(cache_key, record, timeout=WINDOW_SECONDS)
-        return True
+    def wait(self):
+        return self.decision.retry_after
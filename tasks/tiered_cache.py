@@ -0,0 +1,159 @@
+"""
+Two-tier cache: a small in-process L1 in front of the shared cache (L2).
+
+Values live in L2 under ``<namespace>:<version>:<key>``. Invalidating a
+namespace increments its version key in L2, which orphans every old entry
+at once. Each process also keeps recently read values in an LRU L1 for at
+most ``L1_TTL`` seconds, and re-reads the namespace version at the same
+interval, so an invalidation made by another process is seen within
+``L1_TTL`` seconds and one made by this process immediately.
+
+Hit and miss counts per namespace are available from ``metrics()``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+DEFAULTS = {
+    "L1_TTL": 5.0,
+    "L1_MAX_ENTRIES": 1000,
+}
+
+_MISSING = object()
+_namespaces = {}
+_namespaces_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "TIERED_CACHE", {})}
+
+
+class TieredCache:
+    def __init__(self, namespace, l2=None, l1_ttl=None, l1_max_entries=None):
+        config = get_config()
+        self.namespace = namespace
+        self.l2 = l2 or default_cache
+        self.l1_ttl = config["L1_TTL"] if l1_ttl is None else l1_ttl
+        self.l1_max_entries = l1_max_entries or config["L1_MAX_ENTRIES"]
+        self._l1 = OrderedDict()  # key -> (expires, version, value)
+        self._version = None
+        self._version_checked = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "sets": 0, "invalidations": 0}
+
+    # ---------- Versions ----------
+    @property
+    def version_key(self):
+        return f"{self.namespace}:version"
+
+    def version(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked < self.l1_ttl:
+            return self._version
+
+        version = self.l2.get(self.version_key)
+        if version is None:
+            self.l2.add(self.version_key, 1, timeout=None)
+            version = self.l2.get(self.version_key, 1)
+        self._set_version(version, now)
+        return version
+
+    def _set_version(self, version, now=None):
+        with self._lock:
+            if version != self._version:
+                self._l1.clear()
+            self._version = version
+            self._version_checked = time.monotonic() if now is None else now
+
+    def invalidate(self):
+        """Orphan every entry of the namespace, in every process"""
+        try:
+            version = self.l2.incr(self.version_key)
+        except ValueError:
+            self.l2.add(self.version_key, 2, timeout=None)
+            version = self.l2.get(self.version_key, 2)
+        self._set_version(version)
+        self.stats["invalidations"] += 1
+
+    # ---------- Values ----------
+    def _l2_key(self, version, key):
+        return f"{self.namespace}:{version}:{key}"
+
+    def get(self, key, default=None):
+        version = self.version()
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None and entry[0] > now and entry[1] == version:
+                self._l1.move_to_end(key)
+                self.stats["l1_hits"] += 1
+                return entry[2]
+
+        value = self.l2.get(self._l2_key(version, key), _MISSING)
+        if value is _MISSING:
+            self.stats["misses"] += 1
+            return default
+
+        self.stats["l2_hits"] += 1
+        self._remember(key, version, value, self.l1_ttl)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        version = self.version()
+        self.l2.set(self._l2_key(version, key), value, timeout)
+        l1_ttl = self.l1_ttl
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            l1_ttl = min(l1_ttl, timeout)
+        self._remember(key, version, value, l1_ttl)
+        self.stats["sets"] += 1
+
+    def get_or_set(self, key, compute, timeout=DEFAULT_TIMEOUT):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, timeout)
+        return value
+
+    def delete(self, key):
+        """Drop one entry; other processes may serve it from L1 for up to L1_TTL"""
+        self.l2.delete(self._l2_key(self.version(), key))
+        with self._lock:
+            self._l1.pop(key, None)
+
+    def _remember(self, key, version, value, ttl):
+        with self._lock:
+            self._l1[key] = (time.monotonic() + ttl, version, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def clear_local(self):
+        with self._lock:
+            self._l1.clear()
+            self._version = None
+
+
+def get_cache(namespace):
+    """The process-wide TieredCache of a namespace"""
+    with _namespaces_lock:
+        tiered = _namespaces.get(namespace)
+        if tiered is None:
+            tiered = _namespaces[namespace] = TieredCache(namespace)
+        return tiered
+
+
+def metrics():
+    """Hit/miss counters and hit ratio per namespace for this process"""
+    result = {}
+    for namespace, tiered in list(_namespaces.items()):
+        stats = dict(tiered.stats)
+        lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else None
+        stats["l1_entries"] = len(tiered._l1)
+        result[namespace] = stats
+    return result
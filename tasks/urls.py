@@ -1,6 +1,7 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import TaskAnalyticsView, TaskBulkUpdateView, TaskViewSet, TaskHistoryViewSet
+from .views import BulkJobDetailView, TagFacetView, TaskBulkCreateView, TaskBulkReassignView
 
 router = DefaultRouter()
 router.register("", TaskViewSet, basename="tasks")
@@ -10,5 +11,9 @@ router.register("history", TaskHistoryViewSet, basename="task-history")
 urlpatterns=[
     path('analytics/', TaskAnalyticsView.as_view(), name='task-analytics'),
     path('bulk-update/', TaskBulkUpdateView.as_view(), name='task-bulk-update'),
+    path('bulk-reassign/', TaskBulkReassignView.as_view(), name='task-bulk-reassign'),
+    path('bulk-create/', TaskBulkCreateView.as_view(), name='task-bulk-create'),
+    path('tags/', TagFacetView.as_view(), name='task-tags'),
+    path('jobs/<int:pk>/', BulkJobDetailView.as_view(), name='bulk-job-detail'),
 ]
 urlpatterns += router.urls
@@ -1,22 +1,33 @@
+from datetime import timedelta
+
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
 from rest_framework import viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from django.urls import reverse
 from django.db.models import Count, Avg, F, Q, ExpressionWrapper, DurationField
 from django.utils.timezone import now
 from tasks.models import Task
-from django.db import transaction
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
 from rest_framework import status
 from authentication.permissions import IsEmailVerified
 from .throttles import RoleBasedThrottle
 from .serializers import BulkTaskUpdateSerializer, TaskReadSerializer
 from .serializers import TaskHistorySerializer, TaskWriteSerializer
-from .permissions import AuditorWriteForbidden, TemporalTaskUpdatePermission
+from .serializers import BulkJobSerializer, BulkTaskCreateSerializer, BulkTaskReassignSerializer
+from .serializers import APIAuditLogSerializer
+from .permissions import AuditorWriteForbidden, IsAuditor, IsManager, TemporalTaskUpdatePermission
 from drf_spectacular.utils import extend_schema
 
-from .models import Task, TaskHistory
+from . import facets, jobs, rollups, tiered_cache
+from .changes import update_tasks
+from .filters import apply_audit_log_filters, apply_task_filters, get_datetime_param, get_list_param
+from .models import APIAuditLog, BulkJob, RequestRollup, Task, TaskHistory
+from .pagination import KeysetPagination
 
 class TaskViewSet(ModelViewSet):
     queryset = Task.objects.all()
@@ -29,6 +40,12 @@ class TaskViewSet(ModelViewSet):
             permissions.append(TemporalTaskUpdatePermission())
         return permissions
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = apply_task_filters(queryset, self.request.query_params)
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
             return TaskReadSerializer
@@ -64,6 +81,41 @@ class TaskHistoryViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 
+@extend_schema(
+    responses={
+        200: {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "name": {"type": "string"},
+                    "task_count": {"type": "integer"},
+                },
+            },
+        }
+    },
+    description=(
+        "Tag suggestions by name prefix (?q=) with the number of tasks per tag. "
+        "Task list filters (status, priority, assigned_to, tags, overdue, search) "
+        "scope the counts to matching tasks."
+    )
+)
+class TagFacetView(APIView):
+    permission_classes = [IsAuthenticated, IsEmailVerified]
+
+    def get(self, request):
+        prefix = request.query_params.get("q", "").strip()
+
+        try:
+            limit = int(request.query_params.get("limit", facets.DEFAULT_LIMIT))
+        except ValueError:
+            limit = facets.DEFAULT_LIMIT
+        limit = max(1, min(limit, facets.MAX_LIMIT))
+
+        return Response(facets.tag_facets(prefix, limit, request.query_params))
+
+
 class TaskAnalyticsView(APIView):
     """
     Returns analytics for tasks:
@@ -148,12 +200,40 @@ class TaskAnalyticsView(APIView):
 
         return Response(data)
 
+JOB_ACCEPTED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "job_id": {"type": "integer"},
+        "status_url": {"type": "string"},
+    },
+}
+
+
+def job_accepted_response(job):
+    return Response(
+        {
+            "job_id": job.id,
+            "status_url": reverse("bulk-job-detail", args=[job.id]),
+        },
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
 @extend_schema(
     request=BulkTaskUpdateSerializer,
     responses={
-        200: {"type": "object", "properties": {"updated_count": {"type": "integer"}}}
+        200: {"type": "object", "properties": {"updated_count": {"type": "integer"}}},
+        202: JOB_ACCEPTED_SCHEMA,
     },
-    description="Bulk update task status atomically with parent-child validation"
+    description=(
+        "Bulk update task status atomically with parent-child validation. "
+        "Large requests (or run_async=true) are queued as a background job. "
+        "If any task is missing or breaks a parent-child rule when the job "
+        "starts, it fails with those errors and no task changes. After that it "
+        "applies committed chunks: tasks deleted before their chunk are skipped "
+        "and listed in the job errors, and a job failing midway keeps the chunks "
+        "already applied."
+    )
 )
 class TaskBulkUpdateView(APIView):
     """
@@ -166,6 +246,15 @@ class TaskBulkUpdateView(APIView):
         task_ids = serializer.validated_data['task_ids']
         new_status = serializer.validated_data['status']
 
+        if serializer.validated_data['run_async']:
+            job = jobs.submit(
+                BulkJob.Kind.STATUS_UPDATE,
+                {"task_ids": task_ids, "status": new_status},
+                request.user,
+                total=len(task_ids)
+            )
+            return job_accepted_response(job)
+
         # Atomic transaction → all or nothing
         with transaction.atomic():
             tasks = Task.objects.filter(id__in=task_ids)
@@ -173,4 +262,201 @@ class TaskBulkUpdateView(APIView):
                 task.status = new_status
                 task.save()
 
-        return Response({"updated_count": len(task_ids)}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"updated_count": len(task_ids)}, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request=BulkTaskReassignSerializer,
+    responses={
+        200: {"type": "object", "properties": {"updated_count": {"type": "integer"}}},
+        202: JOB_ACCEPTED_SCHEMA,
+    },
+    description=(
+        "Reassign many tasks to one user, as a background job for large selections. "
+        "A job with missing tasks fails and reassigns none; tasks deleted after "
+        "the job started are skipped and listed in its errors."
+    )
+)
+class TaskBulkReassignView(APIView):
+    permission_classes = [IsAuthenticated, IsEmailVerified, IsManager]
+
+    def put(self, request):
+        serializer = BulkTaskReassignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        task_ids = serializer.validated_data['task_ids']
+        new_user = serializer.validated_data['assigned_to']
+
+        if serializer.validated_data['run_async']:
+            job = jobs.submit(
+                BulkJob.Kind.REASSIGN,
+                {"task_ids": task_ids, "assigned_to": new_user.id},
+                request.user,
+                total=len(task_ids)
+            )
+            return job_accepted_response(job)
+
+        updated_count = update_tasks(task_ids, assigned_to=new_user)
+        return Response({"updated_count": updated_count}, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request=BulkTaskCreateSerializer,
+    responses={202: JOB_ACCEPTED_SCHEMA},
+    description=(
+        "Create many tasks in a background job. If any item is invalid, the "
+        "job fails with the item errors and creates no task. Items that become "
+        "invalid after the job started (e.g. their parent was deleted) are "
+        "skipped and listed in its errors."
+    )
+)
+class TaskBulkCreateView(APIView):
+    permission_classes = [IsAuthenticated, IsEmailVerified, AuditorWriteForbidden]
+
+    def post(self, request):
+        serializer = BulkTaskCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = serializer.validated_data['tasks']
+        job = jobs.submit(
+            BulkJob.Kind.CREATE,
+            {"tasks": items},
+            request.user,
+            total=len(items)
+        )
+        return job_accepted_response(job)
+
+
+class BulkJobDetailView(RetrieveAPIView):
+    """
+    Progress, throughput and errors of a bulk job.
+    Managers can see every job, other users only their own.
+    """
+    serializer_class = BulkJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == "manager":
+            return BulkJob.objects.all()
+        return BulkJob.objects.filter(created_by=user)
+
+
+class AuditLogQueryTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Audit log query took too long. Narrow the filters or time window."
+    default_code = "query_timeout"
+
+
+# SQLSTATE of a statement cancelled by statement_timeout (query_canceled)
+QUERY_CANCELED = "57014"
+
+
+def is_statement_timeout(exc):
+    """Whether ``exc`` is PostgreSQL cancelling a statement, not another failure"""
+    cause = exc.__cause__
+    # psycopg 3 names the code sqlstate, psycopg2 pgcode
+    return (getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)) == QUERY_CANCELED
+
+
+@extend_schema(
+    description=(
+        "Read-only API audit log for auditors, newest first. Filters: user, "
+        "endpoint (prefix), method, status (1xx-5xx), since and until (ISO 8601). "
+        "Follow `next` to page; pages are keyset based and have no total count."
+    )
+)
+class AuditLogListView(ListAPIView):
+    queryset = APIAuditLog.objects.all()
+    serializer_class = APIAuditLogSerializer
+    permission_classes = [IsAuthenticated, IsAuditor]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return apply_audit_log_filters(super().get_queryset(), self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        timeout_ms = getattr(settings, "AUDIT_LOG_QUERY_TIMEOUT_MS", 5000)
+
+        if connection.vendor != "postgresql" or not timeout_ms:
+            return super().list(request, *args, **kwargs)
+
+        # Cap the statement time so a filter no index serves well cannot
+        # run for minutes on a large table
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL statement_timeout = %s", [timeout_ms])
+                return super().list(request, *args, **kwargs)
+        except OperationalError as e:
+            if is_statement_timeout(e):
+                raise AuditLogQueryTimeout() from e
+            raise
+
+
+@extend_schema(
+    responses={
+        200: {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "start": {"type": "string", "format": "date-time"},
+                    "endpoint": {"type": "string"},
+                    "method": {"type": "string"},
+                    "count": {"type": "integer"},
+                    "errors": {"type": "integer"},
+                    "client_errors": {"type": "integer"},
+                    "avg_ms": {"type": "number"},
+                    "max_ms": {"type": "number"},
+                    "p50_ms": {"type": "number"},
+                    "p95_ms": {"type": "number"},
+                    "p99_ms": {"type": "number"},
+                },
+            },
+        }
+    },
+    description=(
+        "Request count, errors and latency percentiles per endpoint pattern and "
+        "method, grouped by bucket (minute, hour or day). Filters: endpoint "
+        "(prefix), method, since and until (default: the last 24 hours)."
+    )
+)
+class RequestRollupView(APIView):
+    permission_classes = [IsAuthenticated, IsAuditor | IsManager]
+
+    def get(self, request):
+        params = request.query_params
+
+        bucket = params.get("bucket", "hour")
+        if bucket not in rollups.BUCKETS:
+            raise ValidationError({"bucket": "Expected minute, hour or day."})
+
+        until = get_datetime_param(params, "until") or now()
+        since = get_datetime_param(params, "since") or until - timedelta(days=1)
+        if since >= until:
+            raise ValidationError({"since": "Must be before until."})
+        if until - since > rollups.MAX_WINDOWS[bucket]:
+            raise ValidationError({
+                "since": f"At most {rollups.MAX_WINDOWS[bucket].days} days of {bucket} buckets per request."
+            })
+
+        queryset = RequestRollup.objects.filter(minute__gte=since, minute__lt=until)
+
+        endpoint = params.get("endpoint", "").strip()
+        if endpoint:
+            queryset = queryset.filter(endpoint__startswith=endpoint)
+
+        methods = [method.upper() for method in get_list_param(params, "method")]
+        if methods:
+            queryset = queryset.filter(method__in=methods)
+
+        return Response(rollups.summarize(queryset, bucket))
+
+
+class CacheMetricsView(APIView):
+    """Per-namespace hit/miss counters of the two-tier cache in this process"""
+    permission_classes = [IsAuthenticated, IsAuditor | IsManager]
+
+    def get(self, request):
+        return Response(tiered_cache.metrics())